@@ -0,0 +1,128 @@
+"""
+Construction time and resident memory of an OpenAQ daily aggregate frame:
+per-record dicts + pd.DataFrame (the old path) against OPENAQ.AggColumns.
+
+    python -m benchmarks.bench_agg_columns --sensors 1000 --days 3650
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from data.raw.OPENAQ import AggColumns
+from benchmarks.synthetic import OPENAQ_PARAMETERS, OPENAQ_UNITS
+
+
+def fake_catalog(sensors: int):
+    pairs = []
+    for i in range(sensors):
+        parameter = OPENAQ_PARAMETERS[i % len(OPENAQ_PARAMETERS)]
+        loc = SimpleNamespace(id=i // 4 + 1, name=f"Location {i // 4 + 1}")
+        s = SimpleNamespace(id=i + 1, parameter=SimpleNamespace(name=parameter, units=OPENAQ_UNITS[parameter]))
+        pairs.append((loc, s))
+    return pairs
+
+
+def fake_records(days: int, seed: int):
+    """API-shaped /days records for one sensor."""
+    rng = np.random.default_rng(seed)
+    avg = rng.gamma(2.0, 5.0, days).round(3)
+    start = date(2016, 1, 1)
+    out = []
+    for i in range(days):
+        day = (start + timedelta(days=i)).isoformat()
+        v = float(avg[i])
+        out.append({
+            "value": v,
+            "summary": {"min": v * 0.4, "q02": v * 0.5, "q25": v * 0.8, "median": v, "q75": v * 1.2,
+                        "q98": v * 1.6, "max": v * 1.8, "avg": v, "sd": v * 0.2},
+            "coverage": {"datetimeFrom": {"local": f"{day}T00:00:00-05:00"},
+                         "datetimeTo": {"local": f"{day}T23:59:59-05:00"}},
+        })
+    return out
+
+
+# The pre-AggColumns row builder, kept here as the baseline
+def agg_row(loc, s, r):
+    return {
+        "sensor_id": s.id,
+        "location_id": loc.id,
+        "location_name": loc.name,
+        "parameter": s.parameter.name,
+        "parameter_units": s.parameter.units,
+        "value": r["value"],
+        "min": r["summary"]["q02"],
+        "q02": r["summary"]["q02"],
+        "q25": r["summary"]["q25"],
+        "median": r["summary"]["median"],
+        "q75": r["summary"]["q75"],
+        "q98": r["summary"]["q98"],
+        "max": r["summary"]["max"],
+        "avg": r["summary"]["avg"],
+        "sd": r["summary"]["sd"],
+        "date_from": datetime.fromisoformat(r["coverage"]["datetimeFrom"]["local"]).date(),
+        "date_to": datetime.fromisoformat(r["coverage"]["datetimeTo"]["local"]).date()
+    }
+
+
+def build_dicts(batches):
+    rows = []
+    for loc, s, records in batches:
+        rows.extend(agg_row(loc, s, r) for r in records)
+    return pd.DataFrame(rows)
+
+
+def build_columns(batches):
+    cols = AggColumns()
+    for loc, s, records in batches:
+        cols.extend(loc, s, records)
+    return cols.to_frame()
+
+
+def measure(fn, batches):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = fn(batches)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, elapsed, peak, df.memory_usage(deep=True).sum()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sensors", type=int, default=200)
+    parser.add_argument("--days", type=int, default=3650)
+    args = parser.parse_args()
+
+    records = fake_records(args.days, seed=0)
+    batches = [(loc, s, records) for loc, s in fake_catalog(args.sensors)]
+
+    mb = 1024 ** 2
+    print(f"{args.sensors:,} sensors x {args.days:,} days = {args.sensors * args.days:,} rows")
+    print(f"{'builder':<10}{'seconds':>10}{'peak MB':>10}{'frame MB':>10}")
+    results = {}
+    for name, fn in (("dicts", build_dicts), ("columns", build_columns)):
+        df, elapsed, peak, size = measure(fn, batches)
+        results[name] = (df, elapsed, peak, size)
+        print(f"{name:<10}{elapsed:>10.2f}{peak / mb:>10.1f}{size / mb:>10.1f}")
+
+    old, new = results["dicts"], results["columns"]
+    print(f"{'ratio':<10}{old[1] / new[1]:>9.1f}x{old[2] / new[2]:>9.1f}x{old[3] / new[3]:>9.1f}x")
+
+    # same content, compact dtypes
+    a, b = old[0], new[0]
+    assert list(a.columns) == list(b.columns)
+    assert (pd.to_datetime(a["date_from"]) == pd.to_datetime(b["date_from"])).all()
+    assert np.allclose(a["avg"].to_numpy(), b["avg"].to_numpy(), rtol=1e-6)
+
+
+if __name__ == "__main__":
+    main()
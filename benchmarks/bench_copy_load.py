@@ -0,0 +1,62 @@
+"""
+Compares COPY FROM STDIN against to_sql(method="multi") for openaq- and
+ncdc-shaped frames. Writes to throwaway bench_* tables in the configured
+database (see sql/engine.py) and drops them afterwards.
+
+    python -m benchmarks.bench_copy_load --sensors 200 --days 3650
+"""
+
+import argparse
+import time
+
+from sqlalchemy import text
+
+from sql.engine import get_engine
+from sql.bulk import write_frame
+from benchmarks import synthetic
+
+SCHEMA = "public"
+
+
+def time_load(engine, df, table_name, method):
+    with engine.begin() as conn:
+        conn.execute(text(f'DROP TABLE IF EXISTS {SCHEMA}."{table_name}"'))
+    df.head(0).to_sql(table_name, engine, schema=SCHEMA, if_exists="replace", index=False)
+
+    start = time.perf_counter()
+    write_frame(df, table_name, engine, schema=SCHEMA, method=method)
+    elapsed = time.perf_counter() - start
+
+    with engine.begin() as conn:
+        loaded = conn.execute(text(f'SELECT COUNT(*) FROM {SCHEMA}."{table_name}"')).scalar()
+        conn.execute(text(f'DROP TABLE {SCHEMA}."{table_name}"'))
+
+    assert loaded == len(df), f"{table_name}: loaded {loaded} of {len(df)} rows"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sensors", type=int, default=100)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--stations", type=int, default=2)
+    args = parser.parse_args()
+    engine = get_engine("bulk_load")
+
+    frames = {
+        "openaq_daily": synthetic.openaq_daily(args.sensors, args.days),
+        "noaa_ncdc_ghcnd_daily": synthetic.ncdc_ghcnd(args.stations, args.days),
+    }
+
+    print(f"{'frame':<24}{'rows':>12}{'method':>8}{'seconds':>10}{'rows/s':>14}")
+    for name, df in frames.items():
+        results = {}
+        for method in ("multi", "copy"):
+            elapsed = time_load(engine, df, f"bench_{name}_{method}", method)
+            results[method] = elapsed
+            print(f"{name:<24}{len(df):>12,}{method:>8}{elapsed:>10.2f}{len(df) / elapsed:>14,.0f}")
+        print(f"{name:<24}{'':>12}{'speedup':>8}{results['multi'] / results['copy']:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+End-to-end pipeline benchmark against local API stand-ins (benchmarks/mock_apis.py).
+
+Runs load_openaq, load_ncdc_ghcn and load_noaa_co2 from sql/insert_data.py
+unchanged, with the API base URLs pointed at the mock server, and reports per
+stage wall time, rows loaded, rows/s and peak resident memory growth, plus
+the fetch / gap-fill / DB-write breakdown recorded by data.metrics. The mock
+server runs in a child process so it doesn't share this process's CPU or RSS.
+
+    python -m benchmarks.bench_end_to_end --sensors 1000 --years 10 --latency-ms 20
+    python -m benchmarks.bench_end_to_end --target sqlite --rate-429 0.01
+
+--target postgres writes to a throwaway schema (--schema, dropped afterwards)
+in the database configured for sql/engine.py; --target sqlite writes to a
+temporary SQLite file with LOAD_MODE=replace (upsert/swap need PostgreSQL).
+No real API quota is used.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import sqlalchemy as sa
+
+from benchmarks.mock_apis import MockAPIs
+
+# effectively unthrottled client-side quota for the mock host (--real-quotas keeps the published ones)
+MOCK_QUOTAS = [(100_000, 1)]
+
+STAGE_TABLES = {
+    "openaq": ["openaq_daily"],
+    "ncdc": ["noaa_ncdc_ghcnd_daily"],
+    "noaa_co2": ["noaa_co2_daily_mlo", "noaa_co2_monthly_mlo", "noaa_co2_annual_mlo"],
+}
+
+
+class PeakRSS:
+    """
+    Samples this process's resident set size every interval seconds while active;
+    .peak_mb is the high-water mark above the RSS at entry. Reads /proc, so
+    Linux only (peak_mb stays nan elsewhere). Unlike tracemalloc it doesn't
+    slow the measured code down, and it sees memory numpy/pyarrow allocate too.
+    """
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak_mb = float("nan")
+        self.thread = None
+
+    @staticmethod
+    def rss() -> int:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+    def __enter__(self):
+        if not os.path.exists("/proc/self/statm"):
+            return self
+        self.base = self.peak = self.rss()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def sample(self):
+        while not self.done.wait(self.interval):
+            self.peak = max(self.peak, self.rss())
+
+    def __exit__(self, *exc):
+        if self.thread is not None:
+            self.done.set()
+            self.thread.join()
+            self.peak = max(self.peak, self.rss())
+            self.peak_mb = (self.peak - self.base) / 1e6
+
+
+def count_rows(engine, schema: str, tables: list[str]) -> int:
+    total = 0
+    with engine.connect() as conn:
+        for t in tables:
+            if sa.inspect(conn).has_table(t, schema=schema):
+                total += conn.execute(sa.text(f'SELECT COUNT(*) FROM {schema}."{t}"')).scalar()
+    return total
+
+
+def run_stage(name, fn, engine, schema, metrics):
+    metrics.reset()
+    with PeakRSS() as mem:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+
+    report = metrics.report()
+    return {
+        "stage": name,
+        "rows": count_rows(engine, schema, STAGE_TABLES[name]),
+        "seconds": elapsed,
+        "peak_mb": mem.peak_mb,
+        "requests": sum(r["requests"] for r in report["requests"].values()),
+        "retries": sum(r["retries"] for r in report["requests"].values()),
+        "substages": report["stages"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sensors", type=int, default=100, help="OpenAQ sensors in the mock catalog")
+    parser.add_argument("--years", type=int, default=10, help="years of daily history per sensor")
+    parser.add_argument("--stations", type=int, default=2, help="GHCND stations in the mock catalog")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every mock response")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--workers", type=int, default=None, help="OPENAQ_MAX_WORKERS / NCDC_MAX_WORKERS")
+    parser.add_argument("--target", choices=("postgres", "sqlite"), default="postgres")
+    parser.add_argument("--schema", default="bench", help="PostgreSQL schema to load into (dropped afterwards)")
+    parser.add_argument("--real-quotas", action="store_true", help="keep the published per-API request quotas")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGE_TABLES), default=list(STAGE_TABLES))
+    args = parser.parse_args()
+
+    mock = MockAPIs(
+        sensors=args.sensors,
+        years=args.years,
+        stations=args.stations,
+        latency_ms=args.latency_ms,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+    ).start(subprocess=True)
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+
+    # the data modules read these at import time, so set them before importing the pipeline
+    os.environ.update({
+        "OPENAQ_URL": mock.openaq_url,
+        "NCDC_CDO_URL": mock.ncdc_url,
+        "NOAA_GML_URL": mock.gml_url,
+        "OPENAQ_CACHE_DIR": os.path.join(workdir, "cache"),
+        "LAKE_DIR": os.path.join(workdir, "lake"),
+        "METRICS_DIR": os.path.join(workdir, "metrics"),
+    })
+    if args.workers:
+        os.environ["OPENAQ_MAX_WORKERS"] = os.environ["NCDC_MAX_WORKERS"] = str(args.workers)
+
+    from data import metrics
+    from data.raw import ratelimit, http_client
+    import sql.insert_data as insert_data
+
+    if not args.real_quotas:
+        ratelimit.register(mock.url, MOCK_QUOTAS)
+
+    if args.target == "sqlite":
+        engine = sa.create_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+        schema = "main"
+        insert_data.LOAD_MODE = "replace"
+    else:
+        from sql.engine import get_engine
+        engine = get_engine("bulk_load")
+        schema = args.schema
+        with engine.begin() as conn:
+            conn.execute(sa.text(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE'))
+            conn.execute(sa.text(f'CREATE SCHEMA "{schema}"'))
+    insert_data.PUBLIC_SCHEMA = schema
+
+    stages = {
+        "openaq": lambda: insert_data.load_openaq(engine),
+        "ncdc": lambda: insert_data.load_ncdc_ghcn(engine, all_stations=True),
+        "noaa_co2": lambda: insert_data.load_noaa_co2(engine),
+    }
+
+    results = []
+    try:
+        for name in args.stages:
+            print(f"--- {name}")
+            results.append(run_stage(name, stages[name], engine, schema, metrics))
+        served = mock.report()
+    finally:
+        http_client.close()
+        mock.stop()
+        if args.target == "postgres":
+            with engine.begin() as conn:
+                conn.execute(sa.text(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE'))
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    print(
+        f"target={args.target} sensors={args.sensors} years={args.years} stations={args.stations} "
+        f"latency={args.latency_ms}ms 429-rate={args.rate_429}"
+    )
+    print(f"{'stage':<32}{'rows':>12}{'seconds':>10}{'rows/s':>12}{'peak MB':>10}{'requests':>10}{'retries':>9}")
+    for r in results:
+        print(
+            f"{r['stage']:<32}{r['rows']:>12,}{r['seconds']:>10.2f}{r['rows'] / r['seconds']:>12,.0f}"
+            f"{r['peak_mb']:>10.1f}{r['requests']:>10,}{r['retries']:>9,}"
+        )
+        for s in r["substages"]:
+            print(
+                f"  {s['stage'] + '/' + s['source']:<30}{s['rows']:>12,}{s['seconds']:>10.2f}{s['rows_per_s']:>12,.0f}"
+            )
+    print(f"mock calls: {served['calls']}")
+    if served["throttled"]:
+        print(f"mock 429s: {served['throttled']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Times the per-group add_missing_dates loop against gapfill.fill_daily_gaps
+on synthetic raw OpenAQ rows, and checks both produce the same frame.
+
+    python -m benchmarks.bench_gapfill --sensors 1000 10000 --days 365
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from data.raw.gapfill import fill_daily_gaps
+from tests.gapfill_reference import carry_cols, fill_missing_dates_loop, keys, raw_rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sensors", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--skip-loop-above", type=int, default=10_000,
+                        help="don't time the loop beyond this many sensors (it is slow)")
+    args = parser.parse_args()
+
+    print(f"{'sensors':>8}{'rows in':>12}{'rows out':>12}{'loop s':>10}{'vector s':>10}{'speedup':>9}")
+    for sensors in args.sensors:
+        df = raw_rows(sensors, args.days)
+
+        start = time.perf_counter()
+        vec = fill_daily_gaps(df, keys, carry_cols)
+        vec_s = time.perf_counter() - start
+
+        loop_s = float("nan")
+        if sensors <= args.skip_loop_above:
+            start = time.perf_counter()
+            loop = fill_missing_dates_loop(df)
+            loop_s = time.perf_counter() - start
+            pd.testing.assert_frame_equal(vec, loop)
+
+        print(f"{sensors:>8,}{len(df):>12,}{len(vec):>12,}{loop_s:>10.2f}{vec_s:>10.2f}{loop_s / vec_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
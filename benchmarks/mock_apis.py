@@ -0,0 +1,362 @@
+"""
+Local stand-ins for the APIs the pipeline reads, for offline benchmarks.
+
+One threaded HTTP server answers:
+    {url}/openaq/v3/locations, /openaq/v3/sensors/{id}/days   (OpenAQ v3, page/limit)
+    {url}/openaq/v3/sensors/{id}/hours, .../measurements       (hourly, datetime_from/datetime_to)
+    {url}/cdo/stations, /cdo/data                              (NCDC CDO v2, offset/limit)
+    {url}/gml/co2_daily_mlo.csv, co2_mm_mlo.csv, co2_annmean_mlo.csv   (NOAA GML)
+
+Responses are generated on the fly from the request, so volume is set by
+sensors/years/stations without holding the data set in memory. latency_ms
+delays every response and rate_429 answers that fraction of requests with
+429 + Retry-After, to exercise the client-side throttling and retry paths.
+"""
+
+import datetime as dt
+import http.server
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse, parse_qs
+from urllib.request import urlopen
+
+from benchmarks.synthetic import OPENAQ_PARAMETERS, OPENAQ_UNITS
+
+SENSORS_PER_LOCATION = 4
+CO2_FIRST_YEAR = 1974
+DAY = dt.timedelta(days=1)
+HOUR = dt.timedelta(hours=1)
+UTC_OFFSET = dt.timedelta(hours=5)  # the mock's locations are all on fixed UTC-05:00
+
+
+class MockAPIs:
+    def __init__(
+        self,
+        sensors: int = 100,
+        years: int = 10,
+        stations: int = 2,
+        latency_ms: float = 0.0,
+        rate_429: float = 0.0,
+        retry_after: int = 1,
+        seed: int = 0,
+    ):
+        self.options = dict(
+            sensors=sensors, years=years, stations=stations, latency_ms=latency_ms,
+            rate_429=rate_429, retry_after=retry_after, seed=seed,
+        )
+        self.sensors = sensors
+        self.years = years
+        self.stations = stations
+        self.latency_s = latency_ms / 1000
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.throttled = Counter()
+        self.server = None
+        self.process = None
+        self.port = None
+
+    # -- lifecycle --------------------------------------------------------
+
+    def start(self, subprocess: bool = False) -> "MockAPIs":
+        """
+        Serves on a free localhost port. subprocess=True serves from a child
+        process instead, so the server's CPU and memory stay out of the caller's
+        measurements.
+        """
+        if subprocess:
+            parent, child = multiprocessing.Pipe()
+            self.process = multiprocessing.Process(target=_serve, args=(self.options, child), daemon=True)
+            self.process.start()
+            self.port = parent.recv()
+            return self
+
+        mock = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                mock.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def openaq_url(self) -> str:
+        return f"{self.url}/openaq/v3"
+
+    @property
+    def ncdc_url(self) -> str:
+        return f"{self.url}/cdo"
+
+    @property
+    def gml_url(self) -> str:
+        return f"{self.url}/gml"
+
+    # -- dispatch ---------------------------------------------------------
+
+    def handle(self, req):
+        u = urlparse(req.path)
+        q = parse_qs(u.query)
+        if u.path == "/_stats":
+            return self.send_json(req, self.report())
+        endpoint = re.sub(r"/\d+/", "/{id}/", u.path)
+
+        with self.lock:
+            self.calls[endpoint] += 1
+            throttle = self.rate_429 > 0 and self.rng.random() < self.rate_429
+            if throttle:
+                self.throttled[endpoint] += 1
+
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+        if throttle:
+            return self.send(req, 429, b'{"detail": "Too Many Requests"}', headers={"Retry-After": str(self.retry_after)})
+
+        m = re.fullmatch(r"/openaq/v3/sensors/(\d+)/days", u.path)
+        if m:
+            return self.send_json(req, self.openaq_days(int(m.group(1)), q))
+        m = re.fullmatch(r"/openaq/v3/sensors/(\d+)/(hours|measurements)", u.path)
+        if m:
+            return self.send_json(req, self.openaq_hours(int(m.group(1)), q))
+        if u.path == "/openaq/v3/locations":
+            return self.send_json(req, self.openaq_locations(q))
+        if u.path == "/cdo/data":
+            return self.send_json(req, self.cdo_data(q))
+        if u.path == "/cdo/stations":
+            return self.send_json(req, self.cdo_stations(q))
+        if u.path.startswith("/gml/"):
+            body = self.gml_csv(u.path.rsplit("/", 1)[-1])
+            if body is not None:
+                return self.send(req, 200, body.encode(), content_type="text/csv")
+
+        self.send(req, 404, b'{"detail": "Not Found"}')
+
+    @staticmethod
+    def send(req, status: int, body: bytes, content_type: str = "application/json", headers: dict = None):
+        req.send_response(status)
+        req.send_header("Content-Type", content_type)
+        req.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            req.send_header(k, v)
+        req.end_headers()
+        req.wfile.write(body)
+
+    def send_json(self, req, payload: dict):
+        self.send(req, 200, json.dumps(payload).encode())
+
+    # -- OpenAQ -----------------------------------------------------------
+
+    def sensor_parameter(self, sensor_id: int) -> str:
+        return OPENAQ_PARAMETERS[(sensor_id - 1) % len(OPENAQ_PARAMETERS)]
+
+    def openaq_locations(self, q) -> dict:
+        limit, page = int(q["limit"][0]), int(q["page"][0])
+        n_locations = -(-self.sensors // SENSORS_PER_LOCATION)
+        ids = range((page - 1) * limit + 1, min(page * limit, n_locations) + 1)
+
+        results = []
+        for loc_id in ids:
+            first = (loc_id - 1) * SENSORS_PER_LOCATION + 1
+            sensors = []
+            for sid in range(first, min(first + SENSORS_PER_LOCATION, self.sensors + 1)):
+                p = self.sensor_parameter(sid)
+                sensors.append({
+                    "id": sid,
+                    "name": f"{p} {OPENAQ_UNITS[p]}",
+                    "parameter": {"id": OPENAQ_PARAMETERS.index(p) + 1, "name": p, "units": OPENAQ_UNITS[p]},
+                })
+            results.append({
+                "id": loc_id,
+                "name": f"Location {loc_id}",
+                "timezone": "America/New_York",
+                "country": {"id": 155, "code": "US", "name": "United States"},
+                "coordinates": {"latitude": 39.2 + (loc_id % 40) * 0.01, "longitude": -76.8 + (loc_id % 50) * 0.01},
+                "sensors": sensors,
+            })
+        return {"meta": {"found": n_locations, "page": page, "limit": limit}, "results": results}
+
+    def sensor_days(self, sensor_id: int, date_from: dt.date, date_to: dt.date) -> list:
+        # years of history ending at date_to, about 5% of days missing
+        first = max(date_from, date_to - dt.timedelta(days=365 * self.years))
+        n = (date_to - first).days
+        return [d for d in (first + i * DAY for i in range(n)) if (sensor_id * 31 + d.toordinal()) % 20]
+
+    def openaq_days(self, sensor_id: int, q) -> dict:
+        limit, page = int(q["limit"][0]), int(q["page"][0])
+        date_from = dt.date.fromisoformat(q["date_from"][0][:10])
+        date_to = dt.date.fromisoformat(q["date_to"][0][:10])
+        days = self.sensor_days(sensor_id, date_from, date_to)
+
+        results = []
+        for d in days[(page - 1) * limit:page * limit]:
+            avg = 5 + (sensor_id % 7) + (d.toordinal() % 29) / 3
+            day = d.isoformat()
+            results.append({
+                "value": avg,
+                "parameter": {"name": self.sensor_parameter(sensor_id)},
+                "summary": {
+                    "min": avg - 4, "q02": avg - 3.5, "q25": avg - 1, "median": avg,
+                    "q75": avg + 1, "q98": avg + 3.5, "max": avg + 4, "avg": avg, "sd": 1.5,
+                },
+                "coverage": {
+                    "expectedCount": 24, "observedCount": 24,
+                    "datetimeFrom": {"utc": f"{day}T05:00:00Z", "local": f"{day}T00:00:00-05:00"},
+                    "datetimeTo": {"utc": f"{d + DAY}T05:00:00Z", "local": f"{d + DAY}T00:00:00-05:00"},
+                },
+            })
+        return {"meta": {"found": len(days), "page": page, "limit": limit}, "results": results}
+
+    def openaq_hours(self, sensor_id: int, q) -> dict:
+        # the hours of sensor_days() (local midnight to midnight), about 1 in 23 hours missing
+        limit, page = int(q["limit"][0]), int(q["page"][0])
+        start = dt.datetime.fromisoformat(q["datetime_from"][0].rstrip("Z"))
+        end = dt.datetime.fromisoformat(q["datetime_to"][0].rstrip("Z"))
+        local_days = self.sensor_days(sensor_id, (start - UTC_OFFSET).date(), (end - UTC_OFFSET).date() + DAY)
+        hours = [
+            t for d in local_days for h in range(24)
+            if start <= (t := dt.datetime.combine(d, dt.time(h)) + UTC_OFFSET) <= end
+            and (sensor_id + d.toordinal() + h) % 23
+        ]
+
+        results = []
+        for t in hours[(page - 1) * limit:page * limit]:
+            local = t - UTC_OFFSET
+            value = 5 + (sensor_id % 7) + (local.toordinal() % 29) / 3 + (local.hour % 12) / 4
+            period = {
+                "label": "1hour", "interval": "01:00:00",
+                "datetimeFrom": {"utc": f"{t.isoformat()}Z", "local": f"{local.isoformat()}-05:00"},
+                "datetimeTo": {"utc": f"{(t + HOUR).isoformat()}Z", "local": f"{(local + HOUR).isoformat()}-05:00"},
+            }
+            results.append({
+                "value": value,
+                "parameter": {"name": self.sensor_parameter(sensor_id)},
+                "period": period,
+                "summary": {"min": value - 0.5, "max": value + 0.5, "avg": value, "sd": 0.3},
+                "coverage": {"expectedCount": 1, "observedCount": 1},
+            })
+        return {"meta": {"found": len(hours), "page": page, "limit": limit}, "results": results}
+
+    # -- NCDC CDO ---------------------------------------------------------
+
+    def station_ids(self) -> list:
+        return [f"GHCND:USW{i:08d}" for i in range(1, self.stations + 1)]
+
+    def cdo_stations(self, q) -> dict:
+        limit, offset = int(q["limit"][0]), int(q["offset"][0])
+        ids = self.station_ids()
+        results = [
+            {"id": sid, "name": f"STATION {i}, MD US", "latitude": 39.0 + i * 0.01, "longitude": -76.5 - i * 0.01}
+            for i, sid in enumerate(ids[offset - 1:offset - 1 + limit], start=offset)
+        ]
+        if not results:
+            return {}
+        return {"metadata": {"resultset": {"offset": offset, "count": len(ids), "limit": limit}}, "results": results}
+
+    def cdo_data(self, q) -> dict:
+        limit, offset = int(q["limit"][0]), int(q["offset"][0])
+        start = dt.date.fromisoformat(q["startdate"][0])
+        end = dt.date.fromisoformat(q["enddate"][0])
+        stations = sorted(q.get("stationid", []))
+        datatypes = sorted(q.get("datatypeid", []))
+
+        # CDO orders by date, then datatype, then station
+        per_day = len(stations) * len(datatypes)
+        total = ((end - start).days + 1) * per_day
+        results = []
+        for i in range(offset - 1, min(offset - 1 + limit, total)):
+            d = start + (i // per_day) * DAY
+            datatype = datatypes[(i % per_day) // len(stations)]
+            station = stations[i % len(stations)]
+            doy = d.timetuple().tm_yday
+            if datatype == "PRCP":
+                value = round(((doy * 7 + len(station)) % 11) / 10 * (doy % 3 == 0), 2)
+            else:
+                value = 35 + 25 * (1 - abs(doy - 200) / 200) + (10 if datatype == "TMAX" else 0)
+            results.append({
+                "date": f"{d.isoformat()}T00:00:00",
+                "datatype": datatype,
+                "station": station,
+                "attributes": ",,W,2400",
+                "value": round(value, 1),
+            })
+        if not results:
+            return {}
+        return {"metadata": {"resultset": {"offset": offset, "count": total, "limit": limit}}, "results": results}
+
+    # -- NOAA GML ---------------------------------------------------------
+
+    def gml_csv(self, name: str):
+        last_year = dt.date.today().year - 1
+        header = "# synthetic NOAA GML Mauna Loa CO2 file\n#\n"
+
+        def ppm(t: float) -> float:
+            return round(330 + 1.9 * (t - CO2_FIRST_YEAR), 2)
+
+        if name == "co2_daily_mlo.csv":
+            d, lines = dt.date(CO2_FIRST_YEAR, 5, 19), []
+            while d.year <= last_year:
+                if d.toordinal() % 9:
+                    t = d.year + (d.timetuple().tm_yday - 0.5) / 365
+                    lines.append(f"{d.year},{d.month:2d},{d.day:2d},{t:.4f},{ppm(t):.2f}")
+                d += DAY
+            return header + "\n".join(lines) + "\n"
+
+        if name == "co2_mm_mlo.csv":
+            lines = ["year,month,decimal date,average,deseasonalized,ndays,sdev,unc"]
+            for year in range(CO2_FIRST_YEAR, last_year + 1):
+                for month in range(1, 13):
+                    t = year + (month - 0.5) / 12
+                    lines.append(f"{year},{month},{t:.4f},{ppm(t):.2f},{ppm(t) - 0.3:.2f},27,0.4,0.11")
+            return header + "\n".join(lines) + "\n"
+
+        if name == "co2_annmean_mlo.csv":
+            lines = ["year,mean,unc"]
+            lines += [f"{year},{ppm(year + 0.5):.2f},0.12" for year in range(CO2_FIRST_YEAR, last_year + 1)]
+            return header + "\n".join(lines) + "\n"
+
+        return None
+
+    def report(self) -> dict:
+        """Requests and 429s served per endpoint."""
+        if self.process is not None:
+            with urlopen(f"{self.url}/_stats") as r:
+                return json.load(r)
+        with self.lock:
+            return {"calls": dict(self.calls), "throttled": dict(self.throttled)}
+
+
+def _serve(options: dict, conn):
+    mock = MockAPIs(**options).start()
+    conn.send(mock.port)
+    threading.Event().wait()
@@ -0,0 +1,76 @@
+"""
+Synthetic frames shaped like the real pipeline output, for offline benchmarks.
+"""
+
+import numpy as np
+import pandas as pd
+
+OPENAQ_PARAMETERS = ["pm25", "co", "o3", "so2", "no2", "nox", "pm1", "pm10"]
+OPENAQ_UNITS = {"pm25": "µg/m³", "pm1": "µg/m³", "pm10": "µg/m³", "co": "ppm", "o3": "ppm", "so2": "ppm", "no2": "ppm", "nox": "ppm"}
+
+
+def openaq_daily(sensors: int = 100, days: int = 365, seed: int = 0, gap_rate: float = 0.05) -> pd.DataFrame:
+    """Gap-filled openaq_daily frame: one row per sensor per day."""
+    rng = np.random.default_rng(seed)
+    n = sensors * days
+
+    sensor_id = np.repeat(np.arange(1, sensors + 1), days)
+    location_id = (sensor_id - 1) // 4 + 1
+    parameter = np.array(OPENAQ_PARAMETERS)[(sensor_id - 1) % len(OPENAQ_PARAMETERS)]
+    dates = np.tile(pd.date_range("2016-01-01", periods=days, freq="D").values, sensors)
+
+    avg = rng.gamma(2.0, 5.0, n)
+    spread = rng.gamma(1.5, 2.0, n)
+    stats = {
+        "value": avg,
+        "min": np.maximum(avg - 2 * spread, 0),
+        "q02": np.maximum(avg - 2 * spread, 0),
+        "q25": np.maximum(avg - spread / 2, 0),
+        "median": avg,
+        "q75": avg + spread / 2,
+        "q98": avg + 2 * spread,
+        "max": avg + 3 * spread,
+        "avg": avg,
+        "sd": spread,
+    }
+
+    missing = rng.random(n) < gap_rate
+    for v in stats.values():
+        v[missing] = np.nan
+
+    df = pd.DataFrame({
+        "sensor_id": sensor_id,
+        "location_id": location_id,
+        "location_name": pd.Series(location_id).map(lambda i: f"Location {i}").to_numpy(),
+        "parameter": parameter,
+        "parameter_units": pd.Series(parameter).map(OPENAQ_UNITS).to_numpy(),
+        **stats,
+        "date": dates,
+    })
+    df["has_measurement"] = df["avg"].notna()
+    return df
+
+
+def ncdc_ghcnd(stations: int = 2, days: int = 365, seed: int = 0) -> pd.DataFrame:
+    """Long-format GHCND frame as returned by NCDCDO.get_data_year."""
+    rng = np.random.default_rng(seed)
+    datatypes = ["TMAX", "TMIN", "PRCP"]
+
+    station_ids = [f"GHCND:USW0000{9000 + i}" for i in range(stations)]
+    dates = pd.date_range("1999-01-01", periods=days, freq="D").strftime("%Y-%m-%dT00:00:00")
+
+    idx = pd.MultiIndex.from_product([station_ids, dates, datatypes], names=["station_id", "date", "datatype"])
+    df = idx.to_frame(index=False)
+
+    n = len(df)
+    value = np.where(
+        df["datatype"] == "PRCP",
+        np.round(rng.exponential(0.1, n), 2),
+        np.round(rng.normal(60, 18, n)),
+    )
+    df["value"] = value
+    df["attributes"] = ",,W,2400"
+    df = df.rename(columns={"station_id": "station"})
+    df["station_name"] = df["station"]
+    df["unit"] = np.where(df["datatype"] == "PRCP", "in", "F")
+    return df
@@ -0,0 +1,152 @@
+"""
+Local Parquet data lake for the raw -> final pipeline stages.
+
+Every stage/source is a hive-partitioned dataset:
+    {LAKE_DIR}/{stage}/source={source}/parameter={parameter}/year={year}/*.parquet
+Reads push filters down to the partition directories and row groups and
+memory-map the files, so transforms and reloads can run from disk instead of
+re-hitting the APIs.
+"""
+
+import json
+import os
+import shutil
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+LAKE_DIR = os.getenv("LAKE_DIR", os.path.join(os.path.dirname(__file__), "lake"))
+STAGES = ("raw", "final")
+
+# schema metadata key listing partition columns write_stage added to the frame
+LAKE_ADDED_KEY = b"lake_added_columns"
+
+
+def stage_path(stage: str, source: str = None) -> str:
+    if stage not in STAGES:
+        raise ValueError(f"unknown stage {stage!r}; expected one of {STAGES}")
+    path = os.path.join(LAKE_DIR, stage)
+    return os.path.join(path, f"source={source}") if source else path
+
+
+def has_stage(stage: str, source: str) -> bool:
+    return os.path.isdir(stage_path(stage, source))
+
+
+def write_stage(
+    df: pd.DataFrame,
+    stage: str,
+    source: str,
+    parameter_col: str = "parameter",
+    date_col: str = "date",
+    mode: str = "replace",
+) -> str:
+    """
+    Writes df under stage/source, partitioned by parameter (taken from parameter_col,
+    or "all" when the frame has none) and calendar year of date_col.
+
+    mode="replace" rewrites only the partitions df touches; mode="append" adds
+    new files next to existing ones (for chunked writers).
+    """
+    path = stage_path(stage, source)
+    _write(df, path, parameter_col, date_col, mode)
+    return path
+
+
+def write_stage_chunks(frames, stage: str, source: str, parameter_col: str = "parameter", date_col: str = "date"):
+    """
+    Passes frames through, writing each one into a fresh copy of stage/source
+    that replaces the old one once the last frame is through. A stream that
+    stops early (e.g. IncompleteRun) leaves the previous copy in place.
+    """
+    path = stage_path(stage, source)
+    new, old = f"{path}.new", f"{path}.old"
+    shutil.rmtree(new, ignore_errors=True)
+    os.makedirs(new)
+    try:
+        for df in frames:
+            _write(df, new, parameter_col, date_col, mode="append")
+            yield df
+    except BaseException:
+        shutil.rmtree(new, ignore_errors=True)
+        raise
+
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.isdir(path):
+        os.replace(path, old)
+    os.replace(new, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _write(df: pd.DataFrame, path: str, parameter_col: str, date_col: str, mode: str):
+    if df.empty:
+        return
+
+    df = df.copy()
+    added = []
+    if "parameter" not in df.columns:
+        df["parameter"] = df[parameter_col].astype(str) if parameter_col in df.columns else "all"
+        added.append("parameter")
+    if "year" not in df.columns:
+        df["year"] = pd.to_datetime(df[date_col]).dt.year.astype("int32")
+        added.append("year")
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        LAKE_ADDED_KEY: ",".join(added).encode(),
+    })
+
+    ds.write_dataset(
+        table,
+        path,
+        format="parquet",
+        partitioning=ds.partitioning(
+            pa.schema([table.schema.field("parameter"), table.schema.field("year")]),
+            flavor="hive",
+        ),
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="delete_matching" if mode == "replace" else "overwrite_or_ignore",
+    )
+
+
+def read_stage(stage: str, source: str, filters=None, columns=None, memory_map: bool = True) -> pd.DataFrame:
+    """
+    Reads stage/source back into a frame.
+
+    filters uses pyarrow's DNF form, e.g. [("parameter", "=", "pm25"), ("year", ">=", 2020)];
+    conditions on partition columns prune whole directories, the rest use row-group stats.
+    """
+    path = stage_path(stage, source)
+    first = next(_files(path), None) if os.path.isdir(path) else None
+    if first is None:
+        return pd.DataFrame()
+
+    table = pq.read_table(
+        path,
+        columns=columns,
+        filters=filters,
+        memory_map=memory_map,
+        partitioning="hive",
+    )
+    df = table.to_pandas()
+
+    # drop the partition columns write_stage had to add; a frame's own parameter/year stay
+    metadata = pq.read_schema(first).metadata or {}
+    added = [c for c in metadata.get(LAKE_ADDED_KEY, b"").decode().split(",") if c]
+    df = df.drop(columns=[c for c in added if c in df.columns and (columns is None or c not in columns)])
+
+    # partition columns come back last; put them where the written frame had them
+    written = [c["name"] for c in json.loads(metadata.get(b"pandas", b'{"columns": []}'))["columns"]]
+    order = [c for c in written if c in df.columns]
+    return df[order + [c for c in df.columns if c not in order]]
+
+
+def _files(path: str):
+    for root, _, files in os.walk(path):
+        for f in files:
+            if f.endswith(".parquet"):
+                yield os.path.join(root, f)
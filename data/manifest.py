@@ -0,0 +1,200 @@
+"""
+Checkpoint manifest for long extraction runs.
+
+Every unit of work (an OpenAQ sensor window, an NCDC station batch/year) is
+recorded in a small SQLite file with its status and the file holding its
+output. A rerun with resume=True reads finished units back from disk instead
+of calling the API again, and only refetches failed or missing ones.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from data import lake
+
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", os.path.join(lake.LAKE_DIR, "manifest.sqlite"))
+
+DONE = "done"
+FAILED = "failed"
+
+
+class IncompleteRun(RuntimeError):
+    """Units of a source failed this run, so what was fetched for it is partial."""
+
+    def __init__(self, source: str, failed: list):
+        super().__init__(
+            f"{len(failed):,} {source} unit(s) failed this run (first: {failed[0][0]}: {failed[0][1]}); "
+            f"rerun with --resume to retry just those"
+        )
+        self.source = source
+        self.failed = failed
+
+
+class Manifest:
+    def __init__(self, path: str = MANIFEST_PATH, resume: bool = True):
+        self.path = path
+        self.resume = resume
+        self.units_dir = os.path.join(os.path.dirname(path), "units")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS units (
+                source TEXT NOT NULL,
+                unit TEXT NOT NULL,
+                status TEXT NOT NULL,
+                output TEXT,
+                rows INTEGER,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (source, unit)
+            )
+            """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+            """
+        )
+        if not resume:
+            self.conn.execute("DELETE FROM units")
+            self.conn.execute("DELETE FROM settings")
+        self.conn.commit()
+
+        self.skipped = []
+        self.completed = []
+        self.failed = []
+
+    def setting(self, key: str, default: str) -> str:
+        """
+        A run-wide value (e.g. the end date unit keys are built from): the one
+        stored by the run being resumed, otherwise default, stored for later resumes.
+        """
+        with self.lock:
+            self.conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", (key, default))
+            self.conn.commit()
+            return self.conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()[0]
+
+    def _output_path(self, source: str, unit: str) -> str:
+        # unit keys can list dozens of station ids, past the file name limit;
+        # the readable key stays in the units table
+        name = hashlib.sha1(unit.encode("utf-8")).hexdigest()
+        return os.path.join(self.units_dir, source, f"{name}.json.gz")
+
+    def status(self, source: str, unit: str):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status FROM units WHERE source = ? AND unit = ?", (source, unit)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load(self, source: str, unit: str):
+        """Saved output of a finished unit, or None if it has to be (re)fetched."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT output FROM units WHERE source = ? AND unit = ? AND status = ?",
+                (source, unit, DONE),
+            ).fetchone()
+        if not row or not row[0] or not os.path.exists(row[0]):
+            return None
+
+        with gzip.open(row[0], "rt", encoding="utf-8") as f:
+            records = json.load(f)
+        with self.lock:
+            self.skipped.append((source, unit))
+        return records
+
+    def save(self, source: str, unit: str, records: list):
+        """Writes a unit's output next to the manifest and marks it done."""
+        path = self._output_path(source, unit)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(records, f)
+        os.replace(tmp, path)
+
+        self._upsert(source, unit, DONE, output=path, rows=len(records))
+        with self.lock:
+            self.completed.append((source, unit))
+
+    def fail(self, source: str, unit: str, error):
+        self._upsert(source, unit, FAILED, error=str(error))
+        with self.lock:
+            self.failed.append((source, unit, str(error)))
+
+    def _upsert(self, source, unit, status, output=None, rows=None, error=None):
+        with self.lock:
+            self.conn.execute(
+                """
+                INSERT INTO units (source, unit, status, output, rows, error, attempts, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+                ON CONFLICT (source, unit) DO UPDATE SET
+                    status = excluded.status,
+                    output = excluded.output,
+                    rows = excluded.rows,
+                    error = excluded.error,
+                    attempts = units.attempts + 1,
+                    updated_at = excluded.updated_at
+                """,
+                (source, unit, status, output, rows, error, time.time()),
+            )
+            self.conn.commit()
+
+    def failures(self, source: str) -> list:
+        """(unit, error) for every unit of source that failed this run."""
+        with self.lock:
+            return [(u, e) for s, u, e in self.failed if s == source]
+
+    def check(self, source: str, partial_ok: bool = False):
+        """
+        Raises IncompleteRun if any of source's units failed this run, so a load
+        stops before writing partial data. With partial_ok it only warns.
+        """
+        failed = self.failures(source)
+        if not failed:
+            return
+        if not partial_ok:
+            raise IncompleteRun(source, failed)
+        print(f"[manifest] WARN loading {source} without {len(failed):,} failed unit(s)")
+
+    def incomplete(self) -> list:
+        """Every unit still marked failed, including ones from earlier runs."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT source, unit, attempts, error FROM units WHERE status = ? ORDER BY source, unit",
+                (FAILED,),
+            ).fetchall()
+
+    def report(self) -> dict:
+        return {
+            "skipped": len(self.skipped),
+            "completed": len(self.completed),
+            "failed": len(self.failed),
+            "incomplete": [
+                {"source": s, "unit": u, "attempts": a, "error": e} for s, u, a, e in self.incomplete()
+            ],
+        }
+
+    def print_report(self):
+        r = self.report()
+        print(
+            f"[manifest] {r['completed']:,} units fetched, {r['skipped']:,} skipped (already done), "
+            f"{r['failed']:,} failed this run"
+        )
+        for u in r["incomplete"]:
+            print(f"[manifest] INCOMPLETE {u['source']} {u['unit']} (attempts={u['attempts']}): {u['error']}")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
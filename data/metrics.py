@@ -0,0 +1,249 @@
+"""
+Run metrics for the extraction and load pipeline.
+
+Hot paths record into one process-wide registry:
+    - HTTP requests per source: count, latency histogram, bytes received,
+      retries and time slept on 429/5xx responses
+    - stages per (stage, source): calls, busy seconds, rows produced, rows/s
+At the end of a run write_report() dumps a JSON run report and a Prometheus
+textfile (for node_exporter's textfile collector).
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(os.path.dirname(__file__), "metrics"))
+PROM_FILE = "pipeline.prom"
+
+# upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+_lock = threading.Lock()
+_requests = {}
+_stages = {}
+_started = time.time()
+
+
+def _request_entry(source: str) -> dict:
+    if source not in _requests:
+        _requests[source] = {
+            "requests": 0,
+            "errors": 0,
+            "bytes": 0,
+            "seconds": 0.0,
+            "retries": 0,
+            "rate_limited": 0,
+            "sleep_s": 0.0,
+            "buckets": [0] * len(LATENCY_BUCKETS),
+        }
+    return _requests[source]
+
+
+def _stage_entry(stage: str, source: str) -> dict:
+    key = (stage, source)
+    if key not in _stages:
+        _stages[key] = {"calls": 0, "seconds": 0.0, "rows": 0}
+    return _stages[key]
+
+
+def observe_request(source: str, seconds: float, nbytes: int = 0, ok: bool = True):
+    """One HTTP round trip: latency, response size and whether it succeeded."""
+    with _lock:
+        e = _request_entry(source)
+        e["requests"] += 1
+        e["seconds"] += seconds
+        e["bytes"] += nbytes
+        if not ok:
+            e["errors"] += 1
+        for i, le in enumerate(LATENCY_BUCKETS):
+            if seconds <= le:
+                e["buckets"][i] += 1
+                break
+
+
+def _wire_bytes(r) -> int:
+    """Body bytes as received: len(r.content) is after gzip decoding."""
+    length = r.headers.get("Content-Length", "")
+    if length.isdigit():
+        return int(length)
+    # otherwise what urllib3 counted off the connection; it doesn't count chunked
+    # bodies, which are left as decoded bytes
+    tell = getattr(r.raw, "tell", None)
+    return (tell() if tell is not None else 0) or len(r.content)
+
+
+def observe_response(source: str, r):
+    """observe_request for a requests.Response; r.elapsed excludes time spent waiting on the rate limiter."""
+    observe_request(source, r.elapsed.total_seconds(), _wire_bytes(r), r.ok)
+
+
+def observe_retry(source: str, sleep_s: float = 0.0, rate_limited: bool = False):
+    """A retried request and the time the caller backs off (or is paused by Retry-After)."""
+    with _lock:
+        e = _request_entry(source)
+        e["retries"] += 1
+        e["sleep_s"] += sleep_s
+        if rate_limited:
+            e["rate_limited"] += 1
+
+
+class StageTimer:
+    def __init__(self):
+        self.rows = 0
+
+
+@contextmanager
+def timed(stage: str, source: str):
+    """
+    Times the block as one call of (stage, source); set .rows on the yielded
+    timer to record how many rows it produced. Time is recorded even on error.
+    """
+    timer = StageTimer()
+    start = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        record(stage, source, time.perf_counter() - start, timer.rows)
+
+
+def record(stage: str, source: str, seconds: float, rows: int = 0):
+    """One call of (stage, source) timed elsewhere (e.g. in a worker process)."""
+    with _lock:
+        e = _stage_entry(stage, source)
+        e["calls"] += 1
+        e["seconds"] += seconds
+        e["rows"] += rows
+
+
+def report() -> dict:
+    with _lock:
+        requests = {}
+        for source, e in _requests.items():
+            requests[source] = {
+                **{k: v for k, v in e.items() if k != "buckets"},
+                "mean_latency_s": e["seconds"] / e["requests"] if e["requests"] else 0.0,
+                "latency_histogram": {
+                    ("+Inf" if le == float("inf") else str(le)): n
+                    for le, n in zip(LATENCY_BUCKETS, e["buckets"])
+                },
+            }
+        stages = [
+            {
+                "stage": stage,
+                "source": source,
+                **e,
+                "rows_per_s": e["rows"] / e["seconds"] if e["seconds"] else 0.0,
+            }
+            for (stage, source), e in _stages.items()
+        ]
+
+    return {
+        "started_at": _started,
+        "wall_s": time.time() - _started,
+        "requests": requests,
+        "stages": sorted(stages, key=lambda s: -s["seconds"]),
+    }
+
+
+def _prom_labels(**labels) -> str:
+    def esc(v):
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels.items()) + "}"
+
+
+def prometheus_text() -> str:
+    """Current registry in the Prometheus text exposition format."""
+    r = report()
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+    reqs = r["requests"]
+    metric("pipeline_http_requests_total", "counter", "HTTP requests sent.",
+           [(_prom_labels(source=s), e["requests"]) for s, e in reqs.items()])
+    metric("pipeline_http_errors_total", "counter", "HTTP requests that failed or returned an error status.",
+           [(_prom_labels(source=s), e["errors"]) for s, e in reqs.items()])
+    metric("pipeline_http_response_bytes_total", "counter", "Response body bytes received.",
+           [(_prom_labels(source=s), e["bytes"]) for s, e in reqs.items()])
+    metric("pipeline_http_retries_total", "counter", "Requests retried after an error or 429.",
+           [(_prom_labels(source=s), e["retries"]) for s, e in reqs.items()])
+    metric("pipeline_http_rate_limited_total", "counter", "429 responses received.",
+           [(_prom_labels(source=s), e["rate_limited"]) for s, e in reqs.items()])
+    metric("pipeline_http_retry_sleep_seconds_total", "counter", "Seconds spent backing off before retries.",
+           [(_prom_labels(source=s), e["sleep_s"]) for s, e in reqs.items()])
+
+    lines.append("# HELP pipeline_http_request_seconds HTTP request latency.")
+    lines.append("# TYPE pipeline_http_request_seconds histogram")
+    for s, e in reqs.items():
+        cumulative = 0
+        for le, n in e["latency_histogram"].items():
+            cumulative += n
+            lines.append(f"pipeline_http_request_seconds_bucket{_prom_labels(source=s, le=le)} {cumulative}")
+        lines.append(f"pipeline_http_request_seconds_sum{_prom_labels(source=s)} {e['seconds']}")
+        lines.append(f"pipeline_http_request_seconds_count{_prom_labels(source=s)} {e['requests']}")
+
+    stages = r["stages"]
+    metric("pipeline_stage_seconds_total", "counter", "Seconds spent in each pipeline stage.",
+           [(_prom_labels(stage=s["stage"], source=s["source"]), s["seconds"]) for s in stages])
+    metric("pipeline_stage_calls_total", "counter", "Times each pipeline stage ran.",
+           [(_prom_labels(stage=s["stage"], source=s["source"]), s["calls"]) for s in stages])
+    metric("pipeline_stage_rows_total", "counter", "Rows produced by each pipeline stage.",
+           [(_prom_labels(stage=s["stage"], source=s["source"]), s["rows"]) for s in stages])
+    metric("pipeline_stage_rows_per_second", "gauge", "Rows produced per second of stage time.",
+           [(_prom_labels(stage=s["stage"], source=s["source"]), s["rows_per_s"]) for s in stages])
+    metric("pipeline_run_wall_seconds", "gauge", "Wall-clock seconds since the run started.",
+           [("", r["wall_s"])])
+
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path: str, content: str):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def write_report(out_dir: str = METRICS_DIR, extra: dict = None) -> str:
+    """
+    Writes run-<timestamp>.json and (overwriting) the Prometheus textfile to out_dir.
+    extra is merged into the JSON report (e.g. rate limiter or manifest summaries).
+    Returns the JSON report's path.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    r = {**report(), **(extra or {})}
+
+    path = os.path.join(out_dir, time.strftime("run-%Y%m%dT%H%M%S.json", time.localtime(_started)))
+    _write_atomic(path, json.dumps(r, indent=2, default=str))
+    _write_atomic(os.path.join(out_dir, PROM_FILE), prometheus_text())
+    return path
+
+
+def print_report():
+    r = report()
+    print(f"[metrics] run wall time {r['wall_s']:.1f}s")
+    for source, e in r["requests"].items():
+        print(
+            f"[metrics] {source}: {e['requests']:,} requests, {e['bytes'] / 1e6:.1f} MB, "
+            f"mean {e['mean_latency_s'] * 1000:.0f} ms, {e['retries']} retries "
+            f"({e['rate_limited']} x 429, {e['sleep_s']:.1f}s slept)"
+        )
+    for s in r["stages"]:
+        print(
+            f"[metrics] {s['stage']}/{s['source']}: {s['seconds']:.2f}s over {s['calls']} calls, "
+            f"{s['rows']:,} rows ({s['rows_per_s']:,.0f} rows/s)"
+        )
+
+
+def reset():
+    global _started
+    with _lock:
+        _requests.clear()
+        _stages.clear()
+        _started = time.time()
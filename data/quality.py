@@ -0,0 +1,230 @@
+"""
+Vectorized data-quality checks run on each frame before it is loaded.
+
+Every check is whole-column numpy/pandas work (comparisons, one sort, one
+groupby transform), never a Python loop over rows, so validating a few
+million rows adds seconds, not minutes. Results are kept as one qa_flags
+bitmask column per row (0 = clean) and a per-check summary:
+
+    range       value outside the plausible range for its parameter and unit
+    order       summary stats out of order (min <= q02 <= ... <= q98 <= max, avg within min..max)
+    unit        unit not listed in RANGES for the parameter, or a series reporting more than one unit
+    duplicate   natural key repeated in the frame (all but the last copy, the one the load keeps)
+    spike       value far above or below both neighbours in its series
+
+Rows are flagged, never dropped; queries can filter on qa_flags & <bit>.
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+RANGE = 1
+ORDER = 2
+UNIT = 4
+DUPLICATE = 8
+SPIKE = 16
+FLAGS = {"range": RANGE, "order": ORDER, "unit": UNIT, "duplicate": DUPLICATE, "spike": SPIKE}
+
+# (parameter, unit) -> plausible (low, high); small negatives are normal instrument noise
+RANGES = {
+    ("pm25", "µg/m³"): (-5, 1_000),
+    ("pm10", "µg/m³"): (-5, 2_000),
+    ("pm1", "µg/m³"): (-5, 1_000),
+    ("o3", "ppm"): (-0.01, 0.6),
+    ("no2", "ppm"): (-0.01, 2),
+    ("nox", "ppm"): (-0.01, 4),
+    ("so2", "ppm"): (-0.01, 2),
+    ("co", "ppm"): (-0.1, 50),
+    ("o3", "µg/m³"): (-10, 1_200),
+    ("no2", "µg/m³"): (-10, 4_000),
+    ("so2", "µg/m³"): (-10, 5_000),
+    ("co", "µg/m³"): (-100, 60_000),
+    # GHCND fetched with units=standard
+    ("TMAX", "Fahrenheit (°F)"): (-80, 135),
+    ("TMIN", "Fahrenheit (°F)"): (-80, 135),
+    ("PRCP", "inches (in)"): (0, 30),
+}
+
+# how many robust standard deviations a jump must exceed on both sides to be a spike
+SPIKE_K = float(os.getenv("QA_SPIKE_K", "8"))
+# naturally spiky series (rain) are left out of spike detection
+SPIKE_SKIP = {"PRCP"}
+
+# per table: natural key, series (for spikes and unit drift), time column,
+# the value to range/spike check, ordered stat columns, parameter and unit columns
+TABLES = {
+    "openaq_daily": dict(
+        keys=["sensor_id", "date"], series=["sensor_id"], time="date", value="avg",
+        order=["min", "q02", "q25", "median", "q75", "q98", "max"],
+        parameter="parameter", unit="parameter_units",
+    ),
+    "openaq_hourly": dict(
+        keys=["sensor_id", "datetime_utc"], series=["sensor_id"], time="datetime_utc", value="value",
+        order=["min", "value", "max"],
+        parameter="parameter", unit="parameter_units",
+    ),
+    "noaa_ncdc_ghcnd_daily": dict(
+        keys=["station_id", "date", "datatype"], series=["station_id", "datatype"], time="date", value="value",
+        order=[],
+        parameter="datatype", unit="unit",
+    ),
+}
+
+_summary = []
+_summary_lock = threading.Lock()
+
+
+def is_checked(table_name: str) -> bool:
+    return table_name in TABLES
+
+
+def range_positions(df: pd.DataFrame, parameter: str, unit: str) -> np.ndarray:
+    """Each row's position in RANGES by (parameter, unit); -1 when the pair isn't known."""
+    pairs = pd.MultiIndex.from_arrays([df[parameter], df[unit]])
+    return pd.MultiIndex.from_tuples(list(RANGES)).get_indexer(pairs)
+
+
+def check_range(df: pd.DataFrame, value_cols: list[str], positions: np.ndarray) -> np.ndarray:
+    bounds = np.array(list(RANGES.values()), dtype=float)
+    known = positions >= 0
+    lo = np.where(known, bounds[positions, 0], -np.inf)[:, None]
+    hi = np.where(known, bounds[positions, 1], np.inf)[:, None]
+    values = df[value_cols].to_numpy(dtype=float)
+    return ((values < lo) | (values > hi)).any(axis=1)
+
+
+def check_order(df: pd.DataFrame, cols: list[str], avg: str = None) -> np.ndarray:
+    cols = [c for c in cols if c in df.columns]
+    if len(cols) < 2:
+        return np.zeros(len(df), dtype=bool)
+    v = df[cols].to_numpy(dtype=float)
+    # float32 stats: tolerate rounding; NaN comparisons are False, so gaps pass
+    tol = 1e-5 * np.maximum(np.abs(v[:, 1:]), 1)
+    bad = (np.diff(v, axis=1) < -tol).any(axis=1)
+    if avg is not None and avg in df.columns and avg not in cols:
+        a = df[avg].to_numpy(dtype=float)
+        bad |= (a < v[:, 0] - tol[:, 0]) | (a > v[:, -1] + tol[:, -1])
+    return bad
+
+
+def check_units(df: pd.DataFrame, positions: np.ndarray, unit: str, series: list[str]) -> np.ndarray:
+    bad = positions < 0
+    # a series that switches unit mid-stream can't be compared across the switch
+    seen = df[series + [unit]].drop_duplicates()
+    drifting = seen[seen.duplicated(series, keep=False)]
+    if not drifting.empty:
+        rows = pd.MultiIndex.from_frame(df[series])
+        bad = bad | rows.isin(pd.MultiIndex.from_frame(drifting[series].drop_duplicates()))
+    return bad
+
+
+def check_duplicates(df: pd.DataFrame, keys: list[str]) -> np.ndarray:
+    return df.duplicated(keys, keep="last").to_numpy()
+
+
+def check_spikes(df: pd.DataFrame, series: list[str], time: str, value: str, parameter: str = None, k: float = SPIKE_K) -> np.ndarray:
+    """
+    Flags measured values that jump the same way away from both neighbours in
+    their series (sorted by time) by more than k robust standard deviations of
+    that series' step sizes.
+    """
+    out = np.zeros(len(df), dtype=bool)
+    v = df[value].to_numpy(dtype=float)
+    use = ~np.isnan(v)
+    if parameter is not None and SPIKE_SKIP:
+        use &= ~df[parameter].isin(SPIKE_SKIP).to_numpy()
+    idx = np.flatnonzero(use)
+    if len(idx) < 3:
+        return out
+
+    if len(series) == 1:
+        group = pd.factorize(df[series[0]].to_numpy()[idx])[0]
+    else:
+        group = df.iloc[idx].groupby(series, sort=False, observed=True).ngroup().to_numpy()
+    t = df[time].to_numpy()[idx]
+    # loaders emit each series in time order; only sort when that isn't so
+    step = np.diff(group)
+    if (step >= 0).all() and (t[1:][step == 0] >= t[:-1][step == 0]).all():
+        order = np.arange(len(idx))
+    else:
+        order = np.lexsort((t, group))
+    g, x = group[order], v[idx][order]
+
+    same_prev = np.r_[False, g[1:] == g[:-1]]
+    same_next = np.r_[g[1:] == g[:-1], False]
+    d_prev = np.where(same_prev, x - np.r_[np.nan, x[:-1]], np.nan)
+    d_next = np.where(same_next, x - np.r_[x[1:], np.nan], np.nan)
+
+    # median absolute step per series, scaled to a standard deviation
+    scale = pd.Series(np.abs(d_prev)).groupby(g).transform("median").to_numpy() * 1.4826
+    limit = k * np.maximum(np.nan_to_num(scale), 1e-6)
+    spike = (d_prev * d_next > 0) & (np.abs(d_prev) > limit) & (np.abs(d_next) > limit)
+
+    out[idx[order]] = spike
+    return out
+
+
+def validate(df: pd.DataFrame, table_name: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Runs every check configured for table_name. Returns df with a qa_flags column
+    (replacing any previous one) and a summary frame: one row per check with the
+    number of rows checked and flagged.
+    """
+    spec = TABLES[table_name]
+    flags = np.zeros(len(df), dtype=np.int16)
+    counts = {}
+
+    if len(df):
+        value_cols = [c for c in [spec["value"], *spec["order"]] if c in df.columns]
+        positions = range_positions(df, spec["parameter"], spec["unit"])
+        results = {
+            "range": check_range(df, value_cols, positions),
+            "order": check_order(df, spec["order"], avg=spec["value"]),
+            "unit": check_units(df, positions, spec["unit"], spec["series"]),
+            "duplicate": check_duplicates(df, spec["keys"]),
+            "spike": check_spikes(df, spec["series"], spec["time"], spec["value"], spec["parameter"]),
+        }
+        for name, bad in results.items():
+            flags[bad] |= FLAGS[name]
+            counts[name] = int(bad.sum())
+    else:
+        counts = dict.fromkeys(FLAGS, 0)
+
+    df = df.assign(qa_flags=flags)
+    summary = pd.DataFrame({
+        "table_name": table_name,
+        "check": list(counts),
+        "rows": len(df),
+        "flagged": list(counts.values()),
+    })
+    return df, summary
+
+
+def record(summary: pd.DataFrame):
+    """Keeps a validate() summary until take_summary() (loads run on several threads)."""
+    with _summary_lock:
+        _summary.append(summary)
+
+
+def take_summary() -> pd.DataFrame:
+    """Every recorded summary since the last call, totalled per table and check."""
+    with _summary_lock:
+        parts = list(_summary)
+        _summary.clear()
+    if not parts:
+        return pd.DataFrame(columns=["table_name", "check", "rows", "flagged"])
+    return pd.concat(parts).groupby(["table_name", "check"], as_index=False, sort=False)[["rows", "flagged"]].sum()
+
+
+def describe(flags: int) -> list[str]:
+    """Names of the checks set in a qa_flags value."""
+    return [name for name, bit in FLAGS.items() if flags & bit]
+
+
+def print_report(summary: pd.DataFrame):
+    for r in summary.itertuples(index=False):
+        share = r.flagged / r.rows if r.rows else 0
+        print(f"[qa] {r.table_name}/{r.check}: {r.flagged:,} of {r.rows:,} rows flagged ({share:.2%})")
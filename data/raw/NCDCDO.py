@@ -1,11 +1,16 @@
-import requests
 import pandas as pd
 import numpy as np
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from openpyxl import load_workbook, Workbook
 from dotenv import load_dotenv
 from requests.exceptions import RequestException, HTTPError
+from data.raw import ratelimit, http_client
+from data.raw.gapfill import fill_daily_gaps
+from data import metrics
+from data.spatial import SpatialIndex
 
 load_dotenv()
 
@@ -25,6 +30,10 @@ BASE_URL = os.getenv("NCDC_CDO_URL")
 # url info
 headers = {"token": BASE_KEY}
 
+# Rate limits (published CDO quotas: 5 requests/second, 10,000 requests/day)
+QUOTAS = [(5, 1), (10_000, 86_400)]
+ratelimit.register(BASE_URL, QUOTAS)
+
 #Station ABV Constants
 MSCABV = "GHCND:USW00093784"
 BWIABV = "GHCND:USW00093721"
@@ -33,6 +42,30 @@ BWIABV = "GHCND:USW00093721"
 BWI = "BALTIMORE WASHINGTON INTERNATIONAL AIRPORT"
 MSC = "MARYLAND SCIENCE CENTER"
 
+# Default station id -> name mapping for GHCND loads
+STATIONS = {MSCABV: MSC, BWIABV: BWI}
+
+# GHCND fetch settings
+GHCND_DATATYPES = ["TMAX", "TMIN", "PRCP"]
+# Units of GHCND values as requested (units=standard); other datatypes are left unlabeled
+STANDARD_UNITS = {
+    "TMAX": "Fahrenheit (°F)",
+    "TMIN": "Fahrenheit (°F)",
+    "TAVG": "Fahrenheit (°F)",
+    "TOBS": "Fahrenheit (°F)",
+    "PRCP": "inches (in)",
+    "SNOW": "inches (in)",
+    "SNWD": "inches (in)",
+    "AWND": "mph",
+}
+FIRST_YEAR = 1999
+LAST_YEAR = 2025
+MAX_WORKERS = int(os.getenv("NCDC_MAX_WORKERS", "5"))
+# /data request timeout in seconds (the shared client defaults to HTTP_TIMEOUT, 60s)
+DATA_TIMEOUT = float(os.getenv("NCDC_DATA_TIMEOUT", "30"))
+# stationid values per /data request; CDO accepts the parameter repeated
+STATION_BATCH = int(os.getenv("NCDC_STATION_BATCH", "10"))
+
 """
 Function requests datasets endpoint information
 """
@@ -45,7 +78,7 @@ def get_datasets() -> list:
     while True:
         url = f"{BASE_URL}{datasets}"
         params = {"limit": limit, "offset": offset}
-        r = requests.get(url, headers=headers, params=params)
+        r = http_client.get(url, headers=headers, params=params)
         r.raise_for_status()
         data = r.json()
         results = data.get("results", [])
@@ -73,7 +106,7 @@ def get_datacategories() -> list:
     while True:
         url = f"{BASE_URL}{datacategories}"
         params = {"limit": limit, "offset": offset}
-        r = requests.get(url, headers=headers, params=params)
+        r = http_client.get(url, headers=headers, params=params)
         r.raise_for_status()
         data = r.json()
         results = data.get("results", [])
@@ -96,7 +129,7 @@ def get_datatypes() -> list:
     while True:
         url = f"{BASE_URL}{datatypes}"
         params = {"limit": limit, "offset": offset}
-        r = requests.get(url, headers=headers, params=params)
+        r = http_client.get(url, headers=headers, params=params)
         r.raise_for_status()
         data = r.json()
         results = data.get("results", [])
@@ -105,7 +138,6 @@ def get_datatypes() -> list:
         all_results.extend(results)
         print(f"Fetched {len(results)} locations (offset={offset})")
         offset += limit
-        time.sleep(1)
     return all_results
 
 def get_datatypes_ids() -> list:
@@ -126,7 +158,7 @@ def get_locationcategories() -> list:
     while True:
         url = f"{BASE_URL}{locationcategories}"
         params = {"limit": limit, "offset": offset}
-        r = requests.get(url, headers=headers, params=params)
+        r = http_client.get(url, headers=headers, params=params)
         r.raise_for_status()
         data = r.json()
         results = data.get("results", [])
@@ -148,7 +180,7 @@ def get_locations() -> list:
     url = f"{BASE_URL}{locations}"
     while True:
         params = {"limit": limit, "offset": offset, "locationcategoryid": "CITY"}
-        r = requests.get(url, headers=headers, params=params)
+        r = http_client.get(url, headers=headers, params=params)
         r.raise_for_status()
         data = r.json()
         results = data.get("results", [])
@@ -157,7 +189,6 @@ def get_locations() -> list:
         all_results.extend(results)
         print(f"Fetched {len(results)} locations (offset={offset})")
         offset += limit
-        time.sleep(.2)
         if len(results) < limit:
             break
     return all_results
@@ -181,8 +212,8 @@ def get_stations() -> list:
     all_results = []
     while True:
         url = f"{BASE_URL}{stations}"
-        params = {"limit": 1000, "offset": 1, "locationid": "CITY:US240002", "datasetid": "GSOY"}
-        r = requests.get(url, headers=headers, params=params)
+        params = {"limit": limit, "offset": offset, "locationid": "CITY:US240002", "datasetid": "GSOY"}
+        r = http_client.get(url, headers=headers, params=params)
         r.raise_for_status()
         data = r.json()
         results = data.get("results", [])
@@ -191,18 +222,56 @@ def get_stations() -> list:
         all_results.extend(results)
         print(f"Fetched {len(results)} stations (offset={offset})")
         offset += limit
-        time.sleep(.3)
         if len(results) < limit:
             break
     return all_results
 
+class StationCatalog:
+    """
+    The stations get_stations() returns, fetched once on first use and shared by
+    every loader in the run; refresh() forces a refetch.
+    """
+
+    def __init__(self):
+        self._stations = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> list:
+        stations = get_stations()
+        self._stations = stations
+        return stations
+
+    def stations(self) -> list:
+        with self._lock:
+            if self._stations is None:
+                self.refresh()
+            return self._stations
+
+    def names(self) -> dict:
+        """Station id -> name."""
+        return {st["id"]: st["name"] for st in self.stations()}
+
+catalog = StationCatalog()
+
+def station_index(stations: list = None) -> SpatialIndex:
+    """SpatialIndex keyed by station id over stations (default: the catalog's)."""
+    stations = catalog.stations() if stations is None else stations
+    return SpatialIndex((st["id"], st.get("latitude"), st.get("longitude")) for st in stations)
+
+class IncompleteFetch(RuntimeError):
+    """A paginated fetch gave up part-way; .partial holds the rows fetched before the failure."""
+
+    def __init__(self, message: str, partial: list):
+        super().__init__(message)
+        self.partial = partial
+
 """
 Function requests data endpoint information
 """
 def get_data(
     dataset_id: str,
     date: str,
-    station_id: str,
+    station_id: str | list[str],
     datatype_id: list[str],
     max_retries: int = 3,
     retry_delay: float = 2.0,
@@ -228,25 +297,34 @@ def get_data(
         attempt = 0
         while attempt < max_retries:
             try:
-                r = requests.get(url, headers=headers, params=params, timeout=30)
+                r = http_client.get(url, headers=headers, params=params, timeout=DATA_TIMEOUT)
+                metrics.observe_response("ncdc", r)
                 r.raise_for_status()
                 data = r.json()
                 break 
             except (HTTPError, RequestException) as e:
                 attempt += 1
+                response = getattr(e, "response", None)
+                rate_limited = response is not None and response.status_code == 429
+                # a 429 blocks the whole host through the limiter; other errors back off here
+                wait_s = ratelimit.retry_after(response.headers, 5) if rate_limited else retry_delay * attempt
                 print(
                     f"[WARN] NOAA request failed "
                     f"(station={station_id}, year={date}, offset={offset}, attempt={attempt}/{max_retries}): {e}"
                 )
 
                 if attempt >= max_retries:
-                    print(
-                        f"[ERROR] Skipping this page after {max_retries} failed attempts "
-                        f"(station={station_id}, year={date}, offset={offset})"
+                    raise IncompleteFetch(
+                        f"gave up after {max_retries} failed attempts "
+                        f"(station={station_id}, year={date}, offset={offset}): {e}",
+                        all_results,
                     )
-                    return all_results
 
-                time.sleep(retry_delay * attempt)
+                metrics.observe_retry("ncdc", wait_s, rate_limited=rate_limited)
+                if rate_limited:
+                    ratelimit.penalize(url, wait_s)
+                else:
+                    time.sleep(wait_s)
 
         results = data.get("results", [])
         if not results:
@@ -260,26 +338,129 @@ def get_data(
         if len(results) < limit:
             break
 
-        time.sleep(0.2)
-
     return all_results
 
-def get_data_year(station_abv: str, station: str):
+def get_station_names() -> dict:
+    """Station id -> name for every station returned by get_stations() (fetched once, see catalog)."""
+    return catalog.names()
+
+def get_data_stations(
+    station_names: dict = None,
+    first_year: int = FIRST_YEAR,
+    last_year: int = LAST_YEAR,
+    datatype_id: list[str] = GHCND_DATATYPES,
+    batch_size: int = STATION_BATCH,
+    max_workers: int = MAX_WORKERS,
+    manifest=None,
+) -> pd.DataFrame:
+    """
+    GHCND rows for every station in station_names (id -> name) and year.
+
+    Stations are batched batch_size per request (CDO allows several stationid
+    values and at most one year per call), and the (batch, year) chunks run
+    concurrently. The shared rate limiter keeps the pool inside CDO's quota.
+
+    With a manifest, every (batch, year) chunk is a checkpointed unit: finished
+    chunks are read back from disk, and a chunk that gives up is recorded as
+    failed (its partial rows are still returned, for Manifest.check to judge)
+    so the next run retries it.
+    Without one, an incomplete chunk raises IncompleteFetch.
+    """
+    station_names = station_names or STATIONS
+    ids = list(station_names)
+    batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+    chunks = [(batch, year) for year in range(first_year, last_year + 1) for batch in batches]
+
+    def fetch(chunk):
+        batch, year = chunk
+        unit = f"stations={','.join(batch)}|year={year}|datatypes={','.join(datatype_id)}"
+        if manifest is not None:
+            saved = manifest.load("ncdc", unit)
+            if saved is not None:
+                return saved
+        try:
+            with metrics.timed("fetch", "ncdc") as t:
+                results = get_data("GHCND", str(year), batch, datatype_id)
+                t.rows = len(results)
+        except IncompleteFetch as e:
+            if manifest is None:
+                raise
+            print(f"[ERROR] year {year} ({len(batch)} stations) incomplete: {e}")
+            manifest.fail("ncdc", unit, e)
+            return e.partial
+        if manifest is not None:
+            manifest.save("ncdc", unit, results)
+        print(f"fetched year {year} ({len(batch)} stations, {len(results)} rows)")
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+        all_results = [r for results in pool.map(fetch, chunks) for r in results]
 
-    all_results = []
-
-    i = 1999
-    while i <= 2025:
-        results = get_data("GHCND", str(i), station_abv, ["TMAX", "TMIN", "PRCP"])    
-        all_results.extend(results)
-        print("fetched year", i)
-        i += 1
-    
     df = pd.DataFrame(all_results)
-    df["station"] = station
-    df["unit"] = np.where(df["datatype"] == "PRCP", "mm", "Celsius (°C)")
+    if df.empty:
+        return df
+
+    df["station_id"] = df["station"]
+    df["station"] = df["station"].map(station_names)
+    return label_units(df)
+
+def label_units(df: pd.DataFrame) -> pd.DataFrame:
+    """Sets 'unit' from each row's datatype (units=standard: °F and inches)."""
+    df["unit"] = df["datatype"].map(STANDARD_UNITS)
     return df
 
+def to_wide(df: pd.DataFrame, datatypes: list[str] = GHCND_DATATYPES) -> pd.DataFrame:
+    """
+    Long GHCND rows (one per station, date and datatype) -> one row per station
+    and day: a value column (tmax, tmin, prcp; °F and inches) and an
+    <datatype>_attributes column per datatype, qa_flags OR-ed across them when
+    the long rows carry it. Missing days are gap-filled per station like the
+    OpenAQ daily rows; has_measurement marks days with any value.
+    """
+    cols = [d.lower() for d in datatypes]
+    df = df[df["datatype"].isin(datatypes)]
+    if df.empty:
+        return pd.DataFrame(columns=["date", "station_id", "station", *cols])
+
+    # one scatter into a (cell, datatype) grid instead of pivot_table's groupby
+    # (station, day) cells as one integer key: station code * span + day offset
+    sid, station_ids = pd.factorize(df["station_id"])
+    days = pd.to_datetime(df["date"]).to_numpy().astype("datetime64[D]").astype(np.int64)
+    first, span = days.min(), days.max() - days.min() + 1
+    cell, keys = pd.factorize(sid.astype(np.int64) * span + (days - first))
+    kind = pd.Categorical(df["datatype"], categories=datatypes).codes
+    n = len(keys)
+
+    values = np.full((n, len(datatypes)), np.nan)
+    values[cell, kind] = df["value"].to_numpy(dtype=float)
+    attributes = np.full((n, len(datatypes)), None, dtype=object)
+    attributes[cell, kind] = df["attributes"].to_numpy() if "attributes" in df.columns else None
+    station = np.empty(n, dtype=object)
+    station[cell] = df["station"].to_numpy()
+
+    wide = pd.DataFrame({
+        "date": pd.to_datetime((first + keys % span).astype("datetime64[D]")),
+        "station_id": np.asarray(station_ids, dtype=object)[keys // span],
+        "station": station,
+    })
+    for i, c in enumerate(cols):
+        wide[c] = values[:, i]
+    for i, c in enumerate(cols):
+        wide[f"{c}_attributes"] = attributes[:, i]
+    if "qa_flags" in df.columns:
+        flags = np.zeros(n, dtype=np.int16)
+        np.bitwise_or.at(flags, cell, df["qa_flags"].to_numpy(dtype=np.int16))
+        wide["qa_flags"] = flags
+
+    wide = fill_daily_gaps(wide, keys=["station_id"], carry_cols=["station"], flag_source=cols[0])
+    wide["has_measurement"] = wide[cols].notna().any(axis=1)
+    if "qa_flags" in wide.columns:
+        wide["qa_flags"] = wide["qa_flags"].fillna(0).astype(np.int16)
+    return wide
+
+def get_data_year(station_abv: str, station: str):
+    return get_data_stations({station_abv: station}, batch_size=1)
+
 if __name__ == "__main__":
 
     results = get_locations()
@@ -290,5 +471,4 @@ if __name__ == "__main__":
     df = pd.DataFrame(results)
     df.to_excel("newstations.xlsx")
 
-    get_data_year(MSCABV, MSC)
-    get_data_year(BWIABV, BWI)
\ No newline at end of file
+    get_data_stations(STATIONS)
\ No newline at end of file
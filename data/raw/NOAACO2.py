@@ -1,8 +1,13 @@
+import os
+
 import pandas as pd
 
-DAILY_URL = "https://gml.noaa.gov/webdata/ccgg/trends/co2/co2_daily_mlo.csv"
-MONTHLY_URL = "https://gml.noaa.gov/webdata/ccgg/trends/co2/co2_mm_mlo.csv"
-ANNUAL_URL = "https://gml.noaa.gov/webdata/ccgg/trends/co2/co2_annmean_mlo.csv"
+from data.raw.gapfill import fill_daily_gaps
+
+GML_URL = os.getenv("NOAA_GML_URL", "https://gml.noaa.gov/webdata/ccgg/trends/co2")
+DAILY_URL = f"{GML_URL}/co2_daily_mlo.csv"
+MONTHLY_URL = f"{GML_URL}/co2_mm_mlo.csv"
+ANNUAL_URL = f"{GML_URL}/co2_annmean_mlo.csv"
 
 def get_monthly_co2():
     df = pd.read_csv(
@@ -39,24 +44,7 @@ def get_daily_co2():
 
     df.drop(columns=["year", "month", "day", "decimal_date"], inplace=True)
 
-    df = df.sort_values("date").drop_duplicates(subset=["date"], keep="last")
-
-    full_range = pd.date_range(
-        start=df["date"].min(),
-        end=df["date"].max(),
-        freq="D"
-    )
-
-    df = (
-        df.set_index("date")
-          .reindex(full_range)
-          .rename_axis("date")
-          .reset_index()
-    )
-
-    df["unit"] = df["unit"].ffill().bfill()
-
-    df["has_measurement"] = df["co2"].notna()
+    df = fill_daily_gaps(df, keys=[], carry_cols=["unit"], flag_source="co2")
 
     return df
 
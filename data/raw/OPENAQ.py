@@ -1,17 +1,29 @@
-import os, requests, time
+import os, time, json, threading
+import numpy as np
 import pandas as pd
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from openaq import OpenAQ
-from datetime import datetime
+from types import SimpleNamespace
+from requests.exceptions import RequestException
+from data.raw import ratelimit, http_client
+from data.raw.gapfill import fill_daily_gaps
+from data import lake, metrics
+from data.spatial import SpatialIndex
 
 load_dotenv()
 
 API_KEY = os.getenv("OPENAQ_KEY")
 BASE_URL = os.getenv("OPENAQ_URL")
-client = OpenAQ(api_key=API_KEY)
 
 #LOCATIONS
 BALTIMORE_COUNTY_CENTER = (39.4015, -76.6019)
+SEARCH_RADIUS_M = 24_000
+
+#CATALOG CACHE
+CACHE_DIR = os.getenv("OPENAQ_CACHE_DIR", os.path.join(os.path.dirname(__file__), ".cache"))
+CATALOG_TTL_S = int(os.getenv("OPENAQ_CATALOG_TTL", str(24 * 3600)))
 
 #DATATYPES
 PM25 = "pm25"
@@ -23,41 +35,65 @@ NOX = "nox"
 PM10 = "pm10"
 PM1 = "pm1"
 
+PARAMETERS = [PM25, CO, O3, SO2, NO2, NOX, PM1, PM10]
+
+#HISTORY
+HISTORY_START = "2016-01-01"
+HISTORY_END = "2026-01-01"
+
 #TIME BASED AGGREGATION
 DAILY = "/days"
 HOURLY = "/hours"
 YEARLY = "/years"
+MEASUREMENTS = "/measurements"
 
 headers = {"X-API-Key": API_KEY}
 
+#RATE LIMITS (published OpenAQ v3 quotas: 60/minute, 2,000/hour)
+QUOTAS = [(60, 60), (2_000, 3_600)]
+ratelimit.register(BASE_URL, QUOTAS)
+
+#CONCURRENCY
+MAX_WORKERS = int(os.getenv("OPENAQ_MAX_WORKERS", "4"))
+
+#STREAMING (rows per chunk handed to the loader)
+CHUNK_ROWS = int(os.getenv("OPENAQ_CHUNK_ROWS", "50000"))
+HOURLY_CHUNK_ROWS = int(os.getenv("OPENAQ_HOURLY_CHUNK_ROWS", "250000"))
+
+#HOURLY WINDOWS (days per request window; each sensor's range is split so windows page concurrently)
+HOURLY_WINDOW_DAYS = int(os.getenv("OPENAQ_HOURLY_WINDOW_DAYS", "30"))
+
 def _to_int(x, default=0):
     try:
         return int(x)
     except (TypeError, ValueError):
         return default
 
-def fetch_all(url, params=None, limit=1000, timeout=60, max_retries=6):
+def iter_pages(url, params=None, limit=1000, timeout=None, max_retries=6):
+    """Yields each page's results list as soon as it arrives."""
     params = dict(params or {})
     params["limit"] = limit
     page = 1
-    out = []
 
     while True:
         params["page"] = page
 
         for attempt in range(max_retries):
-            r = requests.get(url, headers=headers, params=params, timeout=timeout)
+            r = http_client.get(url, headers=headers, params=params, timeout=timeout)
+            metrics.observe_response("openaq", r)
 
-            # handle rate limit (429)
+            # handle rate limit (429): pause every worker on this host, not just this one
             if r.status_code == 429:
-                wait_s = _to_int(r.headers.get("Retry-After"), 20) + 2
-                print(f"Rate limited. Sleeping {wait_s}s...")
-                time.sleep(wait_s)
+                wait_s = ratelimit.retry_after(r.headers, 20) + 2
+                print(f"Rate limited. Pausing {url} host for {wait_s}s...")
+                ratelimit.penalize(url, wait_s)
+                metrics.observe_retry("openaq", wait_s, rate_limited=True)
                 continue
 
             if r.status_code in (408, 500, 502, 503, 504):
                 backoff = 2 * (attempt + 1)
                 print(f"HTTP {r.status_code}. Retry in {backoff}s...")
+                metrics.observe_retry("openaq", backoff)
                 time.sleep(backoff)
                 continue
 
@@ -71,7 +107,7 @@ def fetch_all(url, params=None, limit=1000, timeout=60, max_retries=6):
         if not results:
             break
 
-        out.extend(results)
+        yield results
 
         meta = data.get("meta") or {}
         found = _to_int(meta.get("found"), 0)
@@ -85,28 +121,127 @@ def fetch_all(url, params=None, limit=1000, timeout=60, max_retries=6):
 
         page += 1
 
-        time.sleep(0.2)
-
+def fetch_all(url, params=None, limit=1000, timeout=None, max_retries=6):
+    out = []
+    with metrics.timed("fetch_all", "openaq") as t:
+        for results in iter_pages(url, params, limit, timeout, max_retries):
+            out.extend(results)
+        t.rows = len(out)
     return out
 
-def get_locations(loc_coord: list[float]):
-    locations = client.locations.list(
-        coordinates=loc_coord,
-        radius=24_000,
-        limit=1000
+def _to_namespace(x):
+    if isinstance(x, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in x.items()})
+    if isinstance(x, list):
+        return [_to_namespace(v) for v in x]
+    return x
+
+def get_locations_raw(loc_coord, radius: int = SEARCH_RADIUS_M) -> list[dict]:
+    return fetch_all(
+        f"{BASE_URL}/locations",
+        {"coordinates": f"{loc_coord[0]},{loc_coord[1]}", "radius": radius},
     )
-    return locations.results
 
-all_locations = get_locations(BALTIMORE_COUNTY_CENTER)
+def get_locations(loc_coord: list[float], radius: int = SEARCH_RADIUS_M):
+    return _to_namespace(get_locations_raw(loc_coord, radius))
+
+class LocationCatalog:
+    """
+    Locations (with their sensors) around center, fetched on first use.
+    The raw API response is cached on disk for ttl seconds; refresh() forces a refetch.
+    """
+
+    def __init__(self, center, radius: int = SEARCH_RADIUS_M, ttl: int = CATALOG_TTL_S, cache_dir: str = CACHE_DIR):
+        self.center = center
+        self.radius = radius
+        self.ttl = ttl
+        self.cache_path = os.path.join(
+            cache_dir, f"openaq_locations_{center[0]}_{center[1]}_{radius}.json"
+        )
+        self._locations = None
+        self._lock = threading.Lock()
+        self._indexed = None  # (locations, by name, by id, SpatialIndex) built for that locations list
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - cached.get("fetched_at", 0) > self.ttl:
+            return None
+        return cached.get("results")
+
+    def _write_cache(self, results):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp = self.cache_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": time.time(), "results": results}, f)
+        os.replace(tmp, self.cache_path)
+
+    def refresh(self):
+        results = get_locations_raw(self.center, self.radius)
+        self._write_cache(results)
+        self._locations = _to_namespace(results)
+        return self._locations
+
+    def locations(self):
+        with self._lock:
+            if self._locations is None:
+                cached = self._read_cache()
+                if cached is None:
+                    self.refresh()
+                else:
+                    self._locations = _to_namespace(cached)
+            return self._locations
+
+    def sensors(self):
+        return [(loc, s) for loc in self.locations() for s in (loc.sensors or [])]
+
+    def _indexes(self):
+        locations = self.locations()
+        indexed = self._indexed
+        if indexed is None or indexed[0] is not locations:
+            by_name = {}
+            for loc in locations:
+                by_name.setdefault(loc.name, loc)
+            by_id = {loc.id: loc for loc in locations}
+            points = SpatialIndex((loc.id, *location_coordinates(loc)) for loc in locations)
+            indexed = self._indexed = (locations, by_name, by_id, points)
+        return indexed
+
+    def by_name(self, name: str):
+        """First location called name, or None."""
+        return self._indexes()[1].get(name)
+
+    def nearest(self, lat: float, lon: float, k: int = 1, max_m: float = None) -> list:
+        """Up to k (location, metres) closest to (lat, lon), closest first."""
+        _, _, by_id, points = self._indexes()
+        return [(by_id[i], d) for i, d in points.nearest(lat, lon, k, max_m)]
+
+    def within(self, lat: float, lon: float, radius_m: float) -> list:
+        """Every (location, metres) within radius_m of (lat, lon), closest first."""
+        _, _, by_id, points = self._indexes()
+        return [(by_id[i], d) for i, d in points.within(lat, lon, radius_m)]
+
+def location_coordinates(loc):
+    c = getattr(loc, "coordinates", None)
+    return (getattr(c, "latitude", None), getattr(c, "longitude", None))
+
+catalog = LocationCatalog(BALTIMORE_COUNTY_CENTER)
+
+def __getattr__(name):
+    # all_locations used to be fetched at import time; keep the name, load it lazily
+    if name == "all_locations":
+        return catalog.locations()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_specific_loc(location: str):
-    for loc in all_locations:
-        if loc.name == location:
-            return loc
+    return catalog.by_name(location)
 
 def get_location_details():
     location_list = []
-    for loc in all_locations:
+    for loc in catalog.locations():
         location_dict = {
             "id": loc.id,
             "name": loc.name,
@@ -118,7 +253,7 @@ def get_location_details():
 
 def get_sensor_details():
     sensor_list = []
-    for loc in all_locations:
+    for loc in catalog.locations():
         for s in (loc.sensors or []):
             sensor_dict = {
                 "id": s.id,
@@ -130,82 +265,264 @@ def get_sensor_details():
             sensor_list.append(sensor_dict)
     return sensor_list
 
-def get_data_lvls(data_type: str, date_from: str, date_to: str):
+def get_data_lvls(data_type: str, date_from: str, date_to: str, window_days: int = HOURLY_WINDOW_DAYS, max_workers: int = MAX_WORKERS):
+    """
+    Raw measurements of every data_type sensor between date_from and date_to,
+    as dicts tagged with their location and parameter. Each sensor's range is
+    fetched in window_days windows, max_workers at a time.
+    """
     rows = []
-
-    for loc in all_locations:
-        for s in (loc.sensors or []):
-            if s.parameter and s.parameter.name == data_type:
-
-                page = 1
-                limit = 1000
-
-                while True:
-                    meas = client.measurements.list(
-                        sensors_id=s.id,
-                        datetime_from=date_from,
-                        datetime_to=date_to,
-                        limit=limit,
-                        page=page
-                    )
-                    meas = client.measurements.list()
-                    results = meas.dict().get("results", [])
-                    if not results:
-                        break
-                    
-                    for r in results:
-                        r["location_id"] = loc.id
-                        r["location_name"] = loc.name
-                        r["parameter"] = s.parameter.name
-                        r["parameter_units"] = s.parameter.units
-                        rows.append(r)
-
-                    page += 1
-            
+    for loc, s, records in iter_window_records(get_sensors(data_type), MEASUREMENTS, date_from, date_to, window_days, max_workers):
+        for r in records:
+            r["location_id"] = loc.id
+            r["location_name"] = loc.name
+            r["parameter"] = s.parameter.name
+            r["parameter_units"] = s.parameter.units
+            rows.append(r)
     return rows
 
-def get_data_lvls_agg(data_type: str, aggregation: str, date_from: str, date_to: str):
-    
-    rows = []
+#AGGREGATE COLUMNS (column -> summary key; "value" sits on the record itself)
+AGG_STATS = {
+    "value": None,
+    "min": "min",
+    "q02": "q02",
+    "q25": "q25",
+    "median": "median",
+    "q75": "q75",
+    "q98": "q98",
+    "max": "max",
+    "avg": "avg",
+    "sd": "sd",
+}
+
+def _num(x):
+    return float("nan") if x is None else x
+
+class AggColumns:
+    """
+    Column-wise builder for /days, /years, ... aggregate records.
 
-    for loc in all_locations:
-        for s in (loc.sensors or []):
-            if s.parameter and s.parameter.name == data_type:
-
-                agg = fetch_all(
-                    url=f"{BASE_URL}/sensors/{s.id}{aggregation}",
-                    params={"date_from":date_from, "date_to":date_to}
-                )
-
-                for r in agg:
-                    
-                    data = {
-                        "sensor_id": s.id,
-                        "location_id": loc.id,
-                        "location_name": loc.name,
-                        "parameter": s.parameter.name,
-                        "parameter_units": s.parameter.units,
-                        "value": r["value"],
-                        "min": r["summary"]["q02"],
-                        "q02": r["summary"]["q02"],
-                        "q25": r["summary"]["q25"],
-                        "median": r["summary"]["median"],
-                        "q75": r["summary"]["q75"],
-                        "q98": r["summary"]["q98"],
-                        "max": r["summary"]["max"],
-                        "avg": r["summary"]["avg"],
-                        "sd": r["summary"]["sd"],
-                        "date_from": datetime.fromisoformat(r["coverage"]["datetimeFrom"]["local"]).date(),
-                        "date_to": datetime.fromisoformat(r["coverage"]["datetimeTo"]["local"]).date()
-                    }
-
-                    rows.append(data)
+    Ids and stats are appended straight into typed arrays (int32 / float32),
+    coverage timestamps are kept as strings and parsed in one vectorized pass,
+    and the repeated name columns come out as categoricals.
+    """
 
-    return rows
+    def __init__(self):
+        self.sensor_id = array("i")
+        self.location_id = array("i")
+        self.location_name = []
+        self.parameter = []
+        self.parameter_units = []
+        self.stats = {c: array("f") for c in AGG_STATS}
+        self.date_from = []
+        self.date_to = []
+
+    def __len__(self):
+        return len(self.sensor_id)
+
+    def extend(self, loc, s, records):
+        n = len(records)
+        if n == 0:
+            return
+
+        self.sensor_id.extend([s.id] * n)
+        self.location_id.extend([loc.id] * n)
+        self.location_name.extend([loc.name] * n)
+        self.parameter.extend([s.parameter.name] * n)
+        self.parameter_units.extend([s.parameter.units] * n)
+
+        summaries = [r["summary"] for r in records]
+        for c, key in AGG_STATS.items():
+            if key is None:
+                self.stats[c].extend([_num(r[c]) for r in records])
+            else:
+                self.stats[c].extend([_num(x[key]) for x in summaries])
+
+        self.date_from.extend([r["coverage"]["datetimeFrom"]["local"] for r in records])
+        self.date_to.extend([r["coverage"]["datetimeTo"]["local"] for r in records])
+
+    @staticmethod
+    def _local_dates(values):
+        # "2024-01-01T00:00:00-05:00" -> 2024-01-01 (the local calendar day, like fromisoformat().date())
+        return np.array(values, dtype="U10").astype("datetime64[D]")
+
+    def to_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame({
+            "sensor_id": np.frombuffer(self.sensor_id, dtype=np.int32).copy(),
+            "location_id": np.frombuffer(self.location_id, dtype=np.int32).copy(),
+            "location_name": pd.Categorical(self.location_name),
+            "parameter": pd.Categorical(self.parameter),
+            "parameter_units": pd.Categorical(self.parameter_units),
+            **{c: np.frombuffer(v, dtype=np.float32).copy() for c, v in self.stats.items()},
+            "date_from": self._local_dates(self.date_from),
+            "date_to": self._local_dates(self.date_to),
+        })
+        return df
+
+class HourlyColumns:
+    """
+    Column-wise builder for /hours records, like AggColumns but kept narrow for
+    ~24x the rows: no location name (it's in openaq_locations), the UTC start of
+    the hour plus its local calendar day, and the value with the hour's min/max.
+    """
+
+    STATS = {"value": None, "min": "min", "max": "max"}
+
+    def __init__(self):
+        self.sensor_id = array("i")
+        self.location_id = array("i")
+        self.parameter = []
+        self.parameter_units = []
+        self.stats = {c: array("f") for c in self.STATS}
+        self.datetime_utc = []
+        self.date = []
+
+    def __len__(self):
+        return len(self.sensor_id)
+
+    def extend(self, loc, s, records):
+        n = len(records)
+        if n == 0:
+            return
+
+        self.sensor_id.extend([s.id] * n)
+        self.location_id.extend([loc.id] * n)
+        self.parameter.extend([s.parameter.name] * n)
+        self.parameter_units.extend([s.parameter.units] * n)
+
+        for c, key in self.STATS.items():
+            if key is None:
+                self.stats[c].extend([_num(r[c]) for r in records])
+            else:
+                self.stats[c].extend([_num((r.get("summary") or {}).get(key)) for r in records])
+
+        periods = [r["period"]["datetimeFrom"] for r in records]
+        self.datetime_utc.extend([p["utc"] for p in periods])
+        self.date.extend([p["local"] for p in periods])
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            # "2024-01-01T05:00:00Z" -> 2024-01-01 05:00:00 (naive UTC)
+            "datetime_utc": np.array(self.datetime_utc, dtype="U19").astype("datetime64[s]"),
+            "date": AggColumns._local_dates(self.date),
+            "sensor_id": np.frombuffer(self.sensor_id, dtype=np.int32).copy(),
+            "location_id": np.frombuffer(self.location_id, dtype=np.int32).copy(),
+            "parameter": pd.Categorical(self.parameter),
+            "parameter_units": pd.Categorical(self.parameter_units),
+            **{c: np.frombuffer(v, dtype=np.float32).copy() for c, v in self.stats.items()},
+        })
+
+def get_sensors(parameters, locations=None):
+    """(location, sensor) pairs measuring any of parameters (a name or a list), in catalog order."""
+    wanted = {parameters} if isinstance(parameters, str) else set(parameters)
+    return [
+        (loc, s)
+        for loc in (catalog.locations() if locations is None else locations)
+        for s in (loc.sensors or [])
+        if s.parameter and s.parameter.name in wanted
+    ]
+
+def iter_unit_records(jobs, aggregation: str, max_workers: int = MAX_WORKERS, manifest=None):
+    """
+    Yields (location, sensor, records) for every (location, sensor, params) job,
+    in job order, with at most max_workers jobs in flight, so memory is bounded
+    by the window not the catalog.
+
+    With a manifest, each job is a checkpointed unit: finished ones are
+    read back from disk, and one that fails is recorded and yields no records
+    instead of aborting the whole run; callers check the manifest
+    (Manifest.check) before loading what was fetched.
+    """
+
+    def fetch_records(url, params):
+        with metrics.timed("fetch", "openaq") as t:
+            records = [r for page in iter_pages(url, params) for r in page]
+            t.rows = len(records)
+        return records
+
+    def fetch(job):
+        loc, s, params = job
+        url = f"{BASE_URL}/sensors/{s.id}{aggregation}"
+        if manifest is None:
+            return loc, s, fetch_records(url, params)
+
+        unit = f"sensor={s.id}|{aggregation.strip('/')}|" + "|".join(str(v) for v in params.values())
+        records = manifest.load("openaq", unit)
+        if records is not None:
+            return loc, s, records
+        try:
+            records = fetch_records(url, params)
+        except (RuntimeError, RequestException) as e:
+            print(f"[ERROR] sensor {s.id}: {e}")
+            manifest.fail("openaq", unit, e)
+            return loc, s, []
+        manifest.save("openaq", unit, records)
+        return loc, s, records
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        pending = deque()
+        for job in jobs:
+            pending.append(pool.submit(fetch, job))
+            if len(pending) >= max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def iter_sensor_records(sensors, aggregation: str, date_from: str, date_to: str, max_workers: int = MAX_WORKERS, since: dict = None, manifest=None):
+    """
+    iter_unit_records with one job per sensor over the whole date_from..date_to range.
+    since optionally maps sensor_id -> date_from, overriding date_from for that sensor
+    (used by incremental loads to start each sensor at its own high-water mark).
+    """
+    since = since or {}
+    jobs = (
+        (loc, s, {"date_from": since.get(s.id, date_from), "date_to": date_to})
+        for loc, s in sensors
+    )
+    return iter_unit_records(jobs, aggregation, max_workers, manifest)
+
+def date_windows(date_from: str, date_to: str, days: int) -> list[tuple[str, str]]:
+    """
+    date_from..date_to split into consecutive (datetime_from, datetime_to) windows of
+    at most days days. Bounds are inclusive UTC timestamps and windows don't overlap.
+    """
+    start, end = pd.Timestamp(date_from).normalize(), pd.Timestamp(date_to).normalize()
+    step = pd.Timedelta(days=max(1, days))
+    last = pd.Timedelta(seconds=1)
+    windows = []
+    while start < end:
+        stop = min(start + step, end)
+        windows.append((start.strftime("%Y-%m-%dT%H:%M:%SZ"), (stop - last).strftime("%Y-%m-%dT%H:%M:%SZ")))
+        start = stop
+    return windows
+
+def iter_window_records(sensors, aggregation: str, date_from: str, date_to: str, window_days: int = HOURLY_WINDOW_DAYS, max_workers: int = MAX_WORKERS, since: dict = None, manifest=None):
+    """
+    iter_unit_records for the datetime_from/datetime_to endpoints (/hours, /measurements):
+    every sensor's range is split into window_days windows, and the windows of all
+    sensors page concurrently, so one sensor's long history doesn't serialize on its pages.
+    """
+    since = since or {}
+    jobs = (
+        (loc, s, {"datetime_from": w_from, "datetime_to": w_to})
+        for loc, s in sensors
+        for w_from, w_to in date_windows(since.get(s.id, date_from), date_to, window_days)
+    )
+    return iter_unit_records(jobs, aggregation, max_workers, manifest)
+
+def fetch_sensor_aggs(sensors, aggregation: str, date_from: str, date_to: str, max_workers: int = MAX_WORKERS, since: dict = None, manifest=None) -> pd.DataFrame:
+    """One paginated request per sensor over the whole date_from..date_to window; all rows in one frame."""
+    cols = AggColumns()
+    for loc, s, records in iter_sensor_records(sensors, aggregation, date_from, date_to, max_workers, since, manifest):
+        cols.extend(loc, s, records)
+    return cols.to_frame()
+
+def get_data_lvls_agg(data_type: str, aggregation: str, date_from: str, date_to: str, max_workers: int = MAX_WORKERS, since: dict = None):
+    return fetch_sensor_aggs(get_sensors(data_type), aggregation, date_from, date_to, max_workers, since)
 
 def get_data_lvls_agg_loc(data_type: str, loc, aggregation: str, date_from: str, date_to: str):
     
-    rows = []
+    cols = AggColumns()
     for s in (loc.sensors or []):
         if s.parameter and s.parameter.name == data_type:
 
@@ -214,210 +531,151 @@ def get_data_lvls_agg_loc(data_type: str, loc, aggregation: str, date_from: str,
                 {"date_from":date_from, "date_to":date_to}
             )
 
-            for r in agg:
-                    
-                data = {
-                    "sensor_id": s.id,
-                    "location_id": loc.id,
-                    "location_name": loc.name,
-                    "parameter": s.parameter.name,
-                    "parameter_units": s.parameter.units,
-                    "value": r["value"],
-                    "min": r["summary"]["q02"],
-                    "q02": r["summary"]["q02"],
-                    "q25": r["summary"]["q25"],
-                    "median": r["summary"]["median"],
-                    "q75": r["summary"]["q75"],
-                    "q98": r["summary"]["q98"],
-                    "max": r["summary"]["max"],
-                    "avg": r["summary"]["avg"],
-                    "sd": r["summary"]["sd"],
-                    "date_from": datetime.fromisoformat(r["coverage"]["datetimeFrom"]["local"]).date(),
-                    "date_to": datetime.fromisoformat(r["coverage"]["datetimeTo"]["local"]).date()
-                }
-
-                rows.append(data)
-            time.sleep(1/60)
+            cols.extend(loc, s, agg)
 
-    return rows
+    return cols.to_frame()
 
 def Padonia():
-    #Daily
-    for i in range(0, 26):
-        loc = get_specific_loc("Padonia")
-        rows = get_data_lvls_agg_loc(PM25, loc, DAILY, f"20{i:02d}-01-01", f"20{i+1:02d}-01-01")
-        df = pd.DataFrame(rows)
-        df.to_excel(f"padonia_pm25_daily_20{i:02d}.xlsx", index=False)
-    
-    #ANUALLY
-    for i in range(0, 26):
-        loc = get_specific_loc("Padonia")
-        rows = get_data_lvls_agg_loc(PM25, loc, YEARLY, f"20{i:02d}-01-01", f"20{i+1:02d}-01-01")
-        df = pd.DataFrame(rows)
-        df.to_excel(f"padonia_pm25_yearly_20{i:02d}.xlsx", index=False)
+    #Daily + ANUALLY -> raw lake stage, partitioned by parameter/year
+    loc = get_specific_loc("Padonia")
+    for aggregation, source in ((DAILY, "openaq_padonia_daily"), (YEARLY, "openaq_padonia_yearly")):
+        for i in range(0, 26):
+            df = get_data_lvls_agg_loc(PM25, loc, aggregation, f"20{i:02d}-01-01", f"20{i+1:02d}-01-01")
+            lake.write_stage(df, "raw", source, date_col="date_from")
 
 keys = ["location_id", "sensor_id", "parameter"]
-value_cols = ["value","q02","q25","median","q75","q98","min","max","avg","sd"]
-
-def add_missing_dates(g: pd.DataFrame, key_vals=None) -> pd.DataFrame:
-    """
-    Keep your behavior, but:
-    - Works without groupby.apply (no deprecation issues)
-    - Restores keys reliably
-    - Prevents reindex duplicate-label crashes
-    """
-    g = g.copy()
-
-    if key_vals is not None:
-        if not isinstance(key_vals, tuple):
-            key_vals = (key_vals,)
-        for k, v in zip(keys, key_vals):
-            g[k] = v
-
-    g["date"] = pd.to_datetime(g["date"]).dt.normalize()
-    g = g.sort_values("date")
-
-    g = g.drop_duplicates(subset=["date"], keep="last")
-
-    g = g.set_index("date")
-
-    full = pd.date_range(g.index.min(), g.index.max(), freq="D")
-    g2 = g.reindex(full)
-
-    for c in keys + ["location_name", "parameter_units", "location_id", "sensor_id"]:
-        if c in g2.columns:
-            g2[c] = g2[c].ffill().bfill()
-
-    g2 = g2.reset_index().rename(columns={"index": "date"})
-    g2["has_measurement"] = g2["avg"].notna() if "avg" in g2.columns else False
-    return g2
-
 
 def fill_missing_dates(df: pd.DataFrame) -> pd.DataFrame:
-    """Replacement for df.groupby(...).apply(add_missing_dates, include_groups=False)."""
-    out = []
-    for key_vals, g in df.groupby(keys, sort=False, dropna=False):
-        out.append(add_missing_dates(g, key_vals))
-    return pd.concat(out, ignore_index=True) if out else df
+    """Fills every keys group out to one row per day (has_measurement marks real ones); integer ids stay integral."""
+    with metrics.timed("gapfill", "openaq") as t:
+        # AggColumns' int32 ids stay integral for the INTEGER columns they load into
+        out = fill_daily_gaps(df, keys, carry_cols=["location_name", "parameter_units"], keep_int_keys=True)
+        t.rows = len(out)
+    return out
 
 
-def pm25():
-    all_daily = []
-    for i in range(16, 26):
-        rows = get_data_lvls_agg(PM25, DAILY, f"20{i:02d}-01-01", f"20{i+1:02d}-01-01")
-        all_daily.extend(rows)
+def daily_frame(rows) -> pd.DataFrame:
+    """Aggregate rows (AggColumns frame or list of dicts) -> gap-filled daily frame (one row per sensor per day)."""
+    if len(rows) == 0:
+        return pd.DataFrame()
 
-    df = pd.DataFrame(all_daily)
+    df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
     df["date"] = pd.to_datetime(df["date_from"]).dt.normalize()
 
     df_full = fill_missing_dates(df)
     df_full.drop(columns=["date_from", "date_to"], inplace=True, errors="raise")
 
-    return df_full, None
+    return df_full
 
 
-def co():
-    all_daily = []
-    for i in range(16, 26):
-        rows = get_data_lvls_agg(CO, DAILY, f"20{i:02d}-01-01", f"20{i+1:02d}-01-01")
-        all_daily.extend(rows)
+def _tomorrow() -> str:
+    return (pd.Timestamp.today().normalize() + pd.Timedelta(days=1)).date().isoformat()
 
-    df = pd.DataFrame(all_daily)
-    df["date"] = pd.to_datetime(df["date_from"]).dt.normalize()
 
-    df_full = fill_missing_dates(df)
-    df_full.drop(columns=["date_from", "date_to"], inplace=True, errors="raise")
-
-    return df_full, None
-
-
-def o3():
-    all_daily = []
-    for i in range(16, 26):
-        rows = get_data_lvls_agg(O3, DAILY, f"20{i:02d}-01-01", f"20{i+1:02d}-01-01")
-        all_daily.extend(rows)
+def _date_to(date_to: str = None, manifest=None) -> str:
+    """
+    date_to, or tomorrow. Unit keys include date_to, so a checkpointed run keeps
+    the end date it started with: a resume after midnight still matches its units.
+    """
+    if date_to:
+        return date_to
+    if manifest is None:
+        return _tomorrow()
+    return manifest.setting("openaq_date_to", _tomorrow())
 
-    df = pd.DataFrame(all_daily)
-    df["date"] = pd.to_datetime(df["date_from"]).dt.normalize()
 
-    df_full = fill_missing_dates(df)
-    df_full.drop(columns=["date_from", "date_to"], inplace=True, errors="raise")
+def get_daily(parameters=PARAMETERS, date_from: str = HISTORY_START, date_to: str = None, since: dict = None, max_workers: int = MAX_WORKERS, persist_raw: bool = False, manifest=None) -> pd.DataFrame:
+    """
+    Long daily frame for every sensor measuring any of parameters.
 
-    return df_full, None
+    Each sensor is visited once and fetched over the whole window (paginated),
+    instead of one catalog scan and one request per parameter per year.
+    date_to defaults to tomorrow (see _date_to); since is passed through to fetch_sensor_aggs.
+    persist_raw also writes the un-filled API rows to the lake's raw stage.
+    manifest (data.manifest.Manifest) checkpoints each sensor so a rerun can resume.
+    """
+    df = fetch_sensor_aggs(get_sensors(parameters), DAILY, date_from, _date_to(date_to, manifest), max_workers, since, manifest)
+    if persist_raw:
+        lake.write_stage(df, "raw", "openaq", date_col="date_from")
+    return daily_frame(df)
 
 
-def so2():
-    all_daily = []
-    for i in range(16, 26):
-        rows = get_data_lvls_agg(SO2, DAILY, f"20{i:02d}-01-01", f"20{i+1:02d}-01-01")
-        all_daily.extend(rows)
+def daily_from_lake(filters=None) -> pd.DataFrame:
+    """get_daily() rebuilt from the lake's raw stage instead of the API."""
+    return daily_frame(lake.read_stage("raw", "openaq", filters=filters))
 
-    df = pd.DataFrame(all_daily)
-    df["date"] = pd.to_datetime(df["date_from"]).dt.normalize()
 
-    df_full = fill_missing_dates(df)
-    df_full.drop(columns=["date_from", "date_to"], inplace=True, errors="raise")
+def iter_daily(parameters=PARAMETERS, date_from: str = HISTORY_START, date_to: str = None, since: dict = None, chunk_rows: int = CHUNK_ROWS, max_workers: int = MAX_WORKERS, manifest=None):
+    """
+    Streaming get_daily: yields gap-filled daily frames of roughly chunk_rows rows.
+    Chunks break on sensor boundaries, so every sensor is gap-filled whole, and
+    peak memory stays flat no matter how many sensors or years are requested.
+    """
+    cols = AggColumns()
+    for loc, s, records in iter_sensor_records(get_sensors(parameters), DAILY, date_from, _date_to(date_to, manifest), max_workers, since, manifest):
+        cols.extend(loc, s, records)
+        if len(cols) >= chunk_rows:
+            yield daily_frame(cols.to_frame())
+            cols = AggColumns()
+    if len(cols):
+        yield daily_frame(cols.to_frame())
 
-    return df_full, None
 
+def iter_hourly(parameters=PARAMETERS, date_from: str = HISTORY_START, date_to: str = None, since: dict = None, window_days: int = HOURLY_WINDOW_DAYS, chunk_rows: int = HOURLY_CHUNK_ROWS, max_workers: int = MAX_WORKERS, manifest=None):
+    """
+    Yields hourly frames (HourlyColumns) of roughly chunk_rows rows for every sensor
+    measuring any of parameters. Hours are not gap-filled; the daily rollup in the
+    database marks missing days instead.
+    """
+    cols = HourlyColumns()
+    sensors = get_sensors(parameters)
+    for loc, s, records in iter_window_records(sensors, HOURLY, date_from, _date_to(date_to, manifest), window_days, max_workers, since, manifest):
+        cols.extend(loc, s, records)
+        if len(cols) >= chunk_rows:
+            yield cols.to_frame()
+            cols = HourlyColumns()
+    if len(cols):
+        yield cols.to_frame()
 
-def no2():
-    all_daily = []
-    for i in range(16, 26):
-        rows = get_data_lvls_agg(NO2, DAILY, f"20{i:02d}-01-01", f"20{i+1:02d}-01-01")
-        all_daily.extend(rows)
 
-    df = pd.DataFrame(all_daily)
-    df["date"] = pd.to_datetime(df["date_from"]).dt.normalize()
+def split_by_parameter(df: pd.DataFrame) -> dict:
+    """Long daily frame -> {parameter: frame}."""
+    if df.empty:
+        return {}
+    return {p: g.reset_index(drop=True) for p, g in df.groupby("parameter", sort=False)}
 
-    df_full = fill_missing_dates(df)
-    df_full.drop(columns=["date_from", "date_to"], inplace=True, errors="raise")
 
-    return df_full, None
+def get_parameter_daily(data_type: str):
+    return get_daily([data_type], HISTORY_START, HISTORY_END), None
 
 
-def nox():
-    all_daily = []
-    for i in range(16, 26):
-        rows = get_data_lvls_agg(NOX, DAILY, f"20{i:02d}-01-01", f"20{i+1:02d}-01-01")
-        all_daily.extend(rows)
+def pm25():
+    return get_parameter_daily(PM25)
 
-    df = pd.DataFrame(all_daily)
-    df["date"] = pd.to_datetime(df["date_from"]).dt.normalize()
 
-    df_full = fill_missing_dates(df)
-    df_full.drop(columns=["date_from", "date_to"], inplace=True, errors="raise")
+def co():
+    return get_parameter_daily(CO)
 
-    return df_full, None
 
+def o3():
+    return get_parameter_daily(O3)
 
-def pm1():
-    all_daily = []
-    for i in range(16, 26):
-        rows = get_data_lvls_agg(PM1, DAILY, f"20{i:02d}-01-01", f"20{i+1:02d}-01-01")
-        all_daily.extend(rows)
 
-    df = pd.DataFrame(all_daily)
-    df["date"] = pd.to_datetime(df["date_from"]).dt.normalize()
+def so2():
+    return get_parameter_daily(SO2)
 
-    df_full = fill_missing_dates(df)
-    df_full.drop(columns=["date_from", "date_to"], inplace=True, errors="raise")
 
-    return df_full, None
+def no2():
+    return get_parameter_daily(NO2)
 
 
-def pm10():
-    all_daily = []
-    for i in range(16, 26):
-        rows = get_data_lvls_agg(PM10, DAILY, f"20{i:02d}-01-01", f"20{i+1:02d}-01-01")
-        all_daily.extend(rows)
+def nox():
+    return get_parameter_daily(NOX)
 
-    df = pd.DataFrame(all_daily)
-    df["date"] = pd.to_datetime(df["date_from"]).dt.normalize()
 
-    df_full = fill_missing_dates(df)
-    df_full.drop(columns=["date_from", "date_to"], inplace=True, errors="raise")
+def pm1():
+    return get_parameter_daily(PM1)
 
-    return df_full, None
 
-client.close()
\ No newline at end of file
+def pm10():
+    return get_parameter_daily(PM10)
@@ -0,0 +1,91 @@
+"""
+Vectorized daily gap-filling.
+
+Replaces the per-group add_missing_dates loop: every group's calendar is
+built with numpy in one pass and the measured rows are scattered into it,
+so cost no longer scales with the number of Python-level groups.
+"""
+
+import numpy as np
+import pandas as pd
+
+DAY = np.timedelta64(1, "D")
+
+
+def fill_daily_gaps(
+    df: pd.DataFrame,
+    keys: list[str],
+    carry_cols: list[str] = (),
+    flag_source: str = "avg",
+    flag_col: str = "has_measurement",
+    date_col: str = "date",
+    keep_int_keys: bool = False,
+) -> pd.DataFrame:
+    """
+    For every keys group, adds one row per missing day between the group's first
+    and last date. Keys and carry_cols are forward/back-filled inside the group,
+    every other column is left empty, and flag_col marks rows where flag_source
+    is present. Duplicate dates keep the last row.
+
+    Output matches the old groupby loop: groups in first-seen order, dates
+    ascending, date_col first and flag_col last. Like the loop, integer keys and
+    carry_cols come out as float64 once gap rows were added; keep_int_keys
+    narrows them back to their input dtype instead (e.g. int32 ids bound for
+    INTEGER columns).
+    """
+    if df.empty:
+        return df
+
+    df = df.copy()
+    df[date_col] = pd.to_datetime(df[date_col]).dt.normalize()
+
+    if keys:
+        gid = df.groupby(list(keys), sort=False, dropna=False, observed=True).ngroup().to_numpy()
+    else:
+        gid = np.zeros(len(df), dtype=np.int64)
+
+    days = df[date_col].to_numpy().astype("datetime64[D]")
+
+    # stable sort so "keep last" means last in input order, like the loop did
+    order = np.lexsort((days, gid))
+    gid_s, days_s = gid[order], days[order]
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = (gid_s[1:] != gid_s[:-1]) | (days_s[1:] != days_s[:-1])
+    rows, gid_s, days_s = order[last], gid_s[last], days_s[last]
+
+    # renumber groups 0..n-1 in sorted order
+    new_group = np.r_[True, gid_s[1:] != gid_s[:-1]]
+    gid_s = np.cumsum(new_group) - 1
+    n_groups = gid_s[-1] + 1
+    bounds = np.flatnonzero(new_group)
+    first_day = days_s[bounds]
+    last_day = days_s[np.r_[bounds[1:] - 1, len(days_s) - 1]]
+    spans = ((last_day - first_day) // DAY).astype(np.int64) + 1
+    starts = np.r_[0, np.cumsum(spans)[:-1]]
+    total = int(spans.sum())
+
+    # calendar: each group's first_day + 0..span-1
+    cal_gid = np.repeat(np.arange(n_groups), spans)
+    cal_days = first_day[cal_gid] + (np.arange(total) - starts[cal_gid]) * DAY
+
+    source = np.full(total, -1, dtype=np.int64)
+    source[starts[gid_s] + ((days_s - first_day[gid_s]) // DAY).astype(np.int64)] = rows
+
+    body = df.drop(columns=[date_col]).reset_index(drop=True)
+    out = body.reindex(source).reset_index(drop=True)
+
+    fill = [c for c in dict.fromkeys(list(keys) + list(carry_cols)) if c in out.columns]
+    if fill and (source < 0).any():
+        grouped = out[fill].groupby(cal_gid, sort=False)
+        out[fill] = grouped.ffill()
+        out[fill] = out[fill].groupby(cal_gid, sort=False).bfill()
+
+        # reindex widened integer keys to float for the gap rows; narrow them back once filled
+        if keep_int_keys:
+            for c in fill:
+                if body[c].dtype.kind in "iu" and out[c].notna().all():
+                    out[c] = out[c].astype(body[c].dtype)
+
+    out.insert(0, date_col, pd.Series(cal_days, dtype=df[date_col].dtype))
+    out[flag_col] = out[flag_source].notna() if flag_source in out.columns else False
+    return out
@@ -0,0 +1,71 @@
+"""
+Pooled HTTP sessions shared by every API client.
+
+One requests.Session per host keeps TCP+TLS connections alive across the
+thousands of small page requests in a run, negotiates gzip, and applies the
+same timeout to every call. get() also takes a rate-limit slot first, so call
+sites only need to handle the response.
+"""
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from data.raw import ratelimit
+
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+
+DEFAULT_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _new_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+def get_session(url: str) -> requests.Session:
+    host = ratelimit.host_of(url)
+    with _sessions_lock:
+        if host not in _sessions:
+            _sessions[host] = _new_session(POOL_SIZE)
+        return _sessions[host]
+
+
+def configure(pool_size: int = None, timeout: float = None):
+    """Changes pool size / default timeout. Existing sessions are closed and rebuilt on next use."""
+    global POOL_SIZE, TIMEOUT
+    if pool_size is not None:
+        POOL_SIZE = pool_size
+    if timeout is not None:
+        TIMEOUT = timeout
+    close()
+
+
+def get(url: str, headers=None, params=None, timeout: float = None) -> requests.Response:
+    ratelimit.acquire(url)
+    return get_session(url).get(
+        url,
+        headers=headers,
+        params=params,
+        timeout=TIMEOUT if timeout is None else timeout,
+    )
+
+
+def close():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
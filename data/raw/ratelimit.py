@@ -0,0 +1,130 @@
+"""
+Per-host token-bucket rate limiting shared by every API client.
+
+Each client registers its base url with the published quotas, e.g.
+    register(BASE_URL, [(5, 1), (10_000, 86_400)])   # 5 req/s and 10k/day
+and then calls acquire(url) before every request. A 429 Retry-After is
+applied with penalize(url, seconds), which pauses every thread talking to
+that host instead of only the one that got throttled.
+"""
+
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    def __init__(self, limit: int, period: float):
+        self.limit = limit
+        self.period = period
+        self.rate = limit / period
+        self.tokens = float(limit)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class HostLimiter:
+    def __init__(self, host: str, quotas=()):
+        self.host = host
+        self.buckets = [TokenBucket(limit, period) for limit, period in quotas]
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled_s = 0.0
+        self.retry_after_count = 0
+
+    def acquire(self):
+        """Blocks until every bucket has a token and no Retry-After is pending."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                for b in self.buckets:
+                    b.refill(now)
+
+                wait = max([self.blocked_until - now] + [b.wait_time() for b in self.buckets])
+                if wait <= 0:
+                    for b in self.buckets:
+                        b.tokens -= 1
+                    self.requests += 1
+                    self.throttled_s += waited
+                    return waited
+
+            time.sleep(wait)
+            waited += wait
+
+    def penalize(self, seconds: float):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.retry_after_count += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "host": self.host,
+                "requests": self.requests,
+                "throttled_s": round(self.throttled_s, 3),
+                "retry_after": self.retry_after_count,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def host_of(url: str) -> str:
+    return urlparse(url or "").netloc.lower()
+
+
+def register(base_url: str, quotas) -> HostLimiter:
+    """Sets the quotas for base_url's host. quotas is a list of (requests, seconds)."""
+    host = host_of(base_url)
+    with _limiters_lock:
+        _limiters[host] = HostLimiter(host, quotas)
+        return _limiters[host]
+
+
+def limiter_for(url: str) -> HostLimiter:
+    host = host_of(url)
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = HostLimiter(host)
+        return _limiters[host]
+
+
+def acquire(url: str) -> float:
+    """Takes one request slot for url's host; returns seconds spent waiting."""
+    return limiter_for(url).acquire()
+
+
+def penalize(url: str, seconds: float):
+    limiter_for(url).penalize(seconds)
+
+
+def retry_after(headers, default: float) -> float:
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return default
+
+
+def report() -> list:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [l.stats() for l in limiters]
+
+
+def print_report():
+    for s in report():
+        print(
+            f"[rate-limit] {s['host']}: {s['requests']:,} requests, "
+            f"{s['throttled_s']:.1f}s throttled, {s['retry_after']} Retry-After"
+        )
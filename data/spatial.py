@@ -0,0 +1,185 @@
+"""
+Spatial index over latitude/longitude points (OpenAQ locations, NCDC stations).
+
+Points are stored as unit vectors on the sphere in a static KD-tree, so
+nearest and within-radius queries cost O(log n) node visits instead of a scan,
+work in any region (no longitude wrap or polar distortion), and report
+great-circle distances. Straight-line (chord) distance between unit vectors
+grows monotonically with great-circle distance, which is what lets the tree
+prune with plain Euclidean bounds.
+
+    index = SpatialIndex((s["id"], s["latitude"], s["longitude"]) for s in stations)
+    index.nearest(39.29, -76.61, k=3)          # [(id, metres), ...] closest first
+    index.within(39.29, -76.61, 25_000)        # every id within 25 km, closest first
+    pair(locations, index, k=3)                # each location's 3 nearest, as rows
+"""
+
+import heapq
+
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_008.8
+
+# points per leaf; leaves are scanned with one vectorized distance computation
+LEAF_SIZE = 16
+
+
+def to_unit(lat, lon) -> np.ndarray:
+    """(lat, lon) in degrees (scalars or arrays) -> unit vectors, shape (..., 3)."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def chord_to_m(chord):
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+def m_to_chord(metres: float) -> float:
+    return 2 * np.sin(min(metres / EARTH_RADIUS_M, np.pi) / 2)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres; any argument may be an array."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class SpatialIndex:
+    """
+    Static KD-tree over (key, lat, lon) points. Points without coordinates are
+    skipped. Nodes are kept in flat lists: node i covers self.order[lo:hi] and
+    splits on axis at value, with children at left[i] / right[i] (-1 for a leaf).
+    """
+
+    def __init__(self, points):
+        keys, lats, lons = [], [], []
+        for key, lat, lon in points:
+            if lat is None or lon is None or np.isnan(lat) or np.isnan(lon):
+                continue
+            keys.append(key)
+            lats.append(lat)
+            lons.append(lon)
+
+        self.keys = keys
+        self.lat = np.asarray(lats, dtype=float)
+        self.lon = np.asarray(lons, dtype=float)
+        self.xyz = to_unit(self.lat, self.lon).reshape(-1, 3)
+        self.order = np.arange(len(keys))
+
+        self.lo, self.hi, self.axis, self.value, self.left, self.right = [], [], [], [], [], []
+        self.box_min, self.box_max = [], []
+        if keys:
+            self._build(0, len(keys))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _build(self, lo: int, hi: int) -> int:
+        node = len(self.lo)
+        idx = self.order[lo:hi]
+        pts = self.xyz[idx]
+        self.lo.append(lo)
+        self.hi.append(hi)
+        self.box_min.append(pts.min(axis=0))
+        self.box_max.append(pts.max(axis=0))
+        self.axis.append(-1)
+        self.value.append(0.0)
+        self.left.append(-1)
+        self.right.append(-1)
+
+        if hi - lo <= LEAF_SIZE:
+            return node
+
+        # split the widest axis at the median
+        axis = int(np.argmax(self.box_max[node] - self.box_min[node]))
+        mid = (hi - lo) // 2
+        part = np.argpartition(pts[:, axis], mid)
+        self.order[lo:hi] = idx[part]
+        self.axis[node] = axis
+        self.value[node] = float(self.xyz[self.order[lo + mid], axis])
+        self.left[node] = self._build(lo, lo + mid)
+        self.right[node] = self._build(lo + mid, hi)
+        return node
+
+    def _box_chord(self, node: int, q: np.ndarray) -> float:
+        # smallest possible chord from q to any point in node's bounding box
+        gap = np.maximum(self.box_min[node] - q, 0) + np.maximum(q - self.box_max[node], 0)
+        return float(np.sqrt(gap @ gap))
+
+    def _leaf(self, node: int, q: np.ndarray):
+        idx = self.order[self.lo[node]:self.hi[node]]
+        return idx, np.sqrt(((self.xyz[idx] - q) ** 2).sum(axis=1))
+
+    def nearest(self, lat: float, lon: float, k: int = 1, max_m: float = None) -> list:
+        """Up to k (key, metres) closest to (lat, lon), closest first; max_m caps the distance."""
+        if not self.keys or k <= 0:
+            return []
+        q = to_unit(lat, lon)
+        bound = m_to_chord(max_m) if max_m is not None else np.inf
+
+        best = []  # max-heap of (-chord, index), at most k entries
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            limit = -best[0][0] if len(best) == k else bound
+            if self._box_chord(node, q) > limit:
+                continue
+            if self.left[node] < 0:
+                idx, chords = self._leaf(node, q)
+                for i, c in zip(idx, chords):
+                    if c > bound:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-c, int(i)))
+                    elif c < -best[0][0]:
+                        heapq.heapreplace(best, (-c, int(i)))
+                continue
+            # visit the side q falls on first, so the k-th best tightens quickly
+            near, far = (self.left[node], self.right[node])
+            if q[self.axis[node]] >= self.value[node]:
+                near, far = far, near
+            stack.append(far)
+            stack.append(near)
+
+        found = sorted((-c, i) for c, i in best)
+        return [(self.keys[i], float(chord_to_m(c))) for c, i in found]
+
+    def within(self, lat: float, lon: float, radius_m: float) -> list:
+        """Every (key, metres) within radius_m of (lat, lon), closest first."""
+        if not self.keys:
+            return []
+        q = to_unit(lat, lon)
+        bound = m_to_chord(radius_m)
+
+        hits = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self._box_chord(node, q) > bound:
+                continue
+            if self.left[node] < 0:
+                idx, chords = self._leaf(node, q)
+                keep = chords <= bound
+                hits.extend(zip(chords[keep].tolist(), idx[keep].tolist()))
+                continue
+            stack.append(self.left[node])
+            stack.append(self.right[node])
+
+        hits.sort()
+        return [(self.keys[i], float(chord_to_m(c))) for c, i in hits]
+
+
+def pair(points, index: SpatialIndex, k: int = 1, max_m: float = None) -> list[dict]:
+    """
+    For every (key, lat, lon) in points, its k nearest entries of index as rows
+    {"key", "match", "rank", "distance_m"} (rank 1 = nearest). Points without
+    coordinates, or with nothing within max_m, get no rows.
+    """
+    rows = []
+    for key, lat, lon in points:
+        if lat is None or lon is None:
+            continue
+        for rank, (match, metres) in enumerate(index.nearest(lat, lon, k, max_m), start=1):
+            rows.append({"key": key, "match": match, "rank": rank, "distance_m": metres})
+    return rows
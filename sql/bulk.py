@@ -0,0 +1,198 @@
+"""
+COPY-based bulk writer.
+
+DataFrame.to_sql(method="multi") renders every chunk as one huge parameterized
+INSERT. COPY FROM STDIN streams the same rows as CSV, which PostgreSQL parses
+far faster and without statement size limits. Frames are written in bounded
+chunks so the CSV buffer never holds more than chunksize rows.
+"""
+
+import io
+from typing import NamedTuple
+
+import pandas as pd
+import sqlalchemy as sa
+
+COPY_CHUNKSIZE = 100_000
+NULL = r"\N"
+
+
+class Upserted(NamedTuple):
+    """upsert_frame's result: rows inserted or changed, and the date_col span they cover."""
+    rows: int
+    first: object = None
+    last: object = None
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def copy_dataframe(df: pd.DataFrame, table_name: str, conn, schema: str = "public", chunksize: int = COPY_CHUNKSIZE) -> int:
+    """
+    COPY df into an existing schema.table_name using an open SQLAlchemy Connection.
+    Returns the number of rows written. The caller owns the transaction.
+    """
+    if df.empty:
+        return 0
+
+    columns = ", ".join(_quote(c) for c in df.columns)
+    sql = (
+        f"COPY {_quote(schema)}.{_quote(table_name)} ({columns}) "
+        f"FROM STDIN WITH (FORMAT csv, NULL '{NULL}')"
+    )
+
+    cursor = conn.connection.cursor()
+    try:
+        for start in range(0, len(df), chunksize):
+            buf = io.StringIO()
+            df.iloc[start:start + chunksize].to_csv(buf, index=False, header=False, na_rep=NULL)
+            buf.seek(0)
+            cursor.copy_expert(sql, buf)
+    finally:
+        cursor.close()
+
+    return len(df)
+
+
+def supports_copy(bind) -> bool:
+    return bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2"
+
+
+def write_frame(df: pd.DataFrame, table_name: str, bind, schema: str = "public", method: str = "copy", chunksize: int = None):
+    """
+    Appends df to an existing table with COPY (PostgreSQL/psycopg2) or to_sql.
+    bind may be an Engine or a Connection; with an Engine the write is its own transaction.
+    """
+    if method == "copy" and supports_copy(bind):
+        if isinstance(bind, sa.engine.Engine):
+            with bind.begin() as conn:
+                return copy_dataframe(df, table_name, conn, schema, chunksize or COPY_CHUNKSIZE)
+        return copy_dataframe(df, table_name, bind, schema, chunksize or COPY_CHUNKSIZE)
+
+    # SQLite caps bound parameters per statement and runs executemany faster than multi-row VALUES anyway
+    df.to_sql(
+        table_name,
+        bind,
+        schema=schema,
+        if_exists="append",
+        index=False,
+        chunksize=chunksize or 10_000,
+        method=None if bind.dialect.name == "sqlite" else "multi",
+    )
+    return len(df)
+
+
+def ensure_unique_key(conn, table_name: str, keys: list[str], schema: str = "public"):
+    """Creates the unique index ON CONFLICT needs, if it isn't there yet."""
+    index_name = _quote(f"{table_name}_natural_key")
+    columns = ", ".join(_quote(k) for k in keys)
+    conn.execute(sa.text(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} "
+        f"ON {_quote(schema)}.{_quote(table_name)} ({columns})"
+    ))
+
+
+def upsert_frame(df: pd.DataFrame, table_name: str, engine, keys: list[str], schema: str = "public", date_col: str = None) -> Upserted:
+    """
+    COPY df into a temp staging table shaped like the target, then
+    INSERT ... ON CONFLICT (keys) DO UPDATE, skipping rows whose values are unchanged.
+    The target stays readable throughout; returns Upserted(rows inserted or changed).
+    With date_col, its first/last bound date_col over the inserted or changed rows
+    only (both None when nothing changed, or without date_col).
+    """
+    df = df.drop_duplicates(subset=keys, keep="last")
+    staging = f"{table_name}_staging"
+    target = f"{_quote(schema)}.{_quote(table_name)}"
+
+    columns = [_quote(c) for c in df.columns]
+    updates = [c for c in df.columns if c not in keys]
+    column_list = ", ".join(columns)
+
+    if updates:
+        changed = (
+            "(" + ", ".join(f"t.{_quote(c)}" for c in updates) + ") IS DISTINCT FROM ("
+            + ", ".join(f"EXCLUDED.{_quote(c)}" for c in updates) + ")"
+        )
+        on_conflict = (
+            "DO UPDATE SET " + ", ".join(f"{_quote(c)} = EXCLUDED.{_quote(c)}" for c in updates)
+            + f" WHERE {changed}"
+        )
+    else:
+        on_conflict = "DO NOTHING"
+
+    with engine.begin() as conn:
+        ensure_unique_key(conn, table_name, keys, schema)
+        conn.execute(sa.text(
+            f"CREATE TEMP TABLE {_quote(staging)} (LIKE {target} INCLUDING DEFAULTS) ON COMMIT DROP"
+        ))
+        copy_dataframe(df, staging, conn, schema="pg_temp")
+        upsert = (
+            f"INSERT INTO {target} AS t ({column_list}) "
+            f"SELECT {column_list} FROM {_quote(staging)} "
+            f"ON CONFLICT ({', '.join(_quote(k) for k in keys)}) {on_conflict}"
+        )
+        if date_col is None:
+            return Upserted(conn.execute(sa.text(upsert)).rowcount)
+
+        col = _quote(date_col)
+        row = conn.execute(sa.text(
+            f"WITH changed AS ({upsert} RETURNING t.{col}) "
+            f"SELECT COUNT(*), MIN({col}), MAX({col}) FROM changed"
+        )).one()
+
+    return Upserted(*row)
+
+
+def swap_frame(df: pd.DataFrame, table_name: str, engine, schema: str = "public", keys: list[str] = None, create=None, after_swap=None) -> int:
+    """
+    Loads df into a side table, then renames it over the live table in one short transaction.
+    Readers keep seeing the old table until the swap commits.
+    """
+    return swap_frames([df], table_name, engine, schema, keys, create, after_swap)
+
+
+def swap_frames(frames, table_name: str, engine, schema: str = "public", keys: list[str] = None, create=None, after_swap=None) -> int:
+    """
+    swap_frame for an iterable of frames (e.g. a stream of chunks); the first frame sets the schema.
+    create(conn, side_table, df), if given, replaces that inference and runs before every
+    chunk is copied (e.g. to add partitions); after_swap(conn) runs inside the swap transaction.
+    """
+    new_table = f"{table_name}__new"
+    old_table = f"{table_name}__old"
+
+    with engine.begin() as conn:
+        conn.execute(sa.text(f"DROP TABLE IF EXISTS {_quote(schema)}.{_quote(new_table)}"))
+
+    written = 0
+    for df in frames:
+        if written == 0 and create is None:
+            df.head(0).to_sql(new_table, engine, schema=schema, if_exists="replace", index=False)
+        with engine.begin() as conn:
+            if create is not None:
+                create(conn, new_table, df)
+            written += copy_dataframe(df, new_table, conn, schema)
+
+    if written == 0:
+        return 0
+
+    with engine.begin() as conn:
+        if keys:
+            ensure_unique_key(conn, new_table, keys, schema)
+
+    with engine.begin() as conn:
+        live = sa.inspect(conn).has_table(table_name, schema=schema)
+        if live:
+            conn.execute(sa.text(f"ALTER TABLE {_quote(schema)}.{_quote(table_name)} RENAME TO {_quote(old_table)}"))
+        conn.execute(sa.text(f"ALTER TABLE {_quote(schema)}.{_quote(new_table)} RENAME TO {_quote(table_name)}"))
+        if live:
+            conn.execute(sa.text(f"DROP TABLE {_quote(schema)}.{_quote(old_table)}"))
+        if keys:
+            conn.execute(sa.text(
+                f"ALTER INDEX {_quote(schema)}.{_quote(new_table + '_natural_key')} "
+                f"RENAME TO {_quote(table_name + '_natural_key')}"
+            ))
+        if after_swap is not None:
+            after_swap(conn)
+
+    return written
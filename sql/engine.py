@@ -1,5 +1,23 @@
-import sqlalchemy as sa
+"""
+Engine profiles.
+
+Each profile is one lazily built, cached Engine with its own pool and
+per-session settings, so nothing connects (or even builds an engine) at import:
+
+    bulk_load       the loaders: larger pool, psycopg2 executemany batching, and
+                    synchronous_commit=off / more work_mem for every session.
+                    A crash can lose the last few commits, which a re-run refetches.
+    dashboard_read  short read-only sessions with a statement timeout
+    default         plain settings for everything else
+
+    from sql.engine import get_engine
+    engine = get_engine("bulk_load")
+"""
+
 import os
+import threading
+
+import sqlalchemy as sa
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,9 +26,85 @@ DB_PASS = os.getenv("DB_PASS")
 DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
 
 DB_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = sa.create_engine(DB_URL,echo=True)
+BULK_WORK_MEM = os.getenv("DB_BULK_WORK_MEM", "256MB")
+READ_WORK_MEM = os.getenv("DB_READ_WORK_MEM", "64MB")
+READ_TIMEOUT = os.getenv("DB_READ_TIMEOUT", "30s")
+
+# create_engine arguments and session settings (SET name = value on connect) per profile
+PROFILES = {
+    "default": {
+        "engine": dict(pool_size=5, max_overflow=5, pool_pre_ping=True),
+        "session": {},
+    },
+    "bulk_load": {
+        "engine": dict(
+            pool_size=int(os.getenv("DB_BULK_POOL_SIZE", "8")),
+            max_overflow=4,
+            pool_pre_ping=True,
+            # to_sql / executemany: multi-row VALUES for INSERTs, execute_batch for UPDATE/DELETE
+            executemany_mode="values_plus_batch",
+            insertmanyvalues_page_size=5_000,
+            executemany_batch_page_size=500,
+        ),
+        "session": {
+            "synchronous_commit": "off",
+            "work_mem": BULK_WORK_MEM,
+            "maintenance_work_mem": os.getenv("DB_BULK_MAINTENANCE_WORK_MEM", "512MB"),
+        },
+    },
+    "dashboard_read": {
+        "engine": dict(
+            pool_size=int(os.getenv("DB_READ_POOL_SIZE", "10")),
+            max_overflow=10,
+            pool_pre_ping=True,
+            pool_recycle=1800,
+        ),
+        "session": {
+            "default_transaction_read_only": "on",
+            "statement_timeout": READ_TIMEOUT,
+            "work_mem": READ_WORK_MEM,
+        },
+    },
+}
+
+_engines = {}
+_lock = threading.Lock()
+
+
+def session_options(settings: dict) -> str:
+    """libpq startup options that apply settings to every new session."""
+    return " ".join(f"-c {name}={value}" for name, value in settings.items())
+
+
+def get_engine(profile: str = "default") -> sa.Engine:
+    """The Engine for profile, built on first use and shared afterwards."""
+    if profile not in PROFILES:
+        raise ValueError(f"unknown engine profile {profile!r}; expected one of {sorted(PROFILES)}")
+
+    with _lock:
+        if profile not in _engines:
+            spec = PROFILES[profile]
+            kwargs = dict(spec["engine"])
+            if spec["session"]:
+                kwargs["connect_args"] = {"options": session_options(spec["session"])}
+            _engines[profile] = sa.create_engine(DB_URL, echo=DB_ECHO, **kwargs)
+        return _engines[profile]
+
+
+def dispose():
+    """Closes every pooled connection of every profile built so far."""
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
 
-#Connection From Database to Python
\ No newline at end of file
+def __getattr__(name):
+    # `from sql.engine import engine` keeps working, but only builds the engine when asked for
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
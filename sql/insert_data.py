@@ -1,14 +1,60 @@
+import argparse
+import os
+import sys
+from datetime import timedelta
+
 import pandas as pd
+import sqlalchemy as sa
 from sqlalchemy import text
 
-from sql.engine import engine
+from sql.engine import get_engine, dispose
+from sql.bulk import write_frame, copy_dataframe, upsert_frame, swap_frame, swap_frames
+from sql import scheduler, rollups, schema
 
 import data.raw.OPENAQ as openaq
 import data.raw.NOAACO2 as co2
 import data.raw.NCDCDO as ncdc
+from data.raw import ratelimit, http_client
+from data import lake, metrics, quality, spatial
+from data.manifest import Manifest
 
 PUBLIC_SCHEMA = "public"
 
+# Natural keys used by the "upsert" and "swap" load modes
+NATURAL_KEYS = {
+    "openaq_daily": ["sensor_id", "date"],
+    "openaq_hourly": ["sensor_id", "datetime_utc"],
+    "openaq_locations": ["id"],
+    "openaq_sensors": ["id"],
+    "ncdc_stations": ["id"],
+    "openaq_location_stations": ["location_id", "station_id"],
+    "noaa_ncdc_ghcnd_daily": ["station_id", "date", "datatype"],
+    "noaa_ncdc_ghcnd_wide": ["station_id", "date"],
+    "noaa_co2_daily_mlo": ["date"],
+    "noaa_co2_monthly_mlo": ["date"],
+    "noaa_co2_annual_mlo": ["date"],
+}
+
+# "replace" (default) drops and recreates (readers see an empty table while it loads);
+# opt in to "upsert" (merges on NATURAL_KEYS) or "swap" (rebuilds off to the side and renames)
+LOAD_MODE = os.getenv("LOAD_MODE", "replace")
+
+# Days re-fetched before each sensor's high-water mark to pick up late corrections
+LOOKBACK_DAYS = 7
+
+# Replace/swap loads of tables up to this many rows are diffed against the live table,
+# so rollups only refresh the dates that really changed
+SPAN_DIFF_MAX_ROWS = int(os.getenv("SPAN_DIFF_MAX_ROWS", "200000"))
+
+# GHCND layout: "long" (one row per station/date/datatype), "wide" (one row per
+# station and day, see NCDCDO.to_wide) or "both"
+GHCND_LAYOUT = os.getenv("GHCND_LAYOUT", "both")
+GHCND_LAYOUTS = ("long", "wide", "both")
+
+# NCDC stations paired with each OpenAQ location: how many, and at most how far away
+PAIR_STATIONS = int(os.getenv("PAIR_STATIONS", "3"))
+PAIR_MAX_KM = float(os.getenv("PAIR_MAX_KM", "50"))
+
 
 def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
@@ -16,149 +62,644 @@ def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def create_and_load(df: pd.DataFrame, table_name: str, engine, if_exists: str = "replace"):
+def is_declared(table_name: str, engine) -> bool:
+    """True when table_name is created from sql/schema.py rather than inferred by to_sql."""
+    return schema.is_managed(table_name) and engine.dialect.name == "postgresql"
+
+
+def check_quality(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
     """
-    Option B:
-      - Create table schema from df (0 rows)
-      - Append full df
+    Runs data/quality.py's checks for table_name (if it has any) on a normalized
+    frame: adds the qa_flags column and records the per-check counts for the
+    run's qa_summary. Frames that already carry qa_flags were checked upstream.
     """
-    df = normalize_columns(df)
+    if not quality.is_checked(table_name) or "qa_flags" in df.columns:
+        return df
+    with metrics.timed("qa", table_name) as t:
+        t.rows = len(df)
+        df, summary = quality.validate(df, table_name)
+    quality.record(summary)
+    return df
+
+
+def require_complete(manifest, source: str, replaces: bool):
+    """
+    Stops a load whose fetch lost units (recorded as failed in the manifest)
+    before it writes anything. A --resume run may merge what it has into the
+    live table; replacing a table with partial data is never allowed.
+    """
+    if manifest is not None:
+        manifest.check(source, partial_ok=manifest.resume and not replaces)
+
+
+def streamed_mode(if_exists: str, manifest) -> str:
+    """
+    stream_load mode for a checkpointed fetch. "replace" would commit the first
+    chunk over the live table before a later unit can still fail, so it swaps
+    instead: nothing is renamed in until every chunk passed require_complete.
+    """
+    return "swap" if manifest is not None and if_exists == "replace" else if_exists
+
+
+def checked_frames(frames, manifest, source: str, replaces: bool):
+    """Passes frames through, calling require_complete before each chunk and after the last."""
+    for df in frames:
+        require_complete(manifest, source, replaces)
+        yield df
+    require_complete(manifest, source, replaces)
 
-    df.head(0).to_sql(
-        table_name,
-        engine,
-        schema=PUBLIC_SCHEMA,
-        if_exists=if_exists,
-        index=False,
-    )
 
-    df.to_sql(
-        table_name,
-        engine,
-        schema=PUBLIC_SCHEMA,
-        if_exists="append",
-        index=False,
-        chunksize=10_000,
-        method="multi",
+def swap_hooks(table_name: str) -> dict:
+    """swap_frames hooks that build a declared table's side copy and rename its partitions/indexes after the swap."""
+    return dict(
+        create=lambda conn, name, df: schema.prepare_load(conn, table_name, df, PUBLIC_SCHEMA, name=name),
+        after_swap=lambda conn: schema.rename_swapped(conn, table_name, PUBLIC_SCHEMA),
     )
 
-    print(f"Loaded {len(df):,} rows -> {PUBLIC_SCHEMA}.{table_name}")
 
+def changed_span(df: pd.DataFrame, table_name: str, engine, date_col: str) -> tuple:
+    """
+    (first, last) date of the rows that replacing table_name with df adds or removes;
+    (None, None) when it changes nothing. Tables over SPAN_DIFF_MAX_ROWS aren't read back
+    and a changed column layout changes every row, so both count as df's whole span.
+    """
+    span = (df[date_col].min(), df[date_col].max())
+    inspector = sa.inspect(engine)
+    if len(df) > SPAN_DIFF_MAX_ROWS or not inspector.has_table(table_name, schema=PUBLIC_SCHEMA):
+        return span
+    if {c["name"] for c in inspector.get_columns(table_name, schema=PUBLIC_SCHEMA)} != set(df.columns):
+        return span
 
-def load_openaq(engine):
-    pollutant_fns = [
-        openaq.pm25,
-        openaq.co,
-        openaq.o3,
-        openaq.so2,
-        openaq.no2,
-        openaq.nox,
-        openaq.pm1,
-        openaq.pm10,
-    ]
+    with engine.connect() as conn:
+        rows = conn.execute(text(f'SELECT COUNT(*) FROM {PUBLIC_SCHEMA}."{table_name}"')).scalar()
+        if rows > SPAN_DIFF_MAX_ROWS:
+            return span
+        live = pd.read_sql_table(table_name, conn, schema=PUBLIC_SCHEMA, columns=list(df.columns))
+
+    # the database hands numbers back widened (REAL as float64): compare them as df's types
+    for col, dtype in df.dtypes.items():
+        if col == date_col or not pd.api.types.is_numeric_dtype(dtype):
+            continue
+        if pd.api.types.is_float_dtype(dtype) or live[col].notna().all():
+            live[col] = live[col].astype(dtype)
+
+    def canonical(frame):
+        # ... and dates and NULLs in its own types
+        dates = pd.to_datetime(frame[date_col], utc=True).dt.strftime("%Y-%m-%d")
+        return frame.astype(object).where(frame.notna(), None).astype(str).assign(**{date_col: dates}).drop_duplicates()
+
+    both = pd.concat([canonical(live), canonical(df)], ignore_index=True)
+    diff = both[~both.duplicated(keep=False)]
+    if diff.empty:
+        return None, None
+    return diff[date_col].min(), diff[date_col].max()
+
+
+def create_and_load(df: pd.DataFrame, table_name: str, engine, if_exists: str = "replace", method: str = "copy", keys: list[str] = None, normalize: bool = True):
+    """
+    Option B:
+      - Create table schema from df (0 rows), or from sql/schema.py for the declared tables
+      - Append full df (COPY FROM STDIN on PostgreSQL, to_sql(method="multi") with method="multi")
 
-    daily_frames = []
-    for fn in pollutant_fns:
-        df_daily, _ = fn()
-        daily_frames.append(df_daily)
+    if_exists="upsert" merges into the live table on keys (default NATURAL_KEYS[table_name]);
+    if_exists="swap" loads a side table and renames it into place. Neither empties the live table.
+    normalize=False keeps df's column names as they are.
+    """
+    df = check_quality(normalize_columns(df) if normalize else df, table_name)
+
+    with metrics.timed("db_write", table_name) as t:
+        t.rows = len(df)
+        keys = keys or NATURAL_KEYS.get(table_name)
+
+        date_col = rollups.SOURCES.get(table_name)
+        declared = is_declared(table_name, engine)
+        if declared:
+            df = schema.prepare(df, table_name)
+
+        if if_exists == "upsert":
+            if not keys:
+                raise ValueError(f"upsert needs natural keys for {table_name}")
+            if sa.inspect(engine).has_table(table_name, schema=PUBLIC_SCHEMA):
+                if declared:
+                    # only the partitions for the years in df are created or touched
+                    with engine.begin() as conn:
+                        schema.prepare_load(conn, table_name, df, PUBLIC_SCHEMA)
+                # only the dates whose rows really changed need their rollups refreshed
+                written = upsert_frame(df, table_name, engine, keys, schema=PUBLIC_SCHEMA, date_col=date_col)
+                if date_col is not None and written.rows:
+                    rollups.mark_changed(table_name, written.first, written.last)
+                print(f"Upserted {len(df):,} rows ({written.rows:,} new or changed) -> {PUBLIC_SCHEMA}.{table_name}")
+                return
+            if_exists = "swap"
+
+        if date_col is not None and not df.empty:
+            first, last = changed_span(df, table_name, engine, date_col)
+            if first is not None:
+                rollups.mark_changed(table_name, first, last)
+
+        if if_exists == "swap":
+            hooks = swap_hooks(table_name) if declared else {}
+            swap_frame(df, table_name, engine, schema=PUBLIC_SCHEMA, keys=keys, **hooks)
+            print(f"Swapped in {len(df):,} rows -> {PUBLIC_SCHEMA}.{table_name}")
+            return
+
+        if declared:
+            with engine.begin() as conn:
+                if if_exists == "replace":
+                    schema.create_table(conn, table_name, PUBLIC_SCHEMA, replace=True)
+                schema.prepare_load(conn, table_name, df, PUBLIC_SCHEMA)
+                write_frame(df, table_name, conn, schema=PUBLIC_SCHEMA, method=method)
+            print(f"Loaded {len(df):,} rows -> {PUBLIC_SCHEMA}.{table_name}")
+            return
+
+        df.head(0).to_sql(
+            table_name,
+            engine,
+            schema=PUBLIC_SCHEMA,
+            if_exists=if_exists,
+            index=False,
+        )
+
+        write_frame(df, table_name, engine, schema=PUBLIC_SCHEMA, method=method)
+
+        print(f"Loaded {len(df):,} rows -> {PUBLIC_SCHEMA}.{table_name}")
+
+
+def get_high_water_marks(engine, table_name: str = "openaq_daily") -> dict:
+    """Latest loaded date per (sensor_id, parameter); empty when the table doesn't exist yet."""
+    if not sa.inspect(engine).has_table(table_name, schema=PUBLIC_SCHEMA):
+        return {}
 
-    df_all = pd.concat(daily_frames, ignore_index=True)
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            f"SELECT sensor_id, parameter, MAX(date) "
+            f"FROM {PUBLIC_SCHEMA}.{table_name} GROUP BY sensor_id, parameter"
+        ))
+        return {(sensor_id, parameter): pd.Timestamp(d).date() for sensor_id, parameter, d in rows}
 
-    df_all["date"] = pd.to_datetime(df_all["date"]).dt.normalize()
 
-    create_and_load(df_all, "openaq_daily", engine, if_exists="replace")
+def merge_window(df: pd.DataFrame, table_name: str, engine, keys: list[str], date_col: str = "date"):
+    """
+    Replaces, per keys group, every row on/after that group's first date in df, then appends df.
+    Runs in one transaction so readers never see the window half-loaded.
+    """
+    df = normalize_columns(df)
+    if df.empty:
+        print(f"No new rows for {PUBLIC_SCHEMA}.{table_name}")
+        return
+    df = check_quality(df, table_name)
+    declared = is_declared(table_name, engine)
+    if declared:
+        df = schema.prepare(df, table_name)
+
+    windows = df.groupby(keys, as_index=False)[date_col].min()
+    tmp = f"tmp_{table_name}_window"
+
+    with metrics.timed("db_write", table_name) as t, engine.begin() as conn:
+        t.rows = len(df)
+        if declared:
+            schema.prepare_load(conn, table_name, df, PUBLIC_SCHEMA)
+        # session-private, typed like the target's columns, gone at commit
+        conn.execute(text(
+            f"CREATE TEMP TABLE {tmp} ON COMMIT DROP AS "
+            f"SELECT {', '.join(windows.columns)} FROM {PUBLIC_SCHEMA}.{table_name} WITH NO DATA"
+        ))
+        copy_dataframe(windows, tmp, conn, schema="pg_temp")
+        match = " AND ".join(f"t.{k} = w.{k}" for k in keys)
+        deleted = conn.execute(text(
+            f"DELETE FROM {PUBLIC_SCHEMA}.{table_name} t USING pg_temp.{tmp} w "
+            f"WHERE {match} AND t.{date_col} >= w.{date_col}"
+        )).rowcount
+
+        write_frame(df, table_name, conn, schema=PUBLIC_SCHEMA)
+
+    rollups.mark_changed(table_name, df[date_col].min(), df[date_col].max())
+    print(f"Merged {len(df):,} rows ({deleted:,} replaced) -> {PUBLIC_SCHEMA}.{table_name}")
+
+
+def stream_load(frames, table_name: str, engine, if_exists: str = "replace"):
+    """
+    create_and_load for a stream of chunks: each chunk is written and dropped before
+    the next one is built. "swap" swaps once after the last chunk.
+    """
+    if if_exists == "swap":
+        declared = is_declared(table_name, engine)
+        prepared = (check_quality(normalize_columns(df), table_name) for df in frames if not df.empty)
+        if declared:
+            prepared = (schema.prepare(df, table_name) for df in prepared)
+        written = swap_frames(
+            prepared, table_name, engine, schema=PUBLIC_SCHEMA, keys=NATURAL_KEYS.get(table_name),
+            **(swap_hooks(table_name) if declared else {}),
+        )
+        rollups.mark_changed(table_name)
+        print(f"Swapped in {written:,} rows -> {PUBLIC_SCHEMA}.{table_name}")
+        return
+
+    for df in frames:
+        if df.empty:
+            continue
+        create_and_load(df, table_name, engine, if_exists=if_exists)
+        if if_exists == "replace":
+            if_exists = "append"
+
+
+def load_openaq(engine, incremental: bool = False, lookback_days: int = LOOKBACK_DAYS, stream: bool = False, from_lake: bool = False, manifest=None):
+    if from_lake:
+        df_all = lake.read_stage("final", "openaq")
+        if df_all.empty:
+            print("The lake has no final openaq rows; run a load from the API first")
+            return
+        create_and_load(df_all, "openaq_daily", engine, if_exists=LOAD_MODE)
+        return
+
+    if incremental:
+        hwm = get_high_water_marks(engine, "openaq_daily")
+        if hwm:
+            return load_openaq_incremental(engine, hwm, lookback_days, stream, manifest)
+        print("openaq_daily is empty; running full load")
+
+    replaces = LOAD_MODE != "upsert"
+    if stream:
+        frames = checked_frames(openaq.iter_daily(openaq.PARAMETERS, manifest=manifest), manifest, "openaq", replaces)
+        # the final stage is rewritten as the chunks pass, so --from-lake matches this run
+        stream_load(
+            lake.write_stage_chunks(frames, "final", "openaq"), "openaq_daily", engine,
+            if_exists=streamed_mode(LOAD_MODE, manifest),
+        )
+        return
+
+    df_all = openaq.get_daily(openaq.PARAMETERS, persist_raw=True, manifest=manifest)
+    require_complete(manifest, "openaq", replaces)
 
+    df_all["date"] = pd.to_datetime(df_all["date"]).dt.normalize()
+
+    lake.write_stage(df_all, "final", "openaq")
+    create_and_load(df_all, "openaq_daily", engine, if_exists=LOAD_MODE)
 
 
-def load_noaa_co2(engine):
+def load_openaq_incremental(engine, hwm: dict, lookback_days: int = LOOKBACK_DAYS, stream: bool = False, manifest=None):
     """
-    Loads CO2 daily, monthly, annual from NOAACO2.py
+    Fetches only days after each sensor's high-water mark (minus lookback_days)
+    and merges them into openaq_daily. Sensors not seen before get full history.
     """
-    df_daily = co2.get_daily_co2()
-    df_monthly = co2.get_monthly_co2()
-    df_annual = co2.get_annual_co2()
+    since = {
+        sensor_id: (last - timedelta(days=lookback_days)).isoformat()
+        for (sensor_id, _), last in hwm.items()
+    }
 
-    create_and_load(df_daily, "noaa_co2_daily_mlo", engine, if_exists="replace")
-    create_and_load(df_monthly, "noaa_co2_monthly_mlo", engine, if_exists="replace")
-    create_and_load(df_annual, "noaa_co2_annual_mlo", engine, if_exists="replace")
+    if stream:
+        frames = openaq.iter_daily(openaq.PARAMETERS, since=since, manifest=manifest)
+        for df in checked_frames(frames, manifest, "openaq", replaces=False):
+            merge_window(df, "openaq_daily", engine, keys=["sensor_id", "parameter"])
+        return
 
+    df_all = openaq.get_daily(openaq.PARAMETERS, since=since, manifest=manifest)
+    require_complete(manifest, "openaq", replaces=False)
 
-def load_ncdc_ghcn(engine):
+    if df_all.empty:
+        print("openaq_daily is up to date")
+        return
+
+    df_all["date"] = pd.to_datetime(df_all["date"]).dt.normalize()
+
+    merge_window(df_all, "openaq_daily", engine, keys=["sensor_id", "parameter"])
+
+
+def load_openaq_hourly(engine, incremental: bool = False, lookback_days: int = LOOKBACK_DAYS, manifest=None):
+    """
+    Streams hourly aggregates into openaq_hourly (each sensor's range split into
+    date windows that are fetched concurrently), then rolls the loaded days up into
+    openaq_daily inside PostgreSQL instead of fetching /days separately.
+    incremental starts each sensor lookback_days before its latest loaded hour.
+    """
+    if engine.dialect.name == "postgresql":
+        # the daily rollup upserts on openaq_daily's key; fail before fetching any hours
+        with engine.connect() as conn:
+            schema.require_declared(conn, "openaq_daily", PUBLIC_SCHEMA)
+
+    since = None
+    if_exists = LOAD_MODE
+    if incremental:
+        hwm = get_high_water_marks(engine, "openaq_hourly")
+        if hwm:
+            since = {
+                sensor_id: (last - timedelta(days=lookback_days)).isoformat()
+                for (sensor_id, _), last in hwm.items()
+            }
+            # only the refetched window arrives, so it has to merge into what's there
+            if_exists = "upsert"
+        else:
+            print("openaq_hourly is empty; running full load")
+
+    spans = []
+
+    def track(frames):
+        for df in frames:
+            if not df.empty:
+                spans.append((df["date"].min(), df["date"].max()))
+            yield df
+
+    frames = checked_frames(openaq.iter_hourly(openaq.PARAMETERS, since=since, manifest=manifest), manifest, "openaq", if_exists != "upsert")
+    stream_load(track(frames), "openaq_hourly", engine, if_exists=streamed_mode(if_exists, manifest))
+
+    if not spans:
+        print("No hourly rows loaded")
+        return
+    if engine.dialect.name != "postgresql":
+        print(f"Daily rollup of openaq_hourly needs PostgreSQL; skipping on {engine.dialect.name}")
+        return
+
+    first = pd.Timestamp(min(s[0] for s in spans)).date()
+    last = pd.Timestamp(max(s[1] for s in spans)).date()
+    with metrics.timed("hourly_rollup", "openaq_daily") as t:
+        t.rows = rollups.daily_from_hourly(engine, first, last, schema=PUBLIC_SCHEMA)
+
+
+def load_noaa_co2(engine, from_lake: bool = False):
     """
-    Loads NOAA NCDC CDO daily data (GHCND) for your two stations from NCDCDO.py.
-    Your get_data_year(...) already adds a 'station' name column.
+    Loads CO2 daily, monthly, annual from NOAACO2.py (or the lake's final stage)
     """
+    if from_lake:
+        df_daily = lake.read_stage("final", "noaa_co2_daily")
+        df_monthly = lake.read_stage("final", "noaa_co2_monthly")
+        df_annual = lake.read_stage("final", "noaa_co2_annual")
+    else:
+        df_daily = co2.get_daily_co2()
+        df_monthly = co2.get_monthly_co2()
+        df_annual = co2.get_annual_co2()
 
-    df_msc = ncdc.get_data_year(ncdc.MSCABV, ncdc.MSC)
-    df_bwi = ncdc.get_data_year(ncdc.BWIABV, ncdc.BWI)
+        lake.write_stage(df_daily, "final", "noaa_co2_daily")
+        lake.write_stage(df_monthly, "final", "noaa_co2_monthly")
+        lake.write_stage(df_annual, "final", "noaa_co2_annual")
 
-    df_all = pd.concat([df_msc, df_bwi], ignore_index=True)
+    create_and_load(df_daily, "noaa_co2_daily_mlo", engine, if_exists=LOAD_MODE)
+    create_and_load(df_monthly, "noaa_co2_monthly_mlo", engine, if_exists=LOAD_MODE)
+    create_and_load(df_annual, "noaa_co2_annual_mlo", engine, if_exists=LOAD_MODE)
 
-    if "date" in df_all.columns:
-        df_all["date"] = pd.to_datetime(df_all["date"], errors="coerce")
 
-    create_and_load(df_all, "noaa_ncdc_ghcnd_daily", engine, if_exists="replace")
+def load_ncdc_ghcn(engine, all_stations: bool = False, from_lake: bool = False, manifest=None, layout: str = GHCND_LAYOUT):
+    """
+    Loads NOAA NCDC CDO daily data (GHCND) from NCDCDO.py for the two default
+    stations, or for every station get_stations() returns when all_stations=True.
+    get_data_stations(...) maps the 'station' column to station names and keeps the
+    ids in station_id, which both tables are keyed on.
+    The fetched rows are kept in the lake's raw stage; from_lake reloads from there.
+
+    layout picks the tables written: the long noaa_ncdc_ghcnd_daily, the
+    noaa_ncdc_ghcnd_wide pivot (tmax/tmin/prcp per station and day), or both.
+    """
+    if layout not in GHCND_LAYOUTS:
+        raise ValueError(f"unknown GHCND layout {layout!r}; expected one of {GHCND_LAYOUTS}")
+
+    if from_lake:
+        df_all = lake.read_stage("raw", "ncdc")
+    else:
+        stations = ncdc.catalog.names() if all_stations else ncdc.STATIONS
+        df_all = ncdc.get_data_stations(stations, manifest=manifest)
+        require_complete(manifest, "ncdc", replaces=LOAD_MODE != "upsert")
+        lake.write_stage(df_all, "raw", "ncdc", parameter_col="datatype")
 
-def load_openaq_locations():
+    if "date" in df_all.columns:
+        df_all["date"] = pd.to_datetime(df_all["date"], errors="coerce")
+    if "datatype" in df_all.columns:
+        # lake files written before the standard-units labels carry the old ones
+        df_all = ncdc.label_units(df_all)
+    if "station_id" not in df_all.columns and "station" in df_all.columns:
+        # older lake files only kept the mapped station names; map them back
+        # from the loaded ncdc_stations table rather than the API
+        stations = loaded_station_names(engine) if all_stations else ncdc.STATIONS
+        df_all["station_id"] = df_all["station"].map({name: sid for sid, name in stations.items()})
+    if "station_id" in df_all.columns and df_all["station_id"].isna().any():
+        # both GHCND tables are keyed on station_id; names alone aren't unique
+        print(f"[WARN] dropping {int(df_all['station_id'].isna().sum()):,} GHCND rows without a station id")
+        df_all = df_all.dropna(subset=["station_id"])
+
+    # checked once here so the wide rows can carry the long rows' flags
+    df_all = check_quality(normalize_columns(df_all), "noaa_ncdc_ghcnd_daily")
+
+    if layout in ("long", "both"):
+        create_and_load(df_all, "noaa_ncdc_ghcnd_daily", engine, if_exists=LOAD_MODE)
+    if layout in ("wide", "both"):
+        with metrics.timed("pivot", "ncdc") as t:
+            wide = ncdc.to_wide(df_all)
+            t.rows = len(wide)
+        create_and_load(wide, "noaa_ncdc_ghcnd_wide", engine, if_exists=LOAD_MODE)
+
+def loaded_station_names(engine) -> dict:
+    """{station id: name} from the loaded ncdc_stations table, on top of the default STATIONS."""
+    if not sa.inspect(engine).has_table("ncdc_stations", schema=PUBLIC_SCHEMA):
+        return dict(ncdc.STATIONS)
+    df = pd.read_sql(text(f"SELECT id, name FROM {PUBLIC_SCHEMA}.ncdc_stations"), engine)
+    return {**ncdc.STATIONS, **dict(zip(df["id"], df["name"]))}
+
+def load_openaq_locations(engine):
     rows = openaq.get_location_details()
     df = pd.DataFrame(rows)
 
-    df.to_sql(
-        "openaq_locations",
-        engine,
-        schema="public",
-        if_exists="replace",
-        index=False
-    )
-
-    print(f"Loaded {len(df)} OpenAQ locations")
+    create_and_load(df, "openaq_locations", engine, if_exists=LOAD_MODE)
 
-def load_openaq_sensors():
+def load_openaq_sensors(engine):
     rows = openaq.get_sensor_details()
     df = pd.DataFrame(rows)
 
-    df.to_sql(
-        "openaq_sensors",
-        engine,
-        schema="public",
-        if_exists="replace",
-        index=False
-    )
-
-    print(f"Loaded {len(df)} OpenAQ sensors")
+    create_and_load(df, "openaq_sensors", engine, if_exists=LOAD_MODE)
 
-def load_ncdc_stations():
-    rows = ncdc.get_stations()
+def load_ncdc_stations(engine):
+    rows = ncdc.catalog.stations()
     df = pd.DataFrame(rows)
 
-    df.to_sql(
-        "ncdc_stations",
-        engine,
-        schema="public",
-        if_exists="replace",
-        index=False
+    # ncdc_stations has always kept the API's column names (elevationUnit, ...)
+    create_and_load(df, "ncdc_stations", engine, if_exists=LOAD_MODE, normalize=False)
+
+
+def load_location_stations(engine):
+    """
+    openaq_location_stations: the PAIR_STATIONS nearest NCDC stations (within
+    PAIR_MAX_KM) of every OpenAQ location, ranked, with great-circle distances,
+    from a spatial index over the station coordinates.
+    """
+    stations = ncdc.catalog.stations()
+    names = {st["id"]: st.get("name") for st in stations}
+    locations = openaq.catalog.locations()
+
+    rows = spatial.pair(
+        ((loc.id, *openaq.location_coordinates(loc)) for loc in locations),
+        ncdc.station_index(stations),
+        k=PAIR_STATIONS,
+        max_m=PAIR_MAX_KM * 1000,
     )
+    loc_names = {loc.id: loc.name for loc in locations}
+    df = pd.DataFrame({
+        "location_id": [r["key"] for r in rows],
+        "location_name": [loc_names[r["key"]] for r in rows],
+        "station_id": [r["match"] for r in rows],
+        "station_name": [names[r["match"]] for r in rows],
+        "rank": [r["rank"] for r in rows],
+        "distance_km": [r["distance_m"] / 1000 for r in rows],
+    })
+    if df.empty:
+        print(f"No NCDC station within {PAIR_MAX_KM:g} km of any OpenAQ location")
+        return
+
+    create_and_load(df, "openaq_location_stations", engine, if_exists=LOAD_MODE)
+
+
+def load_qa_summary(engine, summary: pd.DataFrame):
+    """Appends this run's per-table, per-check QA counts (quality.take_summary()) to qa_summary."""
+    if summary.empty:
+        return
+    summary = summary.assign(run_at=pd.Timestamp.now(tz="UTC").tz_localize(None))
+    create_and_load(summary, "qa_summary", engine, if_exists="append")
 
-    print(f"Loaded {len(df)} NCDC stations")
 
+def main(incremental: bool = False, refresh_catalog: bool = False, all_stations: bool = False, stream: bool = False, from_lake: bool = False, resume: bool = False, workers: int = scheduler.MAX_WORKERS, hourly: bool = False, ghcnd_layout: str = GHCND_LAYOUT) -> bool:
 
-def main():
+    # Loader profile: batched executemany, synchronous_commit=off and more work_mem per session
+    engine = get_engine("bulk_load")
 
     # Quick connection test
     with engine.connect() as conn:
         conn.execute(text("SELECT 1"))
         print("DB connection OK")
 
-    # Load everything
-    load_openaq(engine)
-    load_openaq_locations()
-    load_openaq_sensors()
-    load_ncdc_stations()
-    load_noaa_co2(engine)
-    load_ncdc_ghcn(engine)
-
-    print("All loads complete.")
+    # Checkpoints: resume reuses units finished by an earlier (interrupted) run
+    manifest = Manifest(resume=resume)
+
+    # Load everything: sources run side by side, the OpenAQ and NCDC loads each share one catalog fetch
+    catalog_fetch = openaq.catalog.refresh if refresh_catalog else openaq.catalog.locations
+    if hourly and not from_lake:
+        # openaq_daily is rolled up from the hours; location names come from openaq_locations
+        openaq_task = scheduler.Task(
+            "openaq", load_openaq_hourly, (engine,),
+            dict(incremental=incremental, manifest=manifest),
+            deps=["openaq_catalog", "openaq_locations"],
+        )
+    else:
+        openaq_task = scheduler.Task(
+            "openaq", load_openaq, (engine,),
+            dict(incremental=incremental, stream=stream, from_lake=from_lake, manifest=manifest),
+            deps=[] if from_lake else ["openaq_catalog"],
+        )
+    if from_lake:
+        # reload the fact tables from disk only; the catalog tables stay as the last API run left them
+        tasks = [openaq_task]
+    else:
+        tasks = [
+            scheduler.Task("openaq_catalog", catalog_fetch),
+            openaq_task,
+            scheduler.Task("openaq_locations", load_openaq_locations, (engine,), deps=["openaq_catalog"]),
+            scheduler.Task("openaq_sensors", load_openaq_sensors, (engine,), deps=["openaq_catalog"]),
+            scheduler.Task("ncdc_catalog", ncdc.catalog.stations),
+            scheduler.Task("ncdc_stations", load_ncdc_stations, (engine,), deps=["ncdc_catalog"]),
+            scheduler.Task("location_stations", load_location_stations, (engine,), deps=["openaq_catalog", "ncdc_catalog"]),
+        ]
+    tasks += [
+        scheduler.Task("noaa_co2", load_noaa_co2, (engine,), dict(from_lake=from_lake)),
+        scheduler.Task(
+            "ncdc", load_ncdc_ghcn, (engine,),
+            dict(all_stations=all_stations, from_lake=from_lake, manifest=manifest, layout=ghcnd_layout),
+            deps=["ncdc_catalog"] if all_stations and not from_lake else [],
+        ),
+    ]
+    results = scheduler.run(tasks, max_workers=workers)
+    ok = all(r.status == scheduler.OK for r in results.values())
+    if manifest.failed:
+        # a --resume run may have loaded around them, but the run isn't complete
+        ok = False
+
+    # Re-aggregate the dashboard rollups over just the date ranges the loads changed
+    try:
+        with metrics.timed("rollups", "postgres"):
+            rollups.refresh(engine, schema=PUBLIC_SCHEMA)
+    except Exception as e:
+        print(f"[ERROR] rollup refresh failed: {e!r}")
+        ok = False
+
+    qa = quality.take_summary()
+    try:
+        load_qa_summary(engine, qa)
+    except Exception as e:
+        print(f"[ERROR] qa_summary load failed: {e!r}")
+        ok = False
+
+    print("All loads complete." if ok else "Loads finished with failures.")
+    scheduler.print_summary(results)
+    quality.print_report(qa)
+    manifest.print_report()
+    ratelimit.print_report()
+    metrics.print_report()
+    path = metrics.write_report(extra={
+        "tasks": {r.name: {"status": r.status, "seconds": r.seconds, "error": r.error} for r in results.values()},
+        "rate_limit": ratelimit.report(),
+        "manifest": manifest.report(),
+        "quality": qa.to_dict("records"),
+    })
+    print(f"Run report -> {path}")
+    manifest.close()
+    http_client.close()
+    dispose()
+    return ok
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only fetch openaq_daily rows after the latest loaded date per sensor",
+    )
+    parser.add_argument(
+        "--refresh-catalog",
+        action="store_true",
+        help="refetch the OpenAQ location catalog instead of using the on-disk cache",
+    )
+    parser.add_argument(
+        "--all-stations",
+        action="store_true",
+        help="load GHCND for every station get_stations() returns, not just MSC and BWI",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="write openaq_daily in fixed-size chunks as sensors are fetched (flat memory)",
+    )
+    parser.add_argument(
+        "--from-lake",
+        action="store_true",
+        help="reload openaq, co2 and ghcnd tables from the local Parquet lake instead of the APIs (catalog tables are left as they are; --hourly is ignored)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip OpenAQ sensors and GHCND station-years an earlier run already fetched; retry failed ones (ones that fail again are left out of upserts and merges, never swapped or replaced over a table)",
+    )
+    parser.add_argument(
+        "--hourly",
+        action="store_true",
+        help="load OpenAQ at hourly resolution into openaq_hourly and roll openaq_daily up from it",
+    )
+    parser.add_argument(
+        "--ghcnd-layout",
+        choices=GHCND_LAYOUTS,
+        default=GHCND_LAYOUT,
+        help="load GHCND long (station/date/datatype rows), wide (tmax/tmin/prcp per station-day) or both",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=scheduler.MAX_WORKERS,
+        help="load stages run at once (1 runs them one after another)",
+    )
+    args = parser.parse_args()
+    ok = main(
+        incremental=args.incremental,
+        refresh_catalog=args.refresh_catalog,
+        all_stations=args.all_stations,
+        stream=args.stream,
+        from_lake=args.from_lake,
+        resume=args.resume,
+        workers=args.workers,
+        hourly=args.hourly,
+        ghcnd_layout=args.ghcnd_layout,
+    )
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,548 @@
+"""
+Dashboard rollups kept inside PostgreSQL.
+
+Live dashboard queries used to re-aggregate openaq_daily and the NOAA tables
+on every interaction. These summary tables hold the aggregates instead:
+
+    openaq_monthly   per location, parameter and month
+    openaq_annual    per location, parameter and year
+    daily_overview   per day and parameter: air quality across locations joined
+                     with station weather (TMAX/TMIN/PRCP, from noaa_ncdc_ghcnd_wide
+                     when it's loaded) and Mauna Loa CO2
+    daily_facts      per location and day: pollutant stats, weather from the
+                     nearest paired station that reported, and CO2 as of that day
+                     (declared and partitioned in sql/schema.py)
+
+daily_from_hourly() also rolls openaq_hourly up into openaq_daily, so hourly
+ingestion doesn't need a separate daily fetch.
+
+Loads report the date span they actually changed, per table (mark_changed);
+refresh() then deletes and re-aggregates only the months/years/days in those
+spans, in one transaction per rollup, so readers never see a half-refreshed range.
+
+    python -m sql.rollups    # rebuild everything from the base tables
+"""
+
+import argparse
+import threading
+from datetime import timedelta
+
+import pandas as pd
+import sqlalchemy as sa
+
+from sql import schema as ddl
+from data import quality
+
+# base tables that feed the rollups -> their date column
+SOURCES = {
+    "openaq_daily": "date",
+    "noaa_ncdc_ghcnd_daily": "date",
+    "noaa_ncdc_ghcnd_wide": "date",
+    "noaa_co2_daily_mlo": "date",
+}
+
+# openaq_daily rows with these qa_flags bits stay out of daily_facts' pollutant stats
+FACT_EXCLUDE_FLAGS = quality.RANGE | quality.UNIT
+
+_changed = {}
+_changed_lock = threading.Lock()
+
+
+def mark_changed(table_name: str, first=None, last=None):
+    """
+    Records that rows of table_name between first and last (inclusive) changed.
+    No bounds means the whole table (e.g. after a full swap). Spans accumulate until refresh().
+    """
+    if table_name not in SOURCES:
+        return
+    # loads report dates, datetimes or Timestamps depending on the table's column type
+    first = None if first is None else pd.Timestamp(first).date()
+    last = None if last is None else pd.Timestamp(last).date()
+    with _changed_lock:
+        if table_name in _changed:
+            prev = _changed[table_name]
+            if prev is None or first is None or last is None:
+                _changed[table_name] = None
+                return
+            first, last = min(prev[0], first), max(prev[1], last)
+        _changed[table_name] = None if first is None or last is None else (first, last)
+
+
+def _merge(spans) -> list:
+    """Sorts (first, last) spans and merges the overlapping or adjacent ones; last=None runs to the end."""
+    merged = []
+    for first, last in sorted(spans, key=lambda span: pd.Timestamp(span[0])):
+        first = pd.Timestamp(first).date()
+        last = None if last is None else pd.Timestamp(last).date()
+        if merged and (merged[-1][1] is None or first <= merged[-1][1] + timedelta(days=1)):
+            prev_first, prev_last = merged[-1]
+            merged[-1] = (prev_first, None if prev_last is None or last is None else max(prev_last, last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def _exists(conn, table_name: str, schema: str) -> bool:
+    return sa.inspect(conn).has_table(table_name, schema=schema)
+
+
+def create_rollups(conn, schema: str = "public"):
+    conn.execute(sa.text(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.openaq_monthly (
+            location_id INTEGER NOT NULL,
+            parameter TEXT NOT NULL,
+            month DATE NOT NULL,
+            location_name TEXT,
+            parameter_units TEXT,
+            days INTEGER NOT NULL,
+            days_measured INTEGER NOT NULL,
+            avg DOUBLE PRECISION,
+            median DOUBLE PRECISION,
+            sd DOUBLE PRECISION,
+            min DOUBLE PRECISION,
+            max DOUBLE PRECISION,
+            PRIMARY KEY (location_id, parameter, month)
+        )
+    """))
+    conn.execute(sa.text(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.openaq_annual (
+            location_id INTEGER NOT NULL,
+            parameter TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            location_name TEXT,
+            parameter_units TEXT,
+            days INTEGER NOT NULL,
+            days_measured INTEGER NOT NULL,
+            avg DOUBLE PRECISION,
+            median DOUBLE PRECISION,
+            sd DOUBLE PRECISION,
+            min DOUBLE PRECISION,
+            max DOUBLE PRECISION,
+            PRIMARY KEY (location_id, parameter, year)
+        )
+    """))
+    conn.execute(sa.text(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.daily_overview (
+            date DATE NOT NULL,
+            parameter TEXT NOT NULL,
+            parameter_units TEXT,
+            locations INTEGER NOT NULL,
+            avg DOUBLE PRECISION,
+            max DOUBLE PRECISION,
+            tmax DOUBLE PRECISION,
+            tmin DOUBLE PRECISION,
+            prcp DOUBLE PRECISION,
+            co2 DOUBLE PRECISION,
+            PRIMARY KEY (date, parameter)
+        )
+    """))
+
+
+def _stats(period: str) -> str:
+    # daily rows -> period stats; period is the SQL expression for the bucket
+    return f"""
+        SELECT
+            location_id,
+            parameter,
+            {period},
+            MAX(location_name),
+            MAX(parameter_units),
+            COUNT(*),
+            COUNT(*) FILTER (WHERE has_measurement),
+            AVG(avg),
+            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY avg),
+            STDDEV_SAMP(avg),
+            MIN(min),
+            MAX(max)
+        FROM {{schema}}.openaq_daily
+        WHERE {{where}}
+        GROUP BY location_id, parameter, {period}
+    """
+
+
+def refresh_openaq_periods(conn, first=None, last=None, schema: str = "public"):
+    """Recomputes openaq_monthly / openaq_annual for every month / year touching first..last."""
+    columns = "location_id, parameter, {bucket}, location_name, parameter_units, days, days_measured, avg, median, sd, min, max"
+    periods = (
+        ("openaq_monthly", "month", "DATE_TRUNC('month', date)::date", "DATE_TRUNC('month', CAST(:first AS date))::date",
+         "(DATE_TRUNC('month', CAST(:last AS date)) + INTERVAL '1 month')::date"),
+        ("openaq_annual", "year", "EXTRACT(YEAR FROM date)::int", "EXTRACT(YEAR FROM CAST(:first AS date))::int",
+         "EXTRACT(YEAR FROM CAST(:last AS date))::int + 1"),
+    )
+    params = {"first": first, "last": last}
+
+    for table, bucket, expr, lo, hi in periods:
+        if first is None or last is None:
+            conn.execute(sa.text(f"DELETE FROM {schema}.{table}"))
+            where = "TRUE"
+        else:
+            conn.execute(sa.text(f"DELETE FROM {schema}.{table} WHERE {bucket} >= {lo} AND {bucket} < {hi}"), params)
+            if bucket == "month":
+                where = f"date >= {lo} AND date < {hi}"
+            else:
+                where = f"date >= MAKE_DATE({lo}, 1, 1) AND date < MAKE_DATE({hi}, 1, 1)"
+
+        conn.execute(
+            sa.text(
+                f"INSERT INTO {schema}.{table} ({columns.format(bucket=bucket)}) "
+                + _stats(expr).format(schema=schema, where=where)
+            ),
+            params,
+        )
+
+
+def refresh_daily_overview(conn, first=None, last=None, schema: str = "public"):
+    """Recomputes daily_overview for first..last (every day when unbounded)."""
+    bounded = first is not None and last is not None
+    params = {"first": first, "last": last}
+
+    def span(col):
+        return f"{col} >= CAST(:first AS date) AND {col} < CAST(:last AS date) + 1" if bounded else "TRUE"
+
+    # the NOAA tables may not be loaded (yet); their columns are then NULL.
+    # The wide GHCND table needs no pivot, so it's read when it's there.
+    if _exists(conn, "noaa_ncdc_ghcnd_wide", schema):
+        weather = f"""
+            LEFT JOIN (
+                SELECT date, AVG(tmax) AS tmax, AVG(tmin) AS tmin, AVG(prcp) AS prcp
+                FROM {schema}.noaa_ncdc_ghcnd_wide
+                WHERE {span("date")}
+                GROUP BY date
+            ) w ON w.date = a.date::date
+        """
+        weather_cols = "w.tmax, w.tmin, w.prcp"
+    elif _exists(conn, "noaa_ncdc_ghcnd_daily", schema):
+        weather = f"""
+            LEFT JOIN (
+                SELECT
+                    date::date AS date,
+                    AVG(value) FILTER (WHERE datatype = 'TMAX') AS tmax,
+                    AVG(value) FILTER (WHERE datatype = 'TMIN') AS tmin,
+                    AVG(value) FILTER (WHERE datatype = 'PRCP') AS prcp
+                FROM {schema}.noaa_ncdc_ghcnd_daily
+                WHERE {span("date")}
+                GROUP BY date::date
+            ) w ON w.date = a.date::date
+        """
+        weather_cols = "w.tmax, w.tmin, w.prcp"
+    else:
+        weather, weather_cols = "", "NULL::double precision, NULL::double precision, NULL::double precision"
+
+    if _exists(conn, "noaa_co2_daily_mlo", schema):
+        co2 = f"LEFT JOIN {schema}.noaa_co2_daily_mlo c ON c.date::date = a.date::date"
+        co2_col = "c.co2"
+    else:
+        co2, co2_col = "", "NULL::double precision"
+
+    if bounded:
+        conn.execute(sa.text(f"DELETE FROM {schema}.daily_overview WHERE {span('date')}"), params)
+    else:
+        conn.execute(sa.text(f"DELETE FROM {schema}.daily_overview"))
+
+    conn.execute(sa.text(f"""
+        INSERT INTO {schema}.daily_overview
+            (date, parameter, parameter_units, locations, avg, max, tmax, tmin, prcp, co2)
+        SELECT
+            a.date::date,
+            a.parameter,
+            MAX(a.parameter_units),
+            COUNT(DISTINCT a.location_id),
+            AVG(a.avg),
+            MAX(a.max),
+            {weather_cols},
+            {co2_col}
+        FROM {schema}.openaq_daily a
+        {weather}
+        {co2}
+        WHERE a.has_measurement AND {span("a.date")}
+        GROUP BY a.date::date, a.parameter, {weather_cols}, {co2_col}
+    """), params)
+
+
+def _columns(conn, table_name: str, schema: str) -> set:
+    return {c["name"] for c in sa.inspect(conn).get_columns(table_name, schema=schema)}
+
+
+def refresh_daily_facts(conn, first=None, last=None, schema: str = "public") -> int:
+    """
+    Upserts daily_facts for openaq_daily's days in first..last (no first: from
+    the start, no last: to the end), one row per location and day:
+
+      - per pollutant, the mean of its sensors' daily avg and the max of their
+        max, in ddl.FACT_UNITS units, leaving out FACT_EXCLUDE_FLAGS rows
+      - tmax/tmin/prcp from the nearest openaq_location_stations station
+        that reported that day (wide GHCND table, else the long one)
+      - co2 as of the day: the latest Mauna Loa day with has_measurement at
+        or before it, with co2_date saying which day that was
+
+    Only rows whose values differ are written. Returns that count.
+    """
+    params = {"first": first, "last": last}
+
+    def span(col):
+        bounds = []
+        if first is not None:
+            bounds.append(f"{col} >= CAST(:first AS date)")
+        if last is not None:
+            bounds.append(f"{col} < CAST(:last AS date) + 1")
+        return " AND ".join(bounds) or "TRUE"
+
+    lo, hi = conn.execute(sa.text(
+        f"SELECT MIN(date), MAX(date) FROM {schema}.openaq_daily WHERE {span('date')}"
+    ), params).one()
+    if lo is None:
+        return 0
+    ddl.ensure_table(conn, "daily_facts", range(lo.year, hi.year + 1), schema)
+
+    checked = "qa_flags" in _columns(conn, "openaq_daily", schema)
+    stats = []
+    for p, unit in ddl.FACT_UNITS.items():
+        keep = f"a.parameter = '{p}' AND a.parameter_units = '{unit}'"
+        if checked:
+            keep += f" AND a.qa_flags & {FACT_EXCLUDE_FLAGS} = 0"
+        stats.append(f"AVG(a.avg) FILTER (WHERE {keep}) AS {p}")
+        stats.append(f"MAX(a.max) FILTER (WHERE {keep}) AS {p}_max")
+    ctes = [f"""
+        aq AS (
+            SELECT a.location_id, a.date::date AS date, MAX(a.location_name) AS location_name,
+                   {", ".join(stats)},
+                   COUNT(DISTINCT a.sensor_id) FILTER (WHERE a.has_measurement) AS sensors
+            FROM {schema}.openaq_daily a
+            WHERE {span("a.date")}
+            GROUP BY a.location_id, a.date::date
+        )
+    """]
+
+    # weather source: one row per station and day
+    weather = None
+    if _exists(conn, "noaa_ncdc_ghcnd_wide", schema):
+        weather = f"""
+            SELECT station_id, date, tmax, tmin, prcp
+            FROM {schema}.noaa_ncdc_ghcnd_wide
+            WHERE has_measurement AND {span("date")}
+        """
+    elif _exists(conn, "noaa_ncdc_ghcnd_daily", schema) and "station_id" in _columns(conn, "noaa_ncdc_ghcnd_daily", schema):
+        weather = f"""
+            SELECT station_id, date::date AS date,
+                   AVG(value) FILTER (WHERE datatype = 'TMAX') AS tmax,
+                   AVG(value) FILTER (WHERE datatype = 'TMIN') AS tmin,
+                   AVG(value) FILTER (WHERE datatype = 'PRCP') AS prcp
+            FROM {schema}.noaa_ncdc_ghcnd_daily
+            WHERE station_id IS NOT NULL AND {span("date")}
+            GROUP BY station_id, date::date
+        """
+    if weather is not None and _exists(conn, "openaq_location_stations", schema):
+        ctes.append(f"""
+            weather AS (
+                SELECT DISTINCT ON (p.location_id, w.date)
+                       p.location_id, w.date, p.station_id, p.distance_km, w.tmax, w.tmin, w.prcp
+                FROM {schema}.openaq_location_stations p
+                JOIN ({weather}) w ON w.station_id = p.station_id
+                ORDER BY p.location_id, w.date, p.rank
+            )
+        """)
+        weather_join = "LEFT JOIN weather w ON w.location_id = aq.location_id AND w.date = aq.date"
+        weather_cols = "w.station_id, w.distance_km, w.tmax, w.tmin, w.prcp"
+    else:
+        weather_join, weather_cols = "", "NULL::varchar, NULL::real, NULL::real, NULL::real, NULL::real"
+
+    # CO2 as of each day: number the calendar by measurements seen so far, then
+    # every day takes its group's (i.e. the latest preceding) measurement
+    if _exists(conn, "noaa_co2_daily_mlo", schema):
+        measured = "co2 IS NOT NULL"
+        if "has_measurement" in _columns(conn, "noaa_co2_daily_mlo", schema):
+            measured += " AND has_measurement"
+        ctes.append(f"""
+            measured AS (
+                SELECT date::date AS date, co2 FROM {schema}.noaa_co2_daily_mlo WHERE {measured}
+            ),
+            calendar AS (
+                SELECT d::date AS date, m.co2, m.date AS measured_on,
+                       COUNT(m.co2) OVER (ORDER BY d) AS grp
+                FROM generate_series(
+                    COALESCE(
+                        (SELECT MAX(date) FROM measured WHERE date <= (SELECT MIN(date) FROM aq)),
+                        (SELECT MIN(date) FROM aq)
+                    ),
+                    (SELECT MAX(date) FROM aq),
+                    INTERVAL '1 day'
+                ) d
+                LEFT JOIN measured m ON m.date = d::date
+            ),
+            co2 AS (
+                SELECT date, MAX(co2) OVER (PARTITION BY grp) AS co2,
+                       MAX(measured_on) OVER (PARTITION BY grp) AS co2_date
+                FROM calendar
+            )
+        """)
+        co2_join = "LEFT JOIN co2 c ON c.date = aq.date"
+        co2_cols = "c.co2, c.co2_date"
+    else:
+        co2_join, co2_cols = "", "NULL::real, NULL::date"
+
+    columns = [c for c in ddl.columns("daily_facts") if c not in ("location_id", "date")]
+    values = ["aq.location_name", *(c for p in ddl.FACT_UNITS for c in (f"aq.{p}", f"aq.{p}_max")), "aq.sensors"]
+    return conn.execute(sa.text(f"""
+        WITH {", ".join(ctes)}
+        INSERT INTO {schema}.daily_facts AS t (location_id, date, {", ".join(columns)})
+        SELECT aq.location_id, aq.date, {", ".join(values)}, {weather_cols}, {co2_cols}, aq.sensors > 0
+        FROM aq
+        {weather_join}
+        {co2_join}
+        ON CONFLICT (location_id, date) DO UPDATE SET
+            {", ".join(f"{c} = EXCLUDED.{c}" for c in columns)}
+        WHERE (t.{", t.".join(columns)}) IS DISTINCT FROM (EXCLUDED.{", EXCLUDED.".join(columns)})
+    """), params).rowcount
+
+
+# openaq_daily stats from the hours of each local day; min/max keep each hour's
+# own extremes (an hour's mean understates them), falling back to the mean
+_HOURLY_STATS = {
+    "value": "AVG(h.value)",
+    "min": "MIN(COALESCE(h.min, h.value))",
+    "q02": "PERCENTILE_CONT(0.02) WITHIN GROUP (ORDER BY h.value)",
+    "q25": "PERCENTILE_CONT(0.25) WITHIN GROUP (ORDER BY h.value)",
+    "median": "PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY h.value)",
+    "q75": "PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY h.value)",
+    "q98": "PERCENTILE_CONT(0.98) WITHIN GROUP (ORDER BY h.value)",
+    "max": "MAX(COALESCE(h.max, h.value))",
+    "avg": "AVG(h.value)",
+    "sd": "STDDEV_SAMP(h.value)",
+}
+
+
+def daily_from_hourly(engine, first, last, schema: str = "public") -> int:
+    """
+    Upserts openaq_daily for local days first..last from openaq_hourly: one row per
+    sensor per day between that sensor's first and last hour in the span, with
+    has_measurement false (and NULL stats) for days without any hours, like the
+    gap-filled API loads. Returns the number of daily rows inserted or changed.
+    """
+    params = {"first": first, "last": last}
+    stats = list(_HOURLY_STATS)
+
+    with engine.begin() as conn:
+        # ON CONFLICT (sensor_id, date) below needs the declared key
+        ddl.require_declared(conn, "openaq_daily", schema)
+        years = range(pd.Timestamp(first).year, pd.Timestamp(last).year + 1)
+        ddl.ensure_table(conn, "openaq_daily", years, schema)
+
+        if _exists(conn, "openaq_locations", schema):
+            names = f"LEFT JOIN {schema}.openaq_locations l ON l.id = b.location_id"
+            name_col = "l.name"
+        else:
+            names, name_col = "", "NULL"
+
+        # local days sit within a day of their UTC hours; the bound lets the scan prune partitions
+        span = (
+            "h.date BETWEEN CAST(:first AS date) AND CAST(:last AS date) "
+            "AND h.datetime_utc >= CAST(:first AS date) - 1 AND h.datetime_utc < CAST(:last AS date) + 2"
+        )
+        written = conn.execute(sa.text(f"""
+            WITH agg AS (
+                SELECT h.sensor_id, h.date, {", ".join(f"{expr} AS {c}" for c, expr in _HOURLY_STATS.items())}
+                FROM {schema}.openaq_hourly h
+                WHERE {span}
+                GROUP BY h.sensor_id, h.date
+            ),
+            bounds AS (
+                SELECT h.sensor_id, MIN(h.date) AS lo, MAX(h.date) AS hi, MAX(h.location_id) AS location_id,
+                       MAX(h.parameter) AS parameter, MAX(h.parameter_units) AS parameter_units
+                FROM {schema}.openaq_hourly h
+                WHERE {span}
+                GROUP BY h.sensor_id
+            )
+            INSERT INTO {schema}.openaq_daily AS t
+                (date, sensor_id, location_id, location_name, parameter, parameter_units, {", ".join(stats)}, has_measurement)
+            SELECT d::date, b.sensor_id, b.location_id, {name_col}, b.parameter, b.parameter_units,
+                   {", ".join(f"a.{c}" for c in stats)}, a.value IS NOT NULL
+            FROM bounds b
+            CROSS JOIN LATERAL generate_series(b.lo, b.hi, INTERVAL '1 day') d
+            LEFT JOIN agg a ON a.sensor_id = b.sensor_id AND a.date = d::date
+            {names}
+            ON CONFLICT (sensor_id, date) DO UPDATE SET
+                {", ".join(f"{c} = EXCLUDED.{c}" for c in ["location_id", "location_name", "parameter", "parameter_units", *stats, "has_measurement"])}
+            WHERE (t.{", t.".join(stats)}, t.has_measurement) IS DISTINCT FROM
+                  (EXCLUDED.{", EXCLUDED.".join(stats)}, EXCLUDED.has_measurement)
+        """), params).rowcount
+
+    if written:
+        mark_changed("openaq_daily", first, last)
+    print(f"Rolled openaq_hourly up into {written:,} new or changed {schema}.openaq_daily rows ({first} .. {last})")
+    return written
+
+
+def refresh(engine, changed: dict = None, schema: str = "public") -> dict:
+    """
+    Brings the rollups up to date with changed ({table: (first, last) or None}),
+    by default everything mark_changed() recorded since the last refresh.
+    Returns the spans that were refreshed. Recorded spans are only cleared once
+    every rollup committed, so a failed refresh is retried by the next one.
+    """
+    if engine.dialect.name != "postgresql":
+        print(f"Rollups need PostgreSQL; skipping on {engine.dialect.name}")
+        return {}
+
+    recorded = changed is None
+    if recorded:
+        with _changed_lock:
+            changed = dict(_changed)
+
+    if not changed:
+        print("Rollups are up to date")
+        return {}
+
+    with engine.begin() as conn:
+        if not _exists(conn, "openaq_daily", schema):
+            print("openaq_daily is not loaded; skipping rollups")
+            return {}
+        create_rollups(conn, schema)
+
+    # each table's own dates; one CO2 load from 1958 mustn't widen another table's refresh
+    full = any(s is None for s in changed.values())
+    overview = None if full else _merge(changed.values())
+    # a new CO2 measurement also changes the as-of value of every later day
+    facts = None if full else _merge(
+        (first, None) if table == "noaa_co2_daily_mlo" else (first, last)
+        for table, (first, last) in changed.items()
+    )
+
+    # monthly/annual only read openaq_daily; the overview also reads the NOAA tables
+    if "openaq_daily" in changed:
+        aq = changed["openaq_daily"]
+        with engine.begin() as conn:
+            refresh_openaq_periods(conn, *(aq or (None, None)), schema=schema)
+
+    with engine.begin() as conn:
+        for first, last in overview or [(None, None)]:
+            refresh_daily_overview(conn, first, last, schema=schema)
+
+    upserted = 0
+    with engine.begin() as conn:
+        for first, last in facts or [(None, None)]:
+            upserted += refresh_daily_facts(conn, first, last, schema=schema)
+    print(f"Upserted {upserted:,} new or changed {schema}.daily_facts rows")
+
+    if recorded:
+        with _changed_lock:
+            for table, span in changed.items():
+                # a span widened by a load during the refresh stays for the next one
+                if _changed.get(table, span) == span:
+                    _changed.pop(table, None)
+
+    label = "all dates" if full else ", ".join(f"{first} .. {last}" for first, last in overview)
+    print(f"Refreshed rollups for {', '.join(sorted(changed))} ({label})")
+    return changed
+
+
+def rebuild(engine, schema: str = "public"):
+    return refresh(engine, {table: None for table in SOURCES}, schema)
+
+
+if __name__ == "__main__":
+    from sql.engine import get_engine
+
+    parser = argparse.ArgumentParser(description="rebuild every rollup from the base tables")
+    parser.add_argument("--schema", default="public")
+    args = parser.parse_args()
+    rebuild(get_engine("bulk_load"), args.schema)
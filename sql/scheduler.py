@@ -0,0 +1,156 @@
+"""
+Dependency-aware runner for the load_* stages.
+
+Each Task names the tasks it depends on; a task starts as soon as all of them
+have succeeded, so independent sources (different APIs, different tables) run
+side by side and total wall time tends toward the slowest chain instead of the
+sum. A task that raises is recorded as failed and only its dependents are
+skipped; everything else keeps going.
+
+Tasks run on a thread pool by default (the loaders are I/O bound and share the
+per-host rate limiters). pool="process" runs a task in a spawned worker
+process instead, for CPU-heavy work; its fn and args must be picklable.
+"""
+
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from data import metrics
+
+MAX_WORKERS = int(os.getenv("LOAD_WORKERS", "6"))
+PROCESS_WORKERS = int(os.getenv("LOAD_PROCESS_WORKERS", "2"))
+
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class Task:
+    def __init__(self, name: str, fn, args: tuple = (), kwargs: dict = None, deps=(), pool: str = "thread"):
+        if pool not in ("thread", "process"):
+            raise ValueError(f"unknown pool {pool!r}; expected 'thread' or 'process'")
+        self.name = name
+        self.fn = fn
+        self.args = tuple(args)
+        self.kwargs = kwargs or {}
+        self.deps = tuple(deps)
+        self.pool = pool
+
+
+class TaskResult:
+    def __init__(self, name: str, status: str, seconds: float = 0.0, value=None, error: str = None):
+        self.name = name
+        self.status = status
+        self.seconds = seconds
+        self.value = value
+        self.error = error
+
+    def __repr__(self):
+        return f"TaskResult({self.name!r}, {self.status!r}, {self.seconds:.2f}s)"
+
+
+def _call(fn, args, kwargs):
+    # module level so process pools can pickle it; times the call where it runs
+    start = time.perf_counter()
+    value = fn(*args, **kwargs)
+    return value, time.perf_counter() - start
+
+
+def _check(tasks: list) -> dict:
+    by_name = {}
+    for t in tasks:
+        if t.name in by_name:
+            raise ValueError(f"duplicate task {t.name!r}")
+        by_name[t.name] = t
+
+    for t in tasks:
+        missing = [d for d in t.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"task {t.name!r} depends on unknown task(s) {missing}")
+
+    # depth-first cycle check
+    state = {}
+
+    def visit(name, path):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"dependency cycle: {' -> '.join(path + [name])}")
+        state[name] = "visiting"
+        for d in by_name[name].deps:
+            visit(d, path + [name])
+        state[name] = "done"
+
+    for t in tasks:
+        visit(t.name, [])
+    return by_name
+
+
+def run(tasks: list, max_workers: int = MAX_WORKERS, process_workers: int = PROCESS_WORKERS) -> dict:
+    """
+    Runs tasks respecting their deps; returns {name: TaskResult} in completion order.
+    Never raises for a failing task: check each result's status.
+    """
+    by_name = _check(tasks)
+    results = {}
+    waiting = list(by_name)
+    running = {}
+
+    threads = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    processes = None
+    if any(t.pool == "process" for t in tasks):
+        processes = ProcessPoolExecutor(
+            max_workers=max(1, process_workers),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    try:
+        while waiting or running:
+            for name in list(waiting):
+                t = by_name[name]
+                if not all(d in results for d in t.deps):
+                    continue
+                waiting.remove(name)
+
+                blocked = [d for d in t.deps if results[d].status != OK]
+                if blocked:
+                    print(f"[scheduler] skip {name}: {', '.join(blocked)} did not succeed")
+                    results[name] = TaskResult(name, SKIPPED, error=f"upstream failed: {', '.join(blocked)}")
+                    continue
+
+                print(f"[scheduler] start {name}")
+                pool = processes if t.pool == "process" else threads
+                running[pool.submit(_call, t.fn, t.args, t.kwargs)] = (name, time.perf_counter())
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, started = running.pop(future)
+                try:
+                    value, seconds = future.result()
+                except Exception as e:
+                    seconds = time.perf_counter() - started
+                    print(f"[scheduler] FAILED {name} after {seconds:.1f}s: {e!r}")
+                    traceback.print_exception(e)
+                    results[name] = TaskResult(name, FAILED, seconds, error=repr(e))
+                else:
+                    print(f"[scheduler] done {name} in {seconds:.1f}s")
+                    results[name] = TaskResult(name, OK, seconds, value=value)
+                metrics.record("task", name, seconds)
+    finally:
+        threads.shutdown(wait=True)
+        if processes is not None:
+            processes.shutdown(wait=True)
+
+    return results
+
+
+def print_summary(results: dict):
+    for r in results.values():
+        line = f"[scheduler] {r.name:<20} {r.status:<8} {r.seconds:8.1f}s"
+        print(line + (f"  {r.error}" if r.error else ""))
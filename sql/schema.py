@@ -0,0 +1,395 @@
+"""
+Explicit DDL for the large daily and hourly tables (and the daily_facts table built from them).
+
+to_sql infers TEXT for every string, TIMESTAMP for pure dates and no keys or
+indexes. The tables below are declared instead: tight column types, the
+natural key as primary key, declarative RANGE partitioning by calendar year
+on date (datetime_utc for openaq_hourly), a BRIN index on that column (tiny,
+ideal for append-ordered time series) and a B-tree for the dashboards'
+entity + time-range lookups. Time-range queries
+prune to the years they need, and upserts/merges only touch the partitions of
+the years in the loaded frame.
+
+Year partitions are created on demand (ensure_partitions) for every year a
+load writes; there is no DEFAULT partition, so a new year can always be added.
+
+    python -m sql.schema    # create the tables, migrating pandas-created ones in place
+"""
+
+import argparse
+
+import pandas as pd
+import sqlalchemy as sa
+
+# pollutant -> the unit its daily_facts columns hold; rows in other units are left out
+FACT_UNITS = {
+    "pm25": "µg/m³",
+    "pm10": "µg/m³",
+    "pm1": "µg/m³",
+    "o3": "ppm",
+    "no2": "ppm",
+    "nox": "ppm",
+    "so2": "ppm",
+    "co": "ppm",
+}
+
+TABLES = {
+    "openaq_daily": {
+        "columns": [
+            ("date", "DATE NOT NULL"),
+            ("sensor_id", "INTEGER NOT NULL"),
+            ("location_id", "INTEGER NOT NULL"),
+            ("location_name", "TEXT"),
+            ("parameter", "VARCHAR(32) NOT NULL"),
+            ("parameter_units", "VARCHAR(32)"),
+            ("value", "REAL"),
+            ("min", "REAL"),
+            ("q02", "REAL"),
+            ("q25", "REAL"),
+            ("median", "REAL"),
+            ("q75", "REAL"),
+            ("q98", "REAL"),
+            ("max", "REAL"),
+            ("avg", "REAL"),
+            ("sd", "REAL"),
+            ("has_measurement", "BOOLEAN NOT NULL DEFAULT FALSE"),
+            ("qa_flags", "SMALLINT NOT NULL DEFAULT 0"),
+        ],
+        "key": ["sensor_id", "date"],
+        "lookup": ["location_id", "parameter", "date"],
+    },
+    "noaa_ncdc_ghcnd_daily": {
+        "columns": [
+            ("date", "DATE NOT NULL"),
+            ("datatype", "VARCHAR(8) NOT NULL"),
+            ("station", "TEXT"),
+            ("station_id", "VARCHAR(32) NOT NULL"),
+            ("attributes", "VARCHAR(16)"),
+            ("value", "REAL"),
+            ("unit", "VARCHAR(32)"),
+            ("qa_flags", "SMALLINT NOT NULL DEFAULT 0"),
+        ],
+        # station is the display name, which two stations can share
+        "key": ["station_id", "date", "datatype"],
+        "lookup": ["station_id", "datatype", "date"],
+    },
+    "noaa_ncdc_ghcnd_wide": {
+        "columns": [
+            ("date", "DATE NOT NULL"),
+            ("station_id", "VARCHAR(32) NOT NULL"),
+            ("station", "TEXT"),
+            ("tmax", "REAL"),
+            ("tmin", "REAL"),
+            ("prcp", "REAL"),
+            ("tmax_attributes", "VARCHAR(16)"),
+            ("tmin_attributes", "VARCHAR(16)"),
+            ("prcp_attributes", "VARCHAR(16)"),
+            ("qa_flags", "SMALLINT NOT NULL DEFAULT 0"),
+            ("has_measurement", "BOOLEAN NOT NULL DEFAULT FALSE"),
+        ],
+        "key": ["station_id", "date"],
+        "lookup": ["station", "date"],
+    },
+    "daily_facts": {
+        "columns": [
+            ("date", "DATE NOT NULL"),
+            ("location_id", "INTEGER NOT NULL"),
+            ("location_name", "TEXT"),
+            *[(c, "REAL") for p in FACT_UNITS for c in (p, f"{p}_max")],
+            ("sensors", "SMALLINT NOT NULL DEFAULT 0"),
+            ("station_id", "VARCHAR(32)"),
+            ("station_km", "REAL"),
+            ("tmax", "REAL"),
+            ("tmin", "REAL"),
+            ("prcp", "REAL"),
+            ("co2", "REAL"),
+            ("co2_date", "DATE"),
+            ("has_measurement", "BOOLEAN NOT NULL DEFAULT FALSE"),
+        ],
+        "key": ["location_id", "date"],
+        "lookup": ["date", "location_id"],
+    },
+    "openaq_hourly": {
+        "columns": [
+            ("datetime_utc", "TIMESTAMP NOT NULL"),
+            ("date", "DATE NOT NULL"),
+            ("sensor_id", "INTEGER NOT NULL"),
+            ("location_id", "INTEGER NOT NULL"),
+            ("parameter", "VARCHAR(32) NOT NULL"),
+            ("parameter_units", "VARCHAR(32)"),
+            ("value", "REAL"),
+            ("min", "REAL"),
+            ("max", "REAL"),
+            ("qa_flags", "SMALLINT NOT NULL DEFAULT 0"),
+        ],
+        "key": ["sensor_id", "datetime_utc"],
+        "lookup": ["location_id", "parameter", "datetime_utc"],
+        "partition": "datetime_utc",
+    },
+}
+
+# column the year partitions range over, unless a table names its own "partition"
+PARTITION_COL = "date"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def is_managed(table_name: str) -> bool:
+    return table_name in TABLES
+
+
+def columns(table_name: str) -> list[str]:
+    return [c for c, _ in TABLES[table_name]["columns"]]
+
+
+def partition_col(table_name: str) -> str:
+    return TABLES[table_name].get("partition", PARTITION_COL)
+
+
+def partition_name(name: str, year: int) -> str:
+    return f"{name}_y{year}"
+
+
+def create_table(conn, table_name: str, schema: str = "public", name: str = None, replace: bool = False):
+    """
+    Creates the partitioned parent for table_name (under name, default table_name)
+    with its key and indexes. Index names are derived from name, so a side table
+    built for a swap can be renamed into place with rename_swapped().
+
+    replace empties an existing declared table with TRUNCATE, keeping the parent
+    and the views built on it. A legacy to_sql table is dropped without CASCADE,
+    so, like to_sql(if_exists="replace"), that fails if a view still depends on it.
+    """
+    spec = TABLES[table_name]
+    name = name or table_name
+    target = f"{_quote(schema)}.{_quote(name)}"
+    part = _quote(partition_col(table_name))
+
+    if replace and sa.inspect(conn).has_table(name, schema=schema):
+        if is_partitioned(conn, name, schema):
+            conn.execute(sa.text(f"TRUNCATE TABLE {target}"))
+            add_columns(conn, table_name, schema, name=name)
+            if name == table_name:
+                rekey(conn, table_name, schema)
+            return
+        conn.execute(sa.text(f"DROP TABLE {target}"))
+
+    cols = ",\n    ".join(f"{_quote(c)} {t}" for c, t in spec["columns"])
+    key = ", ".join(_quote(c) for c in spec["key"])
+    conn.execute(sa.text(
+        f"CREATE TABLE IF NOT EXISTS {target} (\n    {cols},\n"
+        f"    CONSTRAINT {_quote(name + '_natural_key')} PRIMARY KEY ({key})\n"
+        f") PARTITION BY RANGE ({part})"
+    ))
+    conn.execute(sa.text(
+        f"CREATE INDEX IF NOT EXISTS {_quote(name + '_date_brin')} "
+        f"ON {target} USING BRIN ({part})"
+    ))
+    conn.execute(sa.text(
+        f"CREATE INDEX IF NOT EXISTS {_quote(name + '_lookup')} "
+        f"ON {target} ({', '.join(_quote(c) for c in spec['lookup'])})"
+    ))
+
+
+def ensure_partitions(conn, table_name: str, years, schema: str = "public", name: str = None):
+    """Creates the year partitions of name (default table_name) that don't exist yet."""
+    name = name or table_name
+    for year in sorted(set(int(y) for y in years)):
+        conn.execute(sa.text(
+            f"CREATE TABLE IF NOT EXISTS {_quote(schema)}.{_quote(partition_name(name, year))} "
+            f"PARTITION OF {_quote(schema)}.{_quote(name)} "
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        ))
+
+
+def years_of(df: pd.DataFrame, date_col: str = PARTITION_COL):
+    return pd.to_datetime(df[date_col]).dt.year.dropna().unique()
+
+
+def ensure_table(conn, table_name: str, years, schema: str = "public", name: str = None):
+    """
+    Makes sure name (default table_name) exists as declared and has partitions for
+    years. A table created by an older to_sql load gets the declared columns it
+    lacks but stays unpartitioned until `python -m sql.schema` migrates it; a
+    declared one created under an older key is re-keyed.
+    """
+    name = name or table_name
+    if not sa.inspect(conn).has_table(name, schema=schema):
+        create_table(conn, table_name, schema, name=name)
+    else:
+        add_columns(conn, table_name, schema, name=name)
+        if not is_partitioned(conn, name, schema):
+            print(f"[WARN] {schema}.{name} is not partitioned; run `python -m sql.schema` to migrate it")
+            return
+        if name == table_name:
+            rekey(conn, table_name, schema)
+    ensure_partitions(conn, table_name, years, schema, name=name)
+
+
+def require_declared(conn, table_name: str, schema: str = "public"):
+    """
+    Raises if table_name was created by an older to_sql load: SQL that relies on
+    the declared key (ON CONFLICT on it) can't run until it is migrated.
+    """
+    if sa.inspect(conn).has_table(table_name, schema=schema) and not is_partitioned(conn, table_name, schema):
+        raise RuntimeError(
+            f"{schema}.{table_name} predates the declared schema and has no primary key; "
+            f"run `python -m sql.schema --schema {schema}` to migrate it first"
+        )
+
+
+def add_columns(conn, table_name: str, schema: str = "public", name: str = None):
+    """
+    Adds declared columns that an existing name (default table_name) predates.
+    Existing rows can't fill a NOT NULL column without a default, so those are
+    added nullable; rekey() tightens them when it moves the key onto them.
+    """
+    name = name or table_name
+    existing = {c["name"] for c in sa.inspect(conn).get_columns(name, schema=schema)}
+    for c, t in TABLES[table_name]["columns"]:
+        if c not in existing:
+            if "NOT NULL" in t and "DEFAULT" not in t:
+                t = t.replace(" NOT NULL", "")
+            conn.execute(sa.text(
+                f"ALTER TABLE {_quote(schema)}.{_quote(name)} ADD COLUMN IF NOT EXISTS {_quote(c)} {t}"
+            ))
+
+
+def rekey(conn, table_name: str, schema: str = "public") -> bool:
+    """
+    Moves a partitioned table_name's primary key onto its declared key when an
+    older declaration keyed it differently. Rows with no value for a key column
+    can't be kept under the new key and are dropped (the next load refetches them).
+    Returns False if the key already matches.
+    """
+    spec = TABLES[table_name]
+    pk = sa.inspect(conn).get_pk_constraint(table_name, schema=schema)
+    if pk["constrained_columns"] == spec["key"]:
+        return False
+
+    target = f"{_quote(schema)}.{_quote(table_name)}"
+    missing = " OR ".join(f"{_quote(c)} IS NULL" for c in spec["key"])
+    dropped = conn.execute(sa.text(f"DELETE FROM {target} WHERE {missing}")).rowcount
+    if dropped:
+        print(f"[WARN] dropped {dropped:,} {schema}.{table_name} rows without a {', '.join(spec['key'])}")
+    if pk["name"]:
+        conn.execute(sa.text(f"ALTER TABLE {target} DROP CONSTRAINT {_quote(pk['name'])}"))
+    conn.execute(sa.text(f"DROP INDEX IF EXISTS {_quote(schema)}.{_quote(table_name + '_natural_key')}"))
+    conn.execute(sa.text(
+        f"ALTER TABLE {target} ADD CONSTRAINT {_quote(table_name + '_natural_key')} "
+        f"PRIMARY KEY ({', '.join(_quote(c) for c in spec['key'])})"
+    ))
+    conn.execute(sa.text(f"DROP INDEX IF EXISTS {_quote(schema)}.{_quote(table_name + '_lookup')}"))
+    conn.execute(sa.text(
+        f"CREATE INDEX {_quote(table_name + '_lookup')} "
+        f"ON {target} ({', '.join(_quote(c) for c in spec['lookup'])})"
+    ))
+    print(f"Re-keyed {schema}.{table_name} on ({', '.join(spec['key'])})")
+    return True
+
+
+def prepare(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+    """
+    df in declared column order with pure dates for DATE columns. Rows without
+    a partition value can't be routed to a partition and are dropped.
+    """
+    declared = columns(table_name)
+    unexpected = [c for c in df.columns if c not in declared]
+    if unexpected:
+        raise ValueError(f"{table_name} has no column(s) {unexpected}; add them to sql/schema.py first")
+
+    df = df[[c for c in declared if c in df.columns]].copy()
+    part = partition_col(table_name)
+    values = pd.to_datetime(df[part], errors="coerce")
+    if values.isna().any():
+        print(f"[WARN] dropping {int(values.isna().sum()):,} {table_name} rows without a {part}")
+        df = df[values.notna()]
+    for c, t in TABLES[table_name]["columns"]:
+        if t.startswith("DATE ") and c in df.columns:
+            df[c] = pd.to_datetime(df[c]).dt.date
+    return df
+
+
+def prepare_load(conn, table_name: str, df: pd.DataFrame, schema: str = "public", name: str = None):
+    """ensure_table for the years df writes."""
+    ensure_table(conn, table_name, years_of(df, partition_col(table_name)), schema, name)
+
+
+def is_partitioned(conn, table_name: str, schema: str = "public") -> bool:
+    return bool(conn.execute(sa.text(
+        "SELECT c.relkind = 'p' FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = :schema AND c.relname = :name"
+    ), {"schema": schema, "name": table_name}).scalar())
+
+
+def rename_swapped(conn, table_name: str, schema: str = "public", suffix: str = "__new"):
+    """
+    After {table}{suffix} has been renamed to table, renames its partitions and
+    indexes (still prefixed {table}{suffix}) to the live names.
+    """
+    prefix = table_name + suffix
+    rows = conn.execute(sa.text(
+        "SELECT c.relname, c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = :schema AND c.relname LIKE :pattern ORDER BY c.relkind DESC"
+    ), {"schema": schema, "pattern": prefix.replace("_", r"\_") + "%"}).all()
+
+    for relname, relkind in rows:
+        new_name = table_name + relname[len(prefix):]
+        kind = "INDEX" if relkind in ("i", "I") else "TABLE"
+        conn.execute(sa.text(
+            f"ALTER {kind} {_quote(schema)}.{_quote(relname)} RENAME TO {_quote(new_name)}"
+        ))
+
+
+def migrate(engine, table_name: str, schema: str = "public") -> bool:
+    """
+    Replaces a pandas-created (unpartitioned) table_name with the declared one,
+    copying its rows across in one transaction, or re-keys a declared one whose
+    key changed since it was created. Returns False if nothing to do.
+    """
+    with engine.begin() as conn:
+        if not sa.inspect(conn).has_table(table_name, schema=schema):
+            create_table(conn, table_name, schema)
+            return False
+        if is_partitioned(conn, table_name, schema):
+            add_columns(conn, table_name, schema)
+            return rekey(conn, table_name, schema)
+
+        legacy = f"{table_name}__legacy"
+        conn.execute(sa.text(f"ALTER TABLE {_quote(schema)}.{_quote(table_name)} RENAME TO {_quote(legacy)}"))
+        conn.execute(sa.text(f"DROP INDEX IF EXISTS {_quote(schema)}.{_quote(table_name + '_natural_key')}"))
+        create_table(conn, table_name, schema)
+
+        part = _quote(partition_col(table_name))
+        years = conn.execute(sa.text(
+            f"SELECT DISTINCT EXTRACT(YEAR FROM {part})::int "
+            f"FROM {_quote(schema)}.{_quote(legacy)} WHERE {part} IS NOT NULL"
+        )).scalars().all()
+        ensure_partitions(conn, table_name, years, schema)
+
+        legacy_cols = {c["name"] for c in sa.inspect(conn).get_columns(legacy, schema=schema)}
+        spec = [(c, t.split()[0]) for c, t in TABLES[table_name]["columns"] if c in legacy_cols]
+        names = ", ".join(_quote(c) for c, _ in spec)
+        casts = ", ".join(f"CAST({_quote(c)} AS {t})" for c, t in spec)
+        key = ", ".join(_quote(c) for c in TABLES[table_name]["key"])
+        moved = conn.execute(sa.text(
+            f"INSERT INTO {_quote(schema)}.{_quote(table_name)} ({names}) "
+            f"SELECT DISTINCT ON ({key}) {casts} FROM {_quote(schema)}.{_quote(legacy)} "
+            f"WHERE {part} IS NOT NULL"
+        )).rowcount
+        conn.execute(sa.text(f"DROP TABLE {_quote(schema)}.{_quote(legacy)}"))
+
+    print(f"Migrated {moved:,} rows into partitioned {schema}.{table_name}")
+    return True
+
+
+if __name__ == "__main__":
+    from sql.engine import get_engine
+
+    parser = argparse.ArgumentParser(description="create the declared tables, migrating pandas-created ones")
+    parser.add_argument("--schema", default="public")
+    args = parser.parse_args()
+    for table in TABLES:
+        migrate(get_engine("bulk_load"), table, args.schema)
@@ -0,0 +1,56 @@
+"""
+Reference for the gapfill tests and benchmark: the per-group add_missing_dates
+loop that gapfill.fill_daily_gaps replaced, and raw OpenAQ-shaped input rows.
+"""
+
+import pandas as pd
+
+from benchmarks import synthetic
+
+keys = ["location_id", "sensor_id", "parameter"]
+carry_cols = ["location_name", "parameter_units"]
+
+
+# The pre-vectorization OPENAQ.add_missing_dates / fill_missing_dates loop
+def add_missing_dates(g: pd.DataFrame, key_vals=None) -> pd.DataFrame:
+    g = g.copy()
+
+    if key_vals is not None:
+        if not isinstance(key_vals, tuple):
+            key_vals = (key_vals,)
+        for k, v in zip(keys, key_vals):
+            g[k] = v
+
+    g["date"] = pd.to_datetime(g["date"]).dt.normalize()
+    g = g.sort_values("date")
+
+    g = g.drop_duplicates(subset=["date"], keep="last")
+
+    g = g.set_index("date")
+
+    full = pd.date_range(g.index.min(), g.index.max(), freq="D")
+    g2 = g.reindex(full)
+
+    for c in keys + ["location_name", "parameter_units", "location_id", "sensor_id"]:
+        if c in g2.columns:
+            g2[c] = g2[c].ffill().bfill()
+
+    g2 = g2.reset_index().rename(columns={"index": "date"})
+    g2["has_measurement"] = g2["avg"].notna() if "avg" in g2.columns else False
+    return g2
+
+
+def fill_missing_dates_loop(df: pd.DataFrame) -> pd.DataFrame:
+    out = []
+    for key_vals, g in df.groupby(keys, sort=False, dropna=False):
+        out.append(add_missing_dates(g, key_vals))
+    return pd.concat(out, ignore_index=True) if out else df
+
+
+def raw_rows(sensors: int, days: int) -> pd.DataFrame:
+    """API-shaped rows: gap days are absent rather than NaN."""
+    df = synthetic.openaq_daily(sensors, days, gap_rate=0.1)
+    df = df[df["has_measurement"]].drop(columns=["has_measurement"])
+    df["date_from"] = df["date"].dt.date
+    df["date_to"] = (df["date"] + pd.Timedelta(days=1)).dt.date
+    return df.reset_index(drop=True)
@@ -0,0 +1,57 @@
+"""fill_daily_gaps against the per-group add_missing_dates loop it replaced."""
+
+import numpy as np
+import pandas as pd
+
+from data.raw.gapfill import fill_daily_gaps
+from tests.gapfill_reference import carry_cols, fill_missing_dates_loop, keys, raw_rows
+
+
+def test_matches_loop():
+    df = raw_rows(sensors=60, days=90)
+    pd.testing.assert_frame_equal(fill_daily_gaps(df, keys, carry_cols), fill_missing_dates_loop(df))
+
+
+def test_matches_loop_with_unsorted_rows():
+    df = raw_rows(sensors=20, days=30).sample(frac=1, random_state=1).reset_index(drop=True)
+    pd.testing.assert_frame_equal(fill_daily_gaps(df, keys, carry_cols), fill_missing_dates_loop(df))
+
+
+def test_duplicate_dates_keep_last_in_input_order():
+    # the loop's sort_values isn't stable, so which copy it kept wasn't defined
+    df = pd.DataFrame({
+        "date": pd.to_datetime(["2024-01-02", "2024-01-01", "2024-01-02", "2024-01-02"]),
+        "sensor_id": [1, 1, 1, 1],
+        "avg": [1.0, 2.0, 3.0, 4.0],
+    })
+    out = fill_daily_gaps(df, ["sensor_id"])
+    assert out["avg"].tolist() == [2.0, 4.0]
+
+
+def test_keep_int_keys_narrows_filled_keys():
+    df = raw_rows(sensors=10, days=30).astype({"sensor_id": "int32", "location_id": "int32"})
+    loop = fill_missing_dates_loop(df)
+    narrow = fill_daily_gaps(df, keys, carry_cols, keep_int_keys=True)
+
+    assert loop["sensor_id"].dtype == np.float64
+    assert narrow["sensor_id"].dtype == np.int32
+    assert narrow["location_id"].dtype == np.int32
+    pd.testing.assert_frame_equal(narrow, loop, check_dtype=False)
+
+
+def test_gap_rows_are_flagged():
+    df = pd.DataFrame({
+        "date": pd.to_datetime(["2024-01-01", "2024-01-04"]),
+        "sensor_id": [1, 1],
+        "location_name": ["a", "a"],
+        "avg": [1.0, 2.0],
+    })
+    out = fill_daily_gaps(df, ["sensor_id"], ["location_name"])
+    assert out["date"].dt.day.tolist() == [1, 2, 3, 4]
+    assert out["has_measurement"].tolist() == [True, False, False, True]
+    assert out["location_name"].tolist() == ["a"] * 4
+
+
+def test_empty_frame_is_returned_as_is():
+    df = pd.DataFrame(columns=["date", "sensor_id", "avg"])
+    assert fill_daily_gaps(df, ["sensor_id"]) is df
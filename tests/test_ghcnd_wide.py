@@ -0,0 +1,62 @@
+"""NCDCDO.to_wide against pandas' pivot_table on long GHCND rows."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.raw.NCDCDO import GHCND_DATATYPES, to_wide
+
+COLS = [d.lower() for d in GHCND_DATATYPES]
+
+
+@pytest.fixture(scope="module")
+def long_rows():
+    rng = np.random.default_rng(0)
+    ids = [f"GHCND:US{i:09d}" for i in range(6)]
+    # two stations share a display name; the pivot must still keep them apart
+    names = dict(zip(ids, ["A", "B", "C", "C", "D", "E"]))
+    idx = pd.MultiIndex.from_product(
+        [ids, pd.date_range("2023-12-01", periods=90, freq="D"), GHCND_DATATYPES],
+        names=["station_id", "date", "datatype"],
+    )
+    df = idx.to_frame(index=False)
+    df = df[rng.random(len(df)) > 0.3].sample(frac=1, random_state=0).reset_index(drop=True)
+    df["station"] = df["station_id"].map(names)
+    df["value"] = np.round(rng.normal(50, 20, len(df)), 1)
+    df["attributes"] = np.where(rng.random(len(df)) < 0.5, ",,W,2400", ",,7,0700")
+    df["qa_flags"] = rng.choice(np.array([0, 1, 16], dtype=np.int16), len(df), p=[0.9, 0.05, 0.05])
+    return df
+
+
+def test_values_match_pivot_table(long_rows):
+    wide = to_wide(long_rows).set_index(["station_id", "date"])
+    expected = long_rows.pivot_table(index=["station_id", "date"], columns="datatype", values="value", aggfunc="first")
+    expected = expected.rename(columns=str.lower)[COLS]
+    pd.testing.assert_frame_equal(
+        wide.loc[expected.index, COLS], expected, check_names=False, check_column_type=False, check_index_type=False,
+    )
+
+
+def test_attributes_and_flags_match_pivot_table(long_rows):
+    wide = to_wide(long_rows).set_index(["station_id", "date"])
+    attributes = long_rows.pivot_table(index=["station_id", "date"], columns="datatype", values="attributes", aggfunc="first")
+    for d in GHCND_DATATYPES:
+        got = wide.loc[attributes.index, f"{d.lower()}_attributes"]
+        assert got.fillna("").tolist() == attributes[d].fillna("").tolist()
+
+    flags = long_rows.groupby(["station_id", "date"])["qa_flags"].agg(np.bitwise_or.reduce)
+    assert wide.loc[flags.index, "qa_flags"].tolist() == flags.tolist()
+
+
+def test_every_station_day_is_filled(long_rows):
+    wide = to_wide(long_rows)
+    spans = long_rows.groupby("station_id")["date"].agg(["min", "max"])
+    days = wide.groupby("station_id")["date"].agg(["min", "max", "count"])
+    assert (days["min"] == spans["min"]).all() and (days["max"] == spans["max"]).all()
+    assert (days["count"] == (spans["max"] - spans["min"]).dt.days + 1).all()
+    assert not wide.duplicated(["station_id", "date"]).any()
+
+    measured = wide[COLS].notna().any(axis=1)
+    assert wide["has_measurement"].tolist() == measured.tolist()
+    assert (wide.loc[~measured, "qa_flags"] == 0).all()
+    assert wide.groupby("station_id")["station"].nunique().eq(1).all()
@@ -0,0 +1,118 @@
+"""quality.validate: each check sets its own bit on exactly the rows it should."""
+
+import numpy as np
+import pandas as pd
+
+from data import quality
+
+
+def daily(sensor_id: int, values, parameter: str = "pm25", unit: str = "µg/m³", start: str = "2024-01-01") -> pd.DataFrame:
+    avg = np.asarray(values, dtype=float)
+    return pd.DataFrame({
+        "date": pd.date_range(start, periods=len(avg), freq="D"),
+        "sensor_id": sensor_id,
+        "parameter": parameter,
+        "parameter_units": unit,
+        "min": avg - 1,
+        "q02": avg - 1,
+        "q25": avg - 0.5,
+        "median": avg,
+        "q75": avg + 0.5,
+        "q98": avg + 1,
+        "max": avg + 1,
+        "avg": avg,
+    })
+
+
+def flags_of(df: pd.DataFrame, table_name: str = "openaq_daily") -> list[int]:
+    return quality.validate(df, table_name)[0]["qa_flags"].tolist()
+
+
+def steady(n: int = 20) -> list[float]:
+    return [10 + (i % 3) * 0.5 for i in range(n)]
+
+
+def test_clean_rows_are_not_flagged():
+    assert flags_of(daily(1, steady())) == [0] * 20
+
+
+def test_range():
+    values = steady(5)
+    values[2] = 5_000
+    df = daily(1, values)
+    # a lone out-of-range day is also a spike; check the range bit alone
+    assert [f & quality.RANGE for f in flags_of(df)] == [0, 0, quality.RANGE, 0, 0]
+
+
+def test_order():
+    df = daily(1, steady(5))
+    df.loc[1, "q25"] = df.loc[1, "q75"] + 1
+    df.loc[3, "avg"] = df.loc[3, "max"] + 5
+    assert flags_of(df) == [0, quality.ORDER, 0, quality.ORDER, 0]
+
+
+def test_unknown_unit_and_unit_drift():
+    unknown = daily(1, steady(3), unit="furlongs")
+    drifting = pd.concat([daily(2, steady(2)), daily(2, [0.01, 0.01], unit="ppm", start="2024-01-03")])
+    clean = daily(3, steady(3))
+    df = pd.concat([unknown, drifting, clean], ignore_index=True)
+    assert flags_of(df) == [quality.UNIT] * 7 + [0] * 3
+
+
+def test_duplicates_flag_all_but_the_last_copy():
+    df = daily(1, steady(3))
+    df = pd.concat([df, df.iloc[[1]]], ignore_index=True)
+    assert flags_of(df) == [0, quality.DUPLICATE, 0, 0]
+
+
+def test_spike_needs_a_jump_both_ways():
+    values = steady()
+    values[10] = 300
+    values[15] = 300  # a level shift from here on is not a spike
+    values[16:] = [300] * 4
+    out = flags_of(daily(1, values))
+    assert [i for i, f in enumerate(out) if f & quality.SPIKE] == [10]
+
+
+def test_spikes_ignore_order_and_stay_inside_their_series():
+    a = steady()
+    a[10] = 300
+    df = pd.concat([daily(1, a), daily(2, steady())]).sample(frac=1, random_state=0)
+    out = quality.validate(df, "openaq_daily")[0]
+    spikes = out[(out["qa_flags"] & quality.SPIKE) > 0]
+    assert spikes[["sensor_id", "date"]].values.tolist() == [[1, pd.Timestamp("2024-01-11")]]
+
+
+def test_ghcnd_precipitation_is_not_spike_checked():
+    dates = pd.date_range("2024-06-01", periods=20, freq="D")
+    rows = []
+    for datatype, unit, base in [("PRCP", "inches (in)", 0.0), ("TMAX", "Fahrenheit (°F)", 80.0)]:
+        v = np.full(20, base) + np.arange(20) % 2 * 0.1
+        v[10] = 5.0 if datatype == "PRCP" else 130.0
+        rows.append(pd.DataFrame({"date": dates, "station_id": "GHCND:X", "datatype": datatype, "unit": unit, "value": v}))
+    df = pd.concat(rows, ignore_index=True)
+    out = quality.validate(df, "noaa_ncdc_ghcnd_daily")[0]
+    spikes = out[(out["qa_flags"] & quality.SPIKE) > 0]
+    assert spikes["datatype"].tolist() == ["TMAX"]
+
+
+def test_summary_counts_each_check():
+    values = steady(5)
+    values[2] = 5_000
+    df = pd.concat([daily(1, values), daily(1, steady(5)).iloc[[0]]], ignore_index=True)
+    summary = quality.validate(df, "openaq_daily")[1].set_index("check")
+    assert summary["rows"].eq(6).all()
+    assert summary.loc["range", "flagged"] == 1
+    assert summary.loc["duplicate", "flagged"] == 1
+    assert summary.loc["order", "flagged"] == 0
+
+
+def test_empty_frame():
+    df, summary = quality.validate(daily(1, []), "openaq_daily")
+    assert df.empty and "qa_flags" in df.columns
+    assert summary["flagged"].eq(0).all() and len(summary) == len(quality.FLAGS)
+
+
+def test_describe():
+    assert quality.describe(quality.RANGE | quality.SPIKE) == ["range", "spike"]
+    assert quality.describe(0) == []
@@ -0,0 +1,57 @@
+"""SpatialIndex against a brute-force haversine scan over random points on the whole globe."""
+
+import numpy as np
+import pytest
+
+from data.spatial import SpatialIndex, haversine_m, pair
+
+
+def random_points(n: int, rng) -> tuple[np.ndarray, np.ndarray]:
+    # uniform over the sphere, so the poles and the antimeridian are covered too
+    lat = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+    lon = rng.uniform(-180, 180, n)
+    return lat, lon
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(0)
+    lat, lon = random_points(3_000, rng)
+    qlat, qlon = random_points(300, rng)
+    index = SpatialIndex(zip(range(len(lat)), lat, lon))
+    return index, lat, lon, qlat, qlon
+
+
+def test_nearest_matches_brute_force(points):
+    index, lat, lon, qlat, qlon = points
+    for la, lo in zip(qlat, qlon):
+        dist = haversine_m(la, lo, lat, lon)
+        expected = np.argsort(dist, kind="stable")[:5]
+        found = index.nearest(la, lo, k=5)
+        assert [k for k, _ in found] == expected.tolist()
+        np.testing.assert_allclose([m for _, m in found], dist[expected], rtol=1e-9, atol=1e-3)
+
+
+def test_within_matches_brute_force(points):
+    index, lat, lon, qlat, qlon = points
+    radius = 500_000
+    for la, lo in zip(qlat, qlon):
+        dist = haversine_m(la, lo, lat, lon)
+        expected = set(np.flatnonzero(dist <= radius).tolist())
+        found = index.within(la, lo, radius)
+        assert {k for k, _ in found} == expected
+        assert [m for _, m in found] == sorted(m for _, m in found)
+
+
+def test_nearest_max_m_and_missing_coordinates():
+    index = SpatialIndex([("a", 39.29, -76.61), ("b", None, None), ("c", 39.18, -76.67), ("d", 51.5, -0.13)])
+    assert len(index) == 3
+    assert [k for k, _ in index.nearest(39.29, -76.61, k=3, max_m=50_000)] == ["a", "c"]
+    assert index.nearest(0, 0, k=0) == []
+    assert SpatialIndex([]).nearest(0, 0) == []
+
+
+def test_pair_ranks_nearest_first():
+    index = SpatialIndex([("a", 0, 0), ("b", 0, 1), ("c", 0, 2)])
+    rows = pair([(1, 0, 0.1), (2, None, None)], index, k=2)
+    assert [(r["key"], r["match"], r["rank"]) for r in rows] == [(1, "a", 1), (1, "b", 2)]